@@ -1,5 +1,9 @@
 from anki.utils import pointVersion
 from .src.main_screen_integration import init_main_screen_hooks
+from .src.config import init_config_hooks
+from .src.warm_state import init_warm_state_hooks
+from .src.deck_tree import init_deck_tree_hooks
+from .src.web_assets import init_web_assets
 
 # ===== INÍCIO DA INTEGRAÇÃO COM TELA PRINCIPAL =====
 
@@ -23,4 +27,28 @@ try:
 except Exception as e:
 	print(f"Card Evolution: Erro ao inicializar hooks da tela principal: {e}")
 
+# Servir o renderer do gráfico e carregar os scripts nas páginas que mostram o gráfico
+try:
+	init_web_assets()
+except Exception as e:
+	print(f"Card Evolution: Erro ao inicializar os scripts do gráfico: {e}")
+
+# Inicializar hooks que mantêm o estado do gráfico em memória entre revisões
+try:
+	init_warm_state_hooks()
+except Exception as e:
+	print(f"Card Evolution: Erro ao inicializar hooks de estado em memória: {e}")
+
+# Remontar o índice da árvore de decks quando os decks mudarem
+try:
+	init_deck_tree_hooks()
+except Exception as e:
+	print(f"Card Evolution: Erro ao inicializar hooks da árvore de decks: {e}")
+
+# Reler o config (e remontar as traduções) quando ele for editado
+try:
+	init_config_hooks()
+except Exception as e:
+	print(f"Card Evolution: Erro ao inicializar hooks de configuração: {e}")
+
 # ===== FIM DA INTEGRAÇÃO COM TELA PRINCIPAL =====
@@ -0,0 +1,4 @@
+"""
+Benchmarks offline do addon: coleções SQLite sintéticas e módulos `aqt`/`anki` de
+mentira, para medir o gráfico sem abrir o Anki. Ver run_benchmarks.py.
+"""
@@ -0,0 +1,103 @@
+"""
+Módulos `aqt` e `anki` de mentira, só com o que o pacote `src` usa ao ser importado
+e ao desenhar o gráfico. Precisam ser instalados antes de importar `src`.
+
+O `mw` devolve o config.json do addon como config e usa inglês como idioma do Anki.
+Os hooks aceitam `append` e não fazem nada.
+"""
+import json
+import os
+import sys
+import types
+
+ADDON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# anki.stats.colLearn/colYoung/colMature
+ANKI_STATS_COLORS = {"colLearn": "#00F", "colYoung": "#7c7", "colMature": "#070"}
+
+
+class _Hook(list):
+	"""Hook do gui_hooks: guarda os callbacks, que nunca são chamados."""
+
+	def remove(self, callback):
+		if callback in self:
+			super().remove(callback)
+
+
+class _Anything:
+	"""Valor que aceita qualquer atributo e chamada (classes e funções do Anki que só são referenciadas)."""
+
+	def __init__(self, name):
+		self._name = name
+
+	def __getattr__(self, name):
+		if name.startswith("__"):
+			raise AttributeError(name)
+		return _Anything(self._name + "." + name)
+
+	def __call__(self, *args, **kwargs):
+		return _Anything(self._name + "()")
+
+	def __repr__(self):
+		return "<stub " + self._name + ">"
+
+
+class _StubModule(types.ModuleType):
+	def __getattr__(self, name):
+		if name.startswith("__"):
+			raise AttributeError(name)
+		value = _Hook() if self.__name__ == "aqt.gui_hooks" else _Anything(self.__name__ + "." + name)
+		setattr(self, name, value)
+		return value
+
+
+class _AddonManager:
+	def __init__(self, config):
+		self.config = config
+
+	def getConfig(self, module):
+		# Cópia, como o addonManager do Anki
+		return json.loads(json.dumps(self.config))
+
+	def setConfigUpdatedAction(self, module, action):
+		pass
+
+	def setWebExports(self, module, pattern):
+		pass
+
+	def addonFromModule(self, module):
+		return os.path.basename(ADDON_DIR)
+
+
+def load_addon_config():
+	with open(os.path.join(ADDON_DIR, "config.json"), encoding="utf-8") as config_file:
+		return json.load(config_file)
+
+
+def install(config=None):
+	"""Registra os módulos de mentira em sys.modules e põe a pasta do addon no sys.path; retorna o `mw`."""
+	modules = {}
+	for name in ("aqt", "aqt.qt", "aqt.gui_hooks", "aqt.deckbrowser", "aqt.overview", "aqt.reviewer",
+				 "aqt.operations", "aqt.utils", "aqt.webview", "anki", "anki.stats", "anki.utils", "anki.hooks",
+				 "anki.collection"):
+		modules[name] = _StubModule(name)
+	for name, module in modules.items():
+		if "." in name:
+			parent, child = name.rsplit(".", 1)
+			setattr(modules[parent], child, module)
+
+	mw = types.SimpleNamespace(
+		addonManager=_AddonManager(load_addon_config() if config is None else config),
+		pm=types.SimpleNamespace(meta={"defaultLang": "en"}),
+		col=None,
+	)
+	modules["aqt"].mw = mw
+	for name, color in ANKI_STATS_COLORS.items():
+		setattr(modules["anki.stats"], name, color)
+	modules["anki.utils"].pointVersion = lambda: 250600
+	modules["anki.hooks"].wrap = lambda old, new, pos="after": old
+
+	sys.modules.update(modules)
+	if ADDON_DIR not in sys.path:
+		sys.path.insert(0, ADDON_DIR)
+	return mw
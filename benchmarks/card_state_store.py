@@ -0,0 +1,143 @@
+"""
+Benchmark da tabela de estados dos cartões da varredura: o CardStateStore (colunas
+`array` endereçadas por posição) contra um dict por cartão, como antes dele.
+
+Com as revisões de uma coleção sintética (100 mil cartões por padrão), mede:
+
+- memory: memória da tabela com o último estado de cada cartão (tracemalloc);
+- apply_review: `CardStateSweep.apply_review` de todas as revisões, com a tabela
+  trocada pela de cada implementação.
+
+Uso, a partir da pasta do addon:
+
+	python -m benchmarks.card_state_store --cards 100000
+"""
+import argparse
+import gc
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from . import anki_stubs
+from .synthetic_collection import SyntheticCollection, build_collection, collection_file_name
+
+
+class DictCardStates:
+	"""A mesma interface do CardStateStore sobre um dict {categoria, ivl, última revisão} por cartão."""
+
+	def __init__(self):
+		self._states = {}
+
+	def __len__(self):
+		return len(self._states)
+
+	def __contains__(self, cid):
+		return cid in self._states
+
+	def get(self, cid):
+		state = self._states.get(cid)
+		if state is None:
+			return None
+		return state['category'], state['ivl'], state['last_rev_time']
+
+	def put(self, cid, category, ivl, last_rev_time):
+		previous_state = self.get(cid)
+		self._states[cid] = {'category': category, 'ivl': ivl, 'last_rev_time': last_rev_time}
+		return previous_state
+
+	def pop(self, cid):
+		state = self._states.pop(cid)
+		return state['category'], state['ivl'], state['last_rev_time']
+
+	def items(self):
+		for cid, state in self._states.items():
+			yield cid, (state['category'], state['ivl'], state['last_rev_time'])
+
+
+def _parse_args(argv):
+	parser = argparse.ArgumentParser(description="Card state table of the sweep: array-backed store vs one dict per card.")
+	parser.add_argument("--cards", type=int, default=100_000, help="cards in the collection (default: %(default)s)")
+	parser.add_argument("--years", type=float, default=2, help="years of review history (default: %(default)s)")
+	parser.add_argument("--reviews-per-day", type=int, default=600,
+						help="reviews per day across the collection (default: %(default)s)")
+	parser.add_argument("--seed", type=int, default=1, help="random seed of the generator (default: %(default)s)")
+	parser.add_argument("--repeat", type=int, default=3, help="runs of apply_review (default: %(default)s)")
+	parser.add_argument("--collection-dir", default=os.path.join(tempfile.gettempdir(), "arg-benchmark-collections"),
+						help="where synthetic collections are kept between runs (default: %(default)s)")
+	parser.add_argument("--output", help="JSON results file (default: only printed)")
+	return parser.parse_args(argv)
+
+
+def _read_reviews(args):
+	os.makedirs(args.collection_dir, exist_ok=True)
+	path = os.path.join(args.collection_dir, collection_file_name(args.cards, args.years, args.reviews_per_day, 1,
+																   args.seed))
+	if not os.path.exists(path):
+		print("Generating {} ...".format(os.path.basename(path)), file=sys.stderr)
+		build_collection(path + ".tmp", args.cards, args.years, args.reviews_per_day, 1, args.seed)
+		os.replace(path + ".tmp", path)
+	col = SyntheticCollection(path)
+	try:
+		day_cutoff_s = col.sched.day_cutoff
+		reviews = col.db.all("SELECT id, cid, type, ivl FROM revlog WHERE id < ? ORDER BY id", day_cutoff_s * 1000)
+	finally:
+		col.close()
+	return day_cutoff_s, [tuple(review) for review in reviews]
+
+
+def _table_memory(table_class, reviews):
+	"""Bytes alocados pela tabela depois de gravar o estado deixado por cada revisão."""
+	from src.evolution_core import get_card_category
+
+	gc.collect()
+	tracemalloc.start()
+	try:
+		table = table_class()
+		for rev_id_ms, cid, rev_type, rev_ivl in reviews:
+			table.put(cid, get_card_category(rev_type, rev_ivl), rev_ivl, rev_id_ms)
+		memory = tracemalloc.get_traced_memory()[0]
+	finally:
+		tracemalloc.stop()
+	return memory, len(table)
+
+
+def _apply_review_time(table_class, reviews, day_cutoff_s):
+	from src.evolution_core import CardStateSweep
+
+	sweep = CardStateSweep(day_cutoff_s)
+	sweep.card_current_states = table_class()
+	apply_review = sweep.apply_review
+	gc.collect()
+	start = time.perf_counter()
+	for review in reviews:
+		apply_review(*review)
+	return time.perf_counter() - start
+
+
+def main(argv=None):
+	args = _parse_args(argv)
+	anki_stubs.install()
+	from src.evolution_core import CardStateStore
+
+	day_cutoff_s, reviews = _read_reviews(args)
+	results = {"cards": args.cards, "reviews": len(reviews), "tables": {}}
+	for name, table_class in (("dict", DictCardStates), ("store", CardStateStore)):
+		memory, cards = _table_memory(table_class, reviews)
+		runs = [_apply_review_time(table_class, reviews, day_cutoff_s) for _ in range(args.repeat)]
+		results["tables"][name] = {"memory_bytes": memory, "apply_review_s": {"min_s": min(runs),
+																			 "median_s": statistics.median(runs),
+																			 "runs": runs}}
+		print("{:<6} {} cards  memory {:.1f} MB  apply_review {:.3f}s ({} reviews)".format(
+			name, cards, memory / 1024 / 1024, statistics.median(runs), len(reviews)))
+	if args.output:
+		with open(args.output, "w", encoding="utf-8") as output_file:
+			json.dump(results, output_file, indent=1)
+		print("Results written to " + args.output)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,328 @@
+"""
+Benchmark offline do gráfico, sem o Anki.
+
+Para cada escala (número de cartões) e backend, gera (ou reaproveita) uma coleção
+sintética e mede separadamente cada etapa de `get_card_evolution_data` e do HTML:
+
+- query: sonda do primeiro dia e leitura das revisões do revlog;
+- sweep: varredura dos estados dos cartões dia a dia;
+- aggregation: agregação em blocos, redução de pontos e payload (`build_graph_data`);
+- html: HTML do gráfico da tela principal (`render_graph_data`);
+- end_to_end: `render_card_evolution_graph` completo, sem o cache de snapshots.
+
+Cada escala e backend roda em um processo novo, e o pico de memória é medido logo
+após um render completo, antes de qualquer etapa que guarde o histórico inteiro em
+uma lista; assim ele é o do caminho do addon, e não o das medições anteriores. As
+coleções também são geradas em um processo à parte, para que este fique pequeno.
+
+A leitura do revlog em páginas (`revlog_batch_size`) é comparada com a leitura em
+uma consulta só: para a coleção inteira e para o primeiro deck, cada tamanho de
+página faz um render completo em um processo próprio, com o seu pico de memória.
+
+O resultado vai para um arquivo JSON. Com --baseline, imprime a razão entre os tempos
+desta execução e os de um JSON anterior.
+
+Uso, a partir da pasta do addon:
+
+	python -m benchmarks.run_benchmarks --scales 10000,100000,500000 --years 10 --reviews-per-day 300
+"""
+import argparse
+import contextlib
+import dataclasses
+import datetime
+import gc
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+try:
+	import resource
+except ImportError:
+	# Windows: o pico de memória vem do tracemalloc
+	resource = None
+
+from . import anki_stubs
+from .synthetic_collection import SyntheticCollection, build_collection, collection_file_name
+
+STAGES = ("query", "sweep", "aggregation", "html", "end_to_end")
+
+_RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def _parse_args(argv):
+	parser = argparse.ArgumentParser(description="Offline benchmark of the Accumulated Retention graph.")
+	parser.add_argument("--scales", default="10000,100000,500000",
+						help="comma-separated card counts (default: %(default)s)")
+	parser.add_argument("--years", type=float, default=10, help="years of review history (default: %(default)s)")
+	parser.add_argument("--reviews-per-day", type=int, default=300,
+						help="reviews per day across the collection (default: %(default)s)")
+	parser.add_argument("--decks", type=int, default=8, help="number of decks (default: %(default)s)")
+	parser.add_argument("--seed", type=int, default=1, help="random seed of the generator (default: %(default)s)")
+	parser.add_argument("--period", default="deck_life",
+						help="main screen period, e.g. 1m, 1y, deck_life (default: %(default)s)")
+	parser.add_argument("--backends", default="python,numpy",
+						help="evolution backends to time; numpy is skipped when unavailable (default: %(default)s)")
+	parser.add_argument("--repeat", type=int, default=3, help="runs per stage (default: %(default)s)")
+	parser.add_argument("--batch-sizes", default="0,50000",
+						help="revlog_batch_size values compared by end-to-end time and peak memory, 0 = one query "
+							 "(default: %(default)s)")
+	parser.add_argument("--collection-dir", default=os.path.join(tempfile.gettempdir(), "arg-benchmark-collections"),
+						help="where synthetic collections are kept between runs (default: %(default)s)")
+	parser.add_argument("--output", help="JSON results file (default: benchmarks/results/<timestamp>.json)")
+	parser.add_argument("--baseline", help="previous JSON results file to compare against")
+	return parser.parse_args(argv)
+
+
+def _git_commit():
+	try:
+		return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=anki_stubs.ADDON_DIR, capture_output=True,
+							  text=True, check=True).stdout.strip()
+	except (OSError, subprocess.CalledProcessError):
+		return None
+
+
+def _peak_memory():
+	"""
+	(chave, KB) do pico de memória: o RSS máximo do processo ou, sem o módulo resource,
+	o pico das alocações do Python rastreadas pelo tracemalloc (iniciado em
+	`_bench_in_new_process`).
+	"""
+	if resource is None:
+		return "traced_peak_kb", tracemalloc.get_traced_memory()[1] // 1024
+	# ru_maxrss é em KB no Linux e em bytes no macOS
+	max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	return "max_rss_kb", max_rss // 1024 if sys.platform == "darwin" else max_rss
+
+
+def _timed(func):
+	"""(resultado, segundos) de `func()`, com o lixo coletado antes e a saída do addon descartada."""
+	gc.collect()
+	with contextlib.redirect_stdout(io.StringIO()):
+		start = time.perf_counter()
+		result = func()
+		elapsed = time.perf_counter() - start
+	return result, elapsed
+
+
+def _stage_summary(runs):
+	return {"min_s": min(runs), "median_s": statistics.median(runs), "runs": runs}
+
+
+def _collection_path(args, cards):
+	os.makedirs(args.collection_dir, exist_ok=True)
+	path = os.path.join(args.collection_dir,
+						collection_file_name(cards, args.years, args.reviews_per_day, args.decks, args.seed))
+	if not os.path.exists(path):
+		print("Generating {} ...".format(os.path.basename(path)), file=sys.stderr)
+		start = time.perf_counter()
+		# Fora deste processo: no Linux, o ru_maxrss de um processo novo parte da memória do processo que o criou
+		_in_new_process(build_collection, path + ".tmp", cards, args.years, args.reviews_per_day, args.decks,
+						args.seed)
+		os.replace(path + ".tmp", path)
+		print("  done in {:.1f}s".format(time.perf_counter() - start), file=sys.stderr)
+	return path
+
+
+def _in_new_process(func, *args):
+	"""`func(*args)` em um processo "spawn" novo, que termina junto com a chamada."""
+	with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+		return executor.submit(func, *args).result()
+
+
+def _process_config(args, backend, **changes):
+	# Executado no início de cada processo novo: os módulos de mentira e o config são montados de novo nele
+	anki_stubs.install()
+	if resource is None:
+		# O rastreamento também deixa as etapas mais lentas; os tempos só se comparam entre execuções assim
+		tracemalloc.start()
+	from src import render_timings
+	from src.config import AddonConfig
+
+	# O log de tempos dos renders fica junto das coleções, fora da pasta do addon
+	render_timings.LOG_DIR = args.collection_dir
+	# Sem o cache de snapshots, todo render lê e varre o revlog
+	return dataclasses.replace(AddonConfig.from_dict(anki_stubs.load_addon_config()), evolution_backend=backend,
+							   snapshot_cache=False, main_screen_period=args.period, **changes)
+
+
+def _bench_in_new_process(args, path, backend):
+	config = _process_config(args, backend)
+	col = SyntheticCollection(path)
+	try:
+		return _bench_backend(col, config, args.period, args.repeat)
+	finally:
+		col.close()
+
+
+def _paging_in_new_process(args, path, backend, deck_id, batch_size):
+	"""Tempo e pico de memória de um render completo com `revlog_batch_size` = `batch_size`."""
+	config = _process_config(args, backend, revlog_batch_size=batch_size)
+	from src.main_screen_integration import CompleteCollectionStats
+	from src.rendering import render_card_evolution_graph
+
+	col = SyntheticCollection(path)
+	try:
+		stats = CompleteCollectionStats(col, deck_id=deck_id, period=args.period, config=config)
+		_, elapsed = _timed(lambda: render_card_evolution_graph(stats, config))
+	finally:
+		col.close()
+	memory_key, peak_kb = _peak_memory()
+	return {"deck_id": deck_id, "revlog_batch_size": batch_size, "end_to_end_s": elapsed, memory_key: peak_kb}
+
+
+def _bench_paging(args, path, backend):
+	# O primeiro deck de nível superior (com os seus subdecks) fica bem abaixo da metade da coleção
+	col = SyntheticCollection(path)
+	deck_id = col.db.scalar("SELECT min(id) FROM decks WHERE id != 1")
+	col.close()
+	runs = []
+	for scope_deck_id in (None, deck_id):
+		for batch_size in [int(size) for size in args.batch_sizes.split(",")]:
+			runs.append(_in_new_process(_paging_in_new_process, args, path, backend, scope_deck_id, batch_size))
+	return runs
+
+
+def _bench_backend(col, config, period, repeat):
+	"""Tempos de cada etapa para um backend, mais o tamanho do gráfico gerado."""
+	from src import data_processing, revlog_sweep
+	from src.evolution_core import DailySeries, sweep_card_states
+	from src.main_screen_integration import CompleteCollectionStats
+	from src.numpy_backend import reviews_array, sweep_card_states_numpy
+	from src.rendering import render_card_evolution_graph, render_graph_data
+
+	stats = CompleteCollectionStats(col, deck_id=None, period=period, config=config)
+	revlog_query = data_processing.RevlogQuery(None, config.exclude_deleted_cards, config.exclude_suspended_cards)
+	day_cutoff_s = revlog_sweep.day_cutoff(col)
+	chunk_days = data_processing._aggregation_chunk_days(stats, config)
+	max_points = data_processing._max_points(stats, config)
+	use_numpy = config.evolution_backend == "numpy"
+
+	def read_reviews():
+		start_day_idx, windowed = revlog_sweep.graph_window(col, revlog_query, day_cutoff_s, stats._periodDays())
+		return start_day_idx, revlog_sweep.iter_window_reviews(
+			col, revlog_query, day_cutoff_s, start_day_idx if windowed else None, config.revlog_batch_size)
+
+	def query():
+		# Consome as páginas como a varredura do addon, sem guardar as linhas
+		start_day_idx, reviews = read_reviews()
+		return start_day_idx, sum(1 for _ in reviews)
+
+	def sweep():
+		if use_numpy:
+			return DailySeries(*sweep_card_states_numpy(reviews_array(reviews), day_cutoff_s, start_day_idx))
+		return sweep_card_states(reviews, day_cutoff_s, start_day_idx)
+
+	# Um render completo antes das medições: o pico de memória até aqui é o do caminho do addon
+	_timed(lambda: render_card_evolution_graph(stats, config))
+	memory_key, peak_kb = _peak_memory()
+	# A etapa sweep mede só a varredura, sobre as revisões já lidas
+	start_day_idx, reviews = read_reviews()
+	reviews = list(reviews)
+
+	runs = {stage: [] for stage in STAGES}
+	for _ in range(repeat):
+		(start_day_idx, reviews_read), elapsed = _timed(query)
+		runs["query"].append(elapsed)
+		daily, elapsed = _timed(sweep)
+		runs["sweep"].append(elapsed)
+		graph_data, elapsed = _timed(lambda: data_processing.build_graph_data(
+			daily, day_cutoff_s, start_day_idx, chunk_days, "evolutionGraphBench", config, max_points))
+		runs["aggregation"].append(elapsed)
+		html, elapsed = _timed(lambda: render_graph_data(stats, "evolutionGraphBench", graph_data, config))
+		runs["html"].append(elapsed)
+		_, elapsed = _timed(lambda: render_card_evolution_graph(stats, config))
+		runs["end_to_end"].append(elapsed)
+		del daily
+
+	series = graph_data[0]
+	return {
+		"reviews_read": reviews_read,
+		"graph_days": -start_day_idx + 1,
+		"points_per_series": max((len(s["data"]) for s in series), default=0),
+		"html_bytes": len(html.encode("utf-8")),
+		"stages": {stage: _stage_summary(stage_runs) for stage, stage_runs in runs.items()},
+		memory_key: peak_kb,
+	}
+
+
+def _print_comparison(results, baseline_path):
+	with open(baseline_path, encoding="utf-8") as baseline_file:
+		baseline = json.load(baseline_file)
+	previous = {(r["cards"], r["backend"], r["period"]): r for r in baseline["results"]}
+	print("\nvs " + baseline_path + " (median, this run / baseline):")
+	for result in results:
+		before = previous.get((result["cards"], result["backend"], result["period"]))
+		if before is None:
+			continue
+		ratios = ["{} {:.2f}x".format(stage, result["stages"][stage]["median_s"] / before["stages"][stage]["median_s"])
+				  for stage in STAGES if stage in before["stages"] and before["stages"][stage]["median_s"]]
+		print("  {:>8} cards {:<6} {}".format(result["cards"], result["backend"], "  ".join(ratios)))
+
+
+def main(argv=None):
+	args = _parse_args(argv)
+	anki_stubs.install()
+
+	from src.numpy_backend import NUMPY_AVAILABLE
+
+	backends = [backend for backend in args.backends.split(",") if backend != "numpy" or NUMPY_AVAILABLE]
+
+	results = []
+	for cards in [int(scale) for scale in args.scales.split(",")]:
+		path = _collection_path(args, cards)
+		col = SyntheticCollection(path)
+		counts = col.counts()
+		col.close()
+		for backend in backends:
+			result = {"cards": cards, "backend": backend, "period": args.period, "collection": counts}
+			result.update(_in_new_process(_bench_in_new_process, args, path, backend))
+			result["paging"] = _bench_paging(args, path, backend)
+			results.append(result)
+			print("{:>8} cards {:<6} ".format(cards, backend) + "  ".join(
+				"{} {:.3f}s".format(stage, result["stages"][stage]["median_s"]) for stage in STAGES))
+			for run in result["paging"]:
+				peak_kb = run.get("max_rss_kb", run.get("traced_peak_kb"))
+				print("{:>15} {:<10} batch {:<6} end_to_end {:.3f}s  peak {:.0f} MB".format(
+					"", "deck" if run["deck_id"] else "collection", run["revlog_batch_size"], run["end_to_end_s"],
+					peak_kb / 1024))
+
+	try:
+		import numpy
+		numpy_version = numpy.__version__
+	except ImportError:
+		numpy_version = None
+	report = {
+		"meta": {
+			"timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+			"commit": _git_commit(),
+			"python": platform.python_version(),
+			"platform": platform.platform(),
+			"numpy": numpy_version,
+			"parameters": {"years": args.years, "reviews_per_day": args.reviews_per_day, "decks": args.decks,
+						   "seed": args.seed, "repeat": args.repeat},
+		},
+		"results": results,
+	}
+	output = args.output
+	if output is None:
+		os.makedirs(_RESULTS_DIR, exist_ok=True)
+		output = os.path.join(_RESULTS_DIR, datetime.datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+	with open(output, "w", encoding="utf-8") as output_file:
+		json.dump(report, output_file, indent=1)
+	print("Results written to " + output)
+
+	if args.baseline:
+		_print_comparison(results, args.baseline)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,193 @@
+"""
+Coleções sintéticas para os benchmarks: um arquivo SQLite com as tabelas `cards`,
+`revlog` e `decks` (as colunas e índices do Anki que as consultas do addon usam) e
+um objeto com a interface de `mw.col` que o addon consulta (`db`, `sched.day_cutoff`,
+`decks`, `path`).
+
+Cada cartão entra em um dia sorteado do histórico. As revisões são repartidas entre
+os cartões proporcionalmente ao tempo de vida de cada um, e os intervalos crescem a
+cada revisão. Há também lapsos, cartões suspensos e cartões excluídos, que ficam
+só no revlog. A mesma semente gera sempre a mesma coleção.
+"""
+import os
+import random
+import sqlite3
+import types
+
+DAY_S = 86400
+# Virada do dia fixa (4h), para que coleções e resultados sejam comparáveis entre execuções
+DAY_CUTOFF_S = 1_760_000_000 - 1_760_000_000 % DAY_S + 4 * 3600
+
+_SCHEMA = """
+CREATE TABLE cards (id integer PRIMARY KEY, nid integer NOT NULL, did integer NOT NULL, ord integer NOT NULL,
+	mod integer NOT NULL, usn integer NOT NULL, type integer NOT NULL, queue integer NOT NULL, due integer NOT NULL,
+	ivl integer NOT NULL, factor integer NOT NULL, reps integer NOT NULL, lapses integer NOT NULL,
+	left integer NOT NULL, odue integer NOT NULL, odid integer NOT NULL, flags integer NOT NULL, data text NOT NULL);
+CREATE TABLE revlog (id integer PRIMARY KEY, cid integer NOT NULL, usn integer NOT NULL, ease integer NOT NULL,
+	ivl integer NOT NULL, lastIvl integer NOT NULL, factor integer NOT NULL, time integer NOT NULL,
+	type integer NOT NULL);
+CREATE TABLE decks (id integer PRIMARY KEY NOT NULL, name text NOT NULL);
+CREATE INDEX ix_cards_nid ON cards (nid);
+CREATE INDEX ix_cards_sched ON cards (did, queue, due);
+CREATE INDEX ix_revlog_usn ON revlog (usn);
+CREATE INDEX ix_revlog_cid ON revlog (cid);
+"""
+
+_INSERT_BATCH = 50_000
+
+
+def collection_file_name(cards, years, reviews_per_day, decks, seed):
+	return "synthetic-{}c-{:g}y-{}r-{}d-s{}.anki2".format(cards, years, reviews_per_day, decks, seed)
+
+
+def _deck_names(decks):
+	"""(id, nome) dos decks: metade de nível superior, metade subdecks deles."""
+	top_level = max(1, (decks + 1) // 2)
+	names = [(1, "Default")]
+	for pos in range(top_level):
+		names.append((1000 + pos, "Deck {}".format(pos + 1)))
+	for pos in range(decks - top_level):
+		parent = names[1 + pos % top_level][1]
+		names.append((2000 + pos, parent + "::Sub {}".format(pos + 1)))
+	return names
+
+
+def _card_reviews(rnd, card_id, first_day, review_count, used_ids):
+	"""Linhas do revlog de um cartão e o intervalo atual, a partir do dia `first_day` (negativo, antes de hoje)."""
+	rows = []
+	lifetime_s = -first_day * DAY_S
+	start_s = DAY_CUTOFF_S + first_day * DAY_S + rnd.randrange(DAY_S)
+	# Revisões cada vez mais espaçadas: a i-ésima cai na fração (i/n)^1.7 da vida do cartão
+	times = [start_s + int(lifetime_s * (pos / review_count) ** 1.7) for pos in range(review_count)]
+	ivl = 0
+	lapsed = False
+	for pos, review_s in enumerate(times):
+		next_gap_days = (times[pos + 1] - review_s) / DAY_S if pos + 1 < review_count else ivl * 2.5 + 1
+		if pos == 0:
+			rev_type, ease, new_ivl = 0, 3, -600
+		elif ivl > 0 and rnd.random() < 0.08:
+			# Lapso: volta para o reaprendizado (intervalo negativo, em segundos)
+			rev_type, ease, new_ivl = 1, 1, -600
+			lapsed = True
+		elif ivl < 0:
+			rev_type, ease, new_ivl = 2 if lapsed else 0, 3, max(1, round(next_gap_days))
+			lapsed = False
+		elif rnd.random() < 0.01:
+			rev_type, ease, new_ivl = 3, 3, max(1, round(next_gap_days))
+		else:
+			rev_type, ease, new_ivl = 1, rnd.choice((2, 3, 3, 3, 4)), max(1, round(next_gap_days))
+		rev_id = review_s * 1000 + rnd.randrange(1000)
+		while rev_id in used_ids:
+			rev_id += 1
+		used_ids.add(rev_id)
+		rows.append((rev_id, card_id, -1, ease, new_ivl, ivl, 2500, rnd.randrange(2000, 20000), rev_type))
+		ivl = new_ivl
+	return rows, ivl
+
+
+def build_collection(path, cards=10_000, years=5, reviews_per_day=200, decks=8, seed=1):
+	"""
+	Grava em `path` uma coleção com `cards` cartões e `years` anos de histórico, com
+	cerca de `reviews_per_day` revisões por dia (pelo menos uma por cartão).
+	"""
+	rnd = random.Random(seed)
+	history_days = max(1, int(years * 365))
+	deck_names = _deck_names(decks)
+	deck_ids = [did for did, _ in deck_names[1:]] or [1]
+
+	first_days = [-rnd.randint(1, history_days) for _ in range(cards)]
+	review_counts = [1] * cards
+	extra_reviews = max(0, int(history_days * reviews_per_day) - cards)
+	if cards and extra_reviews:
+		# Cartões mais antigos acumulam mais revisões
+		for card_pos in rnd.choices(range(cards), weights=[-day for day in first_days], k=extra_reviews):
+			review_counts[card_pos] += 1
+
+	if os.path.exists(path):
+		os.remove(path)
+	conn = sqlite3.connect(path)
+	try:
+		conn.executescript(_SCHEMA)
+		conn.executemany("INSERT INTO decks (id, name) VALUES (?, ?)", deck_names)
+		used_ids = set()
+		revlog_rows, card_rows = [], []
+		for card_pos in range(cards):
+			card_id = 1_400_000_000_000 + card_pos
+			rows, ivl = _card_reviews(rnd, card_id, first_days[card_pos], review_counts[card_pos], used_ids)
+			revlog_rows.extend(rows)
+			# 3% dos cartões foram excluídos (só as revisões ficam) e 5% estão suspensos
+			if rnd.random() >= 0.03:
+				queue = -1 if rnd.random() < 0.05 else (2 if ivl > 0 else 1)
+				card_rows.append((card_id, card_id, rnd.choice(deck_ids), 0, 0, -1, 2 if ivl > 0 else 3, queue,
+								  0, max(ivl, 0), 2500, len(rows), 0, 0, 0, 0, 0, ""))
+			if len(revlog_rows) >= _INSERT_BATCH:
+				conn.executemany("INSERT INTO revlog VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", revlog_rows)
+				revlog_rows = []
+			if len(card_rows) >= _INSERT_BATCH:
+				conn.executemany("INSERT INTO cards VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+								 card_rows)
+				card_rows = []
+		conn.executemany("INSERT INTO revlog VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", revlog_rows)
+		conn.executemany("INSERT INTO cards VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", card_rows)
+		conn.commit()
+		conn.execute("ANALYZE")
+	finally:
+		conn.close()
+	return path
+
+
+class _DB:
+	"""Os métodos de `col.db` do Anki que o addon usa."""
+
+	def __init__(self, conn):
+		self._conn = conn
+
+	def all(self, sql, *args):
+		return [list(row) for row in self._conn.execute(sql, args)]
+
+	def list(self, sql, *args):
+		return [row[0] for row in self._conn.execute(sql, args)]
+
+	def first(self, sql, *args):
+		row = self._conn.execute(sql, args).fetchone()
+		return list(row) if row else None
+
+	def scalar(self, sql, *args):
+		row = self._conn.execute(sql, args).fetchone()
+		return row[0] if row else None
+
+	def execute(self, sql, *args):
+		return [list(row) for row in self._conn.execute(sql, args)]
+
+
+class _Decks:
+	def __init__(self, conn):
+		self._names_and_ids = [types.SimpleNamespace(id=did, name=name)
+							   for did, name in conn.execute("SELECT id, name FROM decks ORDER BY name")]
+
+	def all_names_and_ids(self, skip_empty_default=False, include_filtered=True):
+		return list(self._names_and_ids)
+
+	def active(self):
+		return [deck.id for deck in self._names_and_ids]
+
+
+class SyntheticCollection:
+	"""Coleção aberta só para leitura, com a interface de `mw.col` usada pelo addon."""
+
+	def __init__(self, path):
+		self.path = path
+		self._conn = sqlite3.connect("file:" + path + "?mode=ro", uri=True, check_same_thread=False)
+		self.db = _DB(self._conn)
+		self.sched = types.SimpleNamespace(day_cutoff=DAY_CUTOFF_S)
+		self.decks = _Decks(self._conn)
+
+	def counts(self):
+		return {
+			"cards": self.db.scalar("SELECT count() FROM cards"),
+			"revlog": self.db.scalar("SELECT count() FROM revlog"),
+			"decks": self.db.scalar("SELECT count() FROM decks"),
+		}
+
+	def close(self):
+		self._conn.close()
@@ -0,0 +1,79 @@
+"""
+Configuração do addon como um objeto imutável.
+
+`get_config()` lê o config.json (via addonManager) uma vez e devolve sempre o mesmo
+snapshot até o config ser editado, quando o hook de atualização o descarta. Um render
+obtém o snapshot no início e o repassa para as funções que chama, então todas veem
+os mesmos valores mesmo que o render continue em segundo plano.
+"""
+from dataclasses import dataclass, field, fields
+
+from aqt import mw
+
+
+@dataclass(frozen=True)
+class AddonConfig:
+	"""Valores do config.json; os padrões são os documentados em config.md."""
+
+	# Tela de estatísticas
+	hide_learning: bool = False
+	hide_young: bool = False
+	hide_mature: bool = False
+	hide_retained: bool = False
+	hide_total_knowledge_graph: bool = False
+	secondary_graph: str = "retention_relative"
+	secondary_axis_dynamic_max: bool = False
+	secondary_axis_maximum_value: int = 365
+	show_at_beginning: bool = False
+	exclude_deleted_cards: bool = True
+	exclude_suspended_cards: bool = True
+	use_absolute_dates: bool = True
+	evolution_backend: str = "auto"
+	snapshot_cache: bool = True
+	revlog_batch_size: int = 50000
+	parallel_workers: int = 0
+	stats_screen_max_points: int = 0
+	show_render_timings: bool = False
+
+	# Tela principal
+	enable_main_screen: bool = True
+	main_screen_period: str = "2m"
+	main_screen_aggregation: str = "d"
+	main_screen_width: int = 900
+	main_screen_height: int = 250
+	show_in_overview: bool = True
+	show_in_deck_browser: bool = True
+	main_screen_async: bool = True
+	main_screen_deck_multiples: bool = False
+	main_screen_max_points: int = 900
+
+	# Traduções
+	translation_maps: dict = field(default_factory=dict, hash=False)
+
+	@classmethod
+	def from_dict(cls, raw_config):
+		"""Monta o snapshot a partir do dict do addonManager, ignorando chaves desconhecidas."""
+		known_keys = {config_field.name for config_field in fields(cls)}
+		return cls(**{key: value for key, value in (raw_config or {}).items() if key in known_keys})
+
+
+_config = None
+
+
+def get_config():
+	"""Snapshot atual do config, relido só depois de uma edição."""
+	global _config
+	if _config is None:
+		_config = AddonConfig.from_dict(mw.addonManager.getConfig(__name__))
+	return _config
+
+
+def invalidate_config(*args, **kwargs):
+	global _config
+	_config = None
+
+
+def init_config_hooks():
+	"""Drops the cached config (and everything derived from it) when the add-on config is edited.
+	Descarta o config em cache (e o que deriva dele) quando o config do addon é editado."""
+	mw.addonManager.setConfigUpdatedAction(__name__, invalidate_config)
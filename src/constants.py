@@ -1,14 +1,13 @@
-from anki import stats
-
 # Card State Categories & Colors
 CAT_LEARNING = 0
 CAT_YOUNG = 1
 CAT_MATURE = 2
 CAT_RETAINED = 3
 
-COLOR_LEARNING = stats.colLearn
-COLOR_YOUNG = stats.colYoung
-COLOR_MATURE = stats.colMature
+# As mesmas cores de anki.stats (colLearn, colYoung, colMature), copiadas para não importar o Anki
+COLOR_LEARNING = "#00F"
+COLOR_YOUNG = "#7c7"
+COLOR_MATURE = "#070"
 COLOR_RETAINED = "#004080"  # Dark blue, adjust as needed
 COLOR_RETENTION_ABSOLUTE = "#bf5028"
 COLOR_RETENTION_RELATIVE = "#FF6B35"
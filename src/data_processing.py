@@ -1,51 +1,117 @@
-import json
-import math
+from .constants import CAT_LEARNING, CAT_YOUNG, CAT_MATURE, CAT_RETAINED, COLOR_RETAINED, COLOR_MATURE, COLOR_YOUNG, \
+	COLOR_LEARNING, COLOR_RETENTION_ABSOLUTE, COLOR_RETENTION_RELATIVE, COLOR_STABILITY_AVERAGE
+from . import render_timings, revlog_sweep, snapshot_cache, warm_state
+from .config import get_config
+from .downsampling import bucket_bounds, lttb_indices, peak_indices
+from .evolution_core import DailySeries, EvolutionModel, sweep_card_states_by_deck
+from .numpy_backend import NUMPY_AVAILABLE
+from .payload import encode_points
+from .revlog_query import RevlogQuery
+from .translations import tr
 
-from aqt import mw
 
-from .constants import CAT_LEARNING, INTERVAL_LEARNING_MAX, INTERVAL_YOUNG_MAX, CAT_YOUNG, INTERVAL_MATURE_MAX, \
-	CAT_MATURE, CAT_RETAINED, COLOR_RETAINED, COLOR_MATURE, COLOR_YOUNG, COLOR_LEARNING, COLOR_RETENTION_ABSOLUTE, \
-	COLOR_RETENTION_RELATIVE, COLOR_STABILITY_AVERAGE
-from .translations import tr
+def _fold(model, use_numpy, reviews=(), workers=0):
+	"""
+	Incorpora as revisões ao modelo e retorna uma cópia do que vai para o snapshot, ou
+	None se ele não ganhou dias completos. A cópia pode ser gravada fora do lock.
+	"""
+	with render_timings.stage("sweep"):
+		folded = model.fold(use_numpy, reviews, workers)
+	if not folded:
+		return None
+	with render_timings.stage("snapshot"):
+		first_day_idx = model.first_day_idx()
+		return (model.day_cutoff_s, model.high_water_mark, first_day_idx, -1,
+				model.daily.to_columns(first_day_idx, -1), model.sweep.card_states(), model.history_start_day_idx)
 
 
-def get_card_category(revlog_type, last_interval_days):
-	if revlog_type in (0, 2, 3):  # Learn, Relearn, Cram
-		return CAT_LEARNING
-	if revlog_type == 1:  # Review
-		if last_interval_days <= INTERVAL_LEARNING_MAX:
-			return CAT_LEARNING
-		elif last_interval_days <= INTERVAL_YOUNG_MAX:
-			return CAT_YOUNG
-		elif last_interval_days <= INTERVAL_MATURE_MAX:
-			return CAT_MATURE
-		else:
-			return CAT_RETAINED
-	return CAT_LEARNING  # Default
+def _save(col, cache_key, revlog_query, snapshot_state):
+	if snapshot_state is not None:
+		with render_timings.stage("snapshot"):
+			snapshot_cache.save_snapshot(col, cache_key, revlog_query, *snapshot_state)
 
 
-def fsrs_retrievability(elapsed_days, stability):
+def _load_daily_series(col, revlog_query, cache_key, day_cutoff_s, graph_start_day_idx, windowed, use_numpy,
+					   batch_size, workers=0):
 	"""
-	Calcula a retrievability.
-	Para este gráfico, usamos a fórmula do FSRS-4.5 que é mais robusta
-	quando a estabilidade (S) é apenas uma aproximação (usando o ivl).
-	A fórmula do FSRS-6 é muito sensível e produz valores irrealistas sem a S real.
+	Séries diárias de `graph_start_day_idx` até hoje a partir do EvolutionModel do
+	conjunto de cartões.
+
+	O modelo em memória (mantido pelos hooks de warm_state) é usado sem nenhuma
+	consulta ao revlog. Sem ele, o snapshot em disco é carregado e só as revisões
+	posteriores ao seu high-water mark são lidas. Os dias completos são salvos de
+	volta no snapshot. Sem modelo nem snapshot, o histórico pode ser varrido em
+	`workers` processos. Retorna None se não houver revisões.
 	"""
-	if stability <= 0:
-		return 0.0
+	series = None
+	with warm_state.lock:
+		model = warm_state.get_model(cache_key)
+		if model is not None and model.rebase(day_cutoff_s) and model.covers(graph_start_day_idx):
+			snapshot_state = _fold(model, use_numpy)
+			with render_timings.stage("sweep"):
+				series = model.daily_series(graph_start_day_idx)
+	if series is not None:
+		# O arquivo é gravado depois de soltar o lock, para não atrasar os hooks do revisor na thread principal
+		_save(col, cache_key, revlog_query, snapshot_state)
+		return series
+
+	# Construído fora do lock para não bloquear os hooks do revisor; a geração
+	# impede guardar um modelo que tenha perdido uma resposta nesse meio tempo
+	generation = warm_state.generation()
+	with render_timings.stage("snapshot"):
+		snapshot = snapshot_cache.load_snapshot(col, cache_key, day_cutoff_s, revlog_query)
+	if snapshot is not None and (snapshot["history_start_day_idx"] is None or
+								 snapshot["history_start_day_idx"] <= graph_start_day_idx):
+		with render_timings.stage("snapshot"):
+			model = EvolutionModel(
+				day_cutoff_s,
+				DailySeries.from_columns(snapshot["first_day_idx"], snapshot["columns"]),
+				snapshot["card_states"],
+				snapshot["last_day_idx"],
+				snapshot["high_water_mark"],
+				snapshot["history_start_day_idx"]
+			)
+		reviews = revlog_sweep.iter_reviews(col, revlog_query, model.high_water_mark, day_cutoff_s * 1000, batch_size)
+	elif windowed:
+		# Sem snapshot que cubra o período, só a janela do gráfico é lida do revlog
+		model = EvolutionModel.for_window(day_cutoff_s, graph_start_day_idx)
+		reviews = revlog_sweep.iter_window_reviews(col, revlog_query, day_cutoff_s, graph_start_day_idx, batch_size)
+	else:
+		model = EvolutionModel(day_cutoff_s)
+		reviews = revlog_sweep.iter_window_reviews(col, revlog_query, day_cutoff_s, None, batch_size)
 
-	# Fórmula FSRS-4.5: R(t) = (1 + t / (9 * S)) ^ -1
-	return math.pow(1.0 + elapsed_days / (9.0 * stability), -1.0)
+	first_review, reviews = revlog_sweep.peek(reviews)
+	if first_review is None and model.is_empty():
+		return None
 
+	_save(col, cache_key, revlog_query, _fold(model, use_numpy, reviews, workers))
+	with render_timings.stage("sweep"):
+		series = model.daily_series(graph_start_day_idx)
+	warm_state.store_model(cache_key, model, revlog_query, generation)
+	return series
 
-def get_card_evolution_data(self_instance, graph_id="evolutionGraph"):
-	period_days = self_instance._periodDays()
 
-	try:
-		day_cutoff_s = self_instance.col.sched.day_cutoff
-	except AttributeError:
-		day_cutoff_s = self_instance.col.sched.dayCutoff
+def get_deck_ids(self_instance):
+	"""
+	Decks cujos cartões entram no gráfico, ou None para a coleção inteira.
+	Nossa classe da tela principal informa os decks diretamente; na tela de
+	estatísticas do Anki são os decks ativos, a menos que a coleção inteira esteja selecionada.
+	"""
+	if hasattr(self_instance, "_deck_ids"):
+		return self_instance._deck_ids()
+	if getattr(self_instance, "wholeCollection", False):
+		return None
+	return list(self_instance.col.decks.active())
+
 
+def _max_points(self_instance, config):
+	# Limite de pontos por série: da tela principal (nossa classe) ou da tela de estatísticas
+	if hasattr(self_instance, '_deck_id'):
+		return config.main_screen_max_points
+	return config.stats_screen_max_points
+
+
+def _aggregation_chunk_days(self_instance, config):
 	# Verificar se é tela principal (CompleteCollectionStats) e aplicar configuração
 	is_main_screen = hasattr(self_instance, '_deck_id')  # Nossa classe customizada tem este atributo
 
@@ -53,8 +119,7 @@ def get_card_evolution_data(self_instance, graph_id="evolutionGraph"):
 	# Para tela principal, usar configuração do addon
 	if is_main_screen:
 		# Lógica para tela principal (mantém a configuração do addon)
-		config = mw.addonManager.getConfig(__name__)
-		aggregation_config = config.get("main_screen_aggregation")
+		aggregation_config = config.main_screen_aggregation
 
 		if aggregation_config == "d":
 			aggregation_chunk_days = 1
@@ -86,213 +151,168 @@ def get_card_evolution_data(self_instance, graph_id="evolutionGraph"):
 				aggregation_chunk_days = 7
 			else:
 				aggregation_chunk_days = 30
+	return aggregation_chunk_days
 
-	unit_suffix = "d"
-	if aggregation_chunk_days == 7:
-		unit_suffix = "w"
-	elif aggregation_chunk_days >= 28:  # Inclui 30 e outros próximos para "mês"
-		unit_suffix = "m"
-
-	end_date_timestamp_ms = day_cutoff_s * 1000
-	graph_start_day_idx = 0
-
-	revlog_deck_tag_filter_sql = self_instance._revlogLimit()
-
-	if period_days is not None and period_days > 0:
-		graph_start_day_idx = -(period_days - 1)
-	else:  # Deck life ou period_days é 0 ou None
-		first_rev_query_conditions = []
-		if revlog_deck_tag_filter_sql:
-			first_rev_query_conditions.append(revlog_deck_tag_filter_sql)
-		first_rev_query = "SELECT MIN(id) FROM revlog"
-		if first_rev_query_conditions:
-			first_rev_query += " WHERE " + " AND ".join(first_rev_query_conditions)
-		min_revlog_id_ms = self_instance.col.db.scalar(first_rev_query)
-		if not min_revlog_id_ms:  # Se não há revisões, retorna dados vazios
-			return [], {}, "", aggregation_chunk_days
-		days_ago = (day_cutoff_s - (min_revlog_id_ms / 1000)) // 86400
-		graph_start_day_idx = -int(days_ago)
-
-	main_revlog_query_conditions = ["id < " + str(end_date_timestamp_ms)]
-	if revlog_deck_tag_filter_sql:
-		main_revlog_query_conditions.append(revlog_deck_tag_filter_sql)
-
-	config = mw.addonManager.getConfig(__name__)
-	exclude_deleted = config.get("exclude_deleted_cards")  # Padrão True se não encontrado
-	exclude_suspended = config.get("exclude_suspended_cards")  # Padrão False se não encontrado
-
-	if exclude_deleted:
-		main_revlog_query_conditions.append("cid IN (SELECT id FROM cards)")
-
-	if exclude_suspended:
-		main_revlog_query_conditions.append("cid IN (SELECT id FROM cards WHERE queue != -1)")
-
-	query = """
-        SELECT id, cid, type, ivl
-        FROM revlog
-        WHERE """ + " AND ".join(main_revlog_query_conditions) + """
-        ORDER BY id ASC
-    """
-	all_reviews = self_instance.col.db.all(query)
-
-	if not all_reviews:
-		return [], {}, "", aggregation_chunk_days
-
-	card_current_states = {}
-	daily_graph_data_points = {}
-	daily_etk_points = {}
-	daily_etk_percent_points = {}
-	daily_stability_points = {}
-
-	current_rev_idx = 0
-	for day_offset in range(graph_start_day_idx, 1):  # Itera dia a dia
-		current_day_end_ts_ms = (day_cutoff_s + (day_offset * 86400)) * 1000
-		if day_offset == 0:  # Hoje
-			current_day_end_ts_ms = end_date_timestamp_ms
-
-		processed_reviews_on_this_day_iteration = False
-		while current_rev_idx < len(all_reviews):
-			rev_id_ms, cid, rev_type, rev_ivl = all_reviews[current_rev_idx]
-			if rev_id_ms < current_day_end_ts_ms:
-				cat = get_card_category(rev_type, rev_ivl)
-				card_current_states[cid] = {
-					'category': cat,
-					'ivl': rev_ivl,
-					'last_rev_time': rev_id_ms
-				}
-				current_rev_idx += 1
-				processed_reviews_on_this_day_iteration = True
-			else:
-				break
-
-		daily_graph_data_points[day_offset] = {
-			CAT_LEARNING: 0, CAT_YOUNG: 0, CAT_MATURE: 0, CAT_RETAINED: 0
-		}
-
-		# Laço unificado para cálculo
-		total_retrievability_for_day = 0
-		active_cards_for_etk = 0
-		total_stability_for_day = 0
-		day_counts_recalc = {CAT_LEARNING: 0, CAT_YOUNG: 0, CAT_MATURE: 0, CAT_RETAINED: 0}
-
-		for cid, state in card_current_states.items():
-			if state['last_rev_time'] < current_day_end_ts_ms:
-				active_cards_for_etk += 1
-				day_counts_recalc[state['category']] += 1
-
-				last_rev_day_s = state['last_rev_time'] / 1000
-				last_rev_day_idx = int((last_rev_day_s - day_cutoff_s) / 86400)
-
-				days_since_review = day_offset - last_rev_day_idx
-				if days_since_review < 0:
-					continue
-
-				stability = max(state['ivl'], 0.1)  # Usar ivl como aproximação de estabilidade, evitar divisão por zero
-				total_stability_for_day += stability
-
-				# Fórmula de Retrievability FSRS
-				retrievability = fsrs_retrievability(days_since_review, stability)
-				total_retrievability_for_day += retrievability
-
-		day_counts = day_counts_recalc
-
-		daily_etk_points[day_offset] = total_retrievability_for_day
-		if active_cards_for_etk > 0:
-			daily_etk_percent_points[day_offset] = (total_retrievability_for_day / active_cards_for_etk) * 100
-		else:
-			daily_etk_percent_points[day_offset] = 0
-
-		if day_offset > graph_start_day_idx and not processed_reviews_on_this_day_iteration:
-			if (day_offset - 1) in daily_graph_data_points:
-				daily_graph_data_points[day_offset] = daily_graph_data_points[day_offset - 1].copy()
-		else:
-			daily_graph_data_points[day_offset] = day_counts
-
-		if active_cards_for_etk > 0:
-			daily_stability_points[day_offset] = total_stability_for_day / active_cards_for_etk
-		else:
-			daily_stability_points[day_offset] = 0
-
-	# Certificar que o dia 0 (hoje) tem os dados corretos finais
-	final_day_counts = {CAT_LEARNING: 0, CAT_YOUNG: 0, CAT_MATURE: 0, CAT_RETAINED: 0}
-	for card_id, state in card_current_states.items():
-		if state['last_rev_time'] < end_date_timestamp_ms:
-			final_day_counts[state['category']] += 1
-	daily_graph_data_points[0] = final_day_counts
-
-	# Agregar dados diários em chunks (semanas, meses)
-	aggregated_flot_data = {CAT_LEARNING: {}, CAT_YOUNG: {}, CAT_MATURE: {}, CAT_RETAINED: {}}
-	aggregated_etk_data = {}
-	aggregated_etk_absolute_data = {}
-	aggregated_etk_percent_data = {}
-	aggregated_avg_stability_data = {}
-	etk_absolute_temp_accumulator = {}
-	etk_percent_temp_accumulator = {}
-	avg_stability_temp_accumulator = {}
-
-	for day_idx in sorted(daily_graph_data_points.keys()):
-		x_flot_chunk_idx = -math.floor(-day_idx / aggregation_chunk_days)
 
-		aggregated_flot_data[CAT_LEARNING][x_flot_chunk_idx] = daily_graph_data_points[day_idx][CAT_LEARNING]
-		aggregated_flot_data[CAT_YOUNG][x_flot_chunk_idx] = daily_graph_data_points[day_idx][CAT_YOUNG]
-		aggregated_flot_data[CAT_MATURE][x_flot_chunk_idx] = daily_graph_data_points[day_idx][CAT_MATURE]
-		aggregated_flot_data[CAT_RETAINED][x_flot_chunk_idx] = daily_graph_data_points[day_idx][CAT_RETAINED]
-
-		aggregated_etk_data[x_flot_chunk_idx] = daily_etk_points.get(day_idx, 0)
-
-		if x_flot_chunk_idx not in etk_absolute_temp_accumulator:
-			etk_absolute_temp_accumulator[x_flot_chunk_idx] = []
-		etk_absolute_temp_accumulator[x_flot_chunk_idx].append(daily_etk_points.get(day_idx, 0))
+def get_card_evolution_data(self_instance, graph_id="evolutionGraph", config=None):
+	if config is None:
+		config = get_config()
+	period_days = self_instance._periodDays()
+	day_cutoff_s = revlog_sweep.day_cutoff(self_instance.col)
+	aggregation_chunk_days = _aggregation_chunk_days(self_instance, config)
+	no_data = ([], {}, {}, aggregation_chunk_days, "")
+
+	# Filtros sobre o cartão (deck, excluídos, suspensos) compartilhados pela sonda de MIN(id) e pela varredura
+	revlog_query = RevlogQuery(get_deck_ids(self_instance), config.exclude_deleted_cards, config.exclude_suspended_cards)
+
+	graph_window = revlog_sweep.graph_window(self_instance.col, revlog_query, day_cutoff_s, period_days)
+	if graph_window is None:
+		return no_data
+	graph_start_day_idx, windowed = graph_window
+
+	# "auto" e "numpy" usam o backend vetorizado quando o NumPy está disponível
+	use_numpy = NUMPY_AVAILABLE and config.evolution_backend != "python"
+	batch_size = config.revlog_batch_size
+	# Varredura em vários processos (0 ou 1 = no próprio processo)
+	workers = config.parallel_workers
+
+	if config.snapshot_cache:
+		cache_key = snapshot_cache.make_cache_key(self_instance.col.path, revlog_query)
+		daily = _load_daily_series(
+			self_instance.col, revlog_query, cache_key, day_cutoff_s, graph_start_day_idx, windowed, use_numpy,
+			batch_size, workers)
+		if daily is None:
+			return no_data
+	else:
+		daily = revlog_sweep.sweep_window(
+			self_instance.col, revlog_query, day_cutoff_s, graph_start_day_idx, windowed, use_numpy, batch_size, workers)
+		if daily is None:
+			return no_data
 
-		if x_flot_chunk_idx not in etk_percent_temp_accumulator:
-			etk_percent_temp_accumulator[x_flot_chunk_idx] = []
-		etk_percent_temp_accumulator[x_flot_chunk_idx].append(daily_etk_percent_points.get(day_idx, 0))
+	return build_graph_data(daily, day_cutoff_s, graph_start_day_idx, aggregation_chunk_days, graph_id, config,
+							_max_points(self_instance, config))
 
-		if x_flot_chunk_idx not in avg_stability_temp_accumulator:
-			avg_stability_temp_accumulator[x_flot_chunk_idx] = []
-		avg_stability_temp_accumulator[x_flot_chunk_idx].append(daily_stability_points.get(day_idx, 0))
 
-	for chunk_idx, values in etk_absolute_temp_accumulator.items():
-		aggregated_etk_absolute_data[chunk_idx] = daily_etk_points.get(chunk_idx, 0)
+def get_card_evolution_data_batch(self_instance, deck_id_sets, graph_id="evolutionGraph", config=None):
+	"""
+	Como `get_card_evolution_data`, mas para a coleção inteira e para cada conjunto de
+	decks de `deck_id_sets` ao mesmo tempo, com uma única passada pelo revlog.
+	Retorna o resultado da coleção (gráfico `graph_id`) e a lista de resultados dos
+	conjuntos, na mesma ordem (gráficos `graph_id` + "_" + posição).
+	"""
+	if config is None:
+		config = get_config()
+	period_days = self_instance._periodDays()
+	day_cutoff_s = revlog_sweep.day_cutoff(self_instance.col)
+	aggregation_chunk_days = _aggregation_chunk_days(self_instance, config)
+	no_data = ([], {}, {}, aggregation_chunk_days, "")
+
+	# Todos os gráficos compartilham o eixo x da coleção inteira (em "deck_life", um deck
+	# mais novo que a coleção começa com dias zerados)
+	revlog_query = RevlogQuery(None, config.exclude_deleted_cards, config.exclude_suspended_cards)
+	graph_window = revlog_sweep.graph_window(self_instance.col, revlog_query, day_cutoff_s, period_days)
+	if graph_window is None:
+		return no_data, [no_data for _ in deck_id_sets]
+	graph_start_day_idx, windowed = graph_window
+
+	all_reviews = revlog_sweep.iter_window_reviews(
+		self_instance.col, revlog_query, day_cutoff_s, graph_start_day_idx if windowed else None,
+		config.revlog_batch_size, with_deck=True)
+	with render_timings.stage("sweep"):
+		collection_daily, deck_dailies = sweep_card_states_by_deck(
+			all_reviews, day_cutoff_s, graph_start_day_idx, deck_id_sets)
+
+	max_points = _max_points(self_instance, config)
+	collection_data = build_graph_data(
+		collection_daily, day_cutoff_s, graph_start_day_idx, aggregation_chunk_days, graph_id, config, max_points)
+	# Os gráficos dos decks ocupam cerca de um terço da largura
+	deck_data = [build_graph_data(daily, day_cutoff_s, graph_start_day_idx, aggregation_chunk_days,
+								  graph_id + "_" + str(pos), config, max_points // 3) if daily is not None else no_data
+				 for pos, daily in enumerate(deck_dailies)]
+	return collection_data, deck_data
+
+
+def build_graph_data(daily, day_cutoff_s, graph_start_day_idx, aggregation_chunk_days, graph_id, config, max_points=0):
+	"""
+	Séries do Flot, opções, dados do tooltip e rótulo do eixo secundário a partir das
+	séries diárias. Com `max_points`, cada série é reduzida a no máximo esse número de pontos.
+	"""
+	with render_timings.stage("aggregation"):
+		return _build_graph_data(daily, day_cutoff_s, graph_start_day_idx, aggregation_chunk_days, graph_id, config,
+								 max_points)
 
-	for chunk_idx, values in etk_percent_temp_accumulator.items():
-		aggregated_etk_percent_data[chunk_idx] = sum(values) / len(values) if values else 0
 
-	for chunk_idx, values in avg_stability_temp_accumulator.items():
-		aggregated_avg_stability_data[chunk_idx] = sum(values) / len(values) if values else 0
+def _build_graph_data(daily, day_cutoff_s, graph_start_day_idx, aggregation_chunk_days, graph_id, config, max_points):
+	unit_suffix = "d"
+	if aggregation_chunk_days == 7:
+		unit_suffix = "w"
+	elif aggregation_chunk_days >= 28:  # Inclui 30 e outros próximos para "mês"
+		unit_suffix = "m"
 
+	# Agregar dados diários em chunks (semanas, meses)
 	series = []
 	data_learning, data_young, data_mature, data_retained, data_etk_absolute, data_etk_percent, data_avg_stability  = [], [], [], [], [], [], []
-
-	all_x_flot_chunk_indices = sorted(list(set(aggregated_etk_data.keys())))
+	all_x_flot_chunk_indices = []
+
+	for x_chunk_idx, chunk_counts, etk, etk_percent, avg_stability in daily.rollup(aggregation_chunk_days):
+		all_x_flot_chunk_indices.append(x_chunk_idx)
+		data_learning.append([x_chunk_idx, chunk_counts[CAT_LEARNING]])
+		data_young.append([x_chunk_idx, chunk_counts[CAT_YOUNG]])
+		data_mature.append([x_chunk_idx, chunk_counts[CAT_MATURE]])
+		data_retained.append([x_chunk_idx, chunk_counts[CAT_RETAINED]])
+		data_etk_absolute.append([x_chunk_idx, etk])
+		data_etk_percent.append([x_chunk_idx, etk_percent])
+		data_avg_stability.append([x_chunk_idx, avg_stability])
 
 	if not all_x_flot_chunk_indices and graph_start_day_idx == 0:
 		all_x_flot_chunk_indices.append(0)
-
-	for x_chunk_idx in all_x_flot_chunk_indices:
-		data_learning.append([x_chunk_idx, aggregated_flot_data[CAT_LEARNING].get(x_chunk_idx, 0)])
-		data_young.append([x_chunk_idx, aggregated_flot_data[CAT_YOUNG].get(x_chunk_idx, 0)])
-		data_mature.append([x_chunk_idx, aggregated_flot_data[CAT_MATURE].get(x_chunk_idx, 0)])
-		data_retained.append([x_chunk_idx, aggregated_flot_data[CAT_RETAINED].get(x_chunk_idx, 0)])
-		data_etk_absolute.append([x_chunk_idx, aggregated_etk_absolute_data.get(x_chunk_idx, 0)])
-		data_etk_percent.append([x_chunk_idx, aggregated_etk_percent_data.get(x_chunk_idx, 0)])
-		data_avg_stability.append([x_chunk_idx, aggregated_avg_stability_data.get(x_chunk_idx, 0)])
-
-
-	config = mw.addonManager.getConfig(__name__)
-
-	if not config.get("hide_retained"):
+		for data in (data_learning, data_young, data_mature, data_retained, data_etk_absolute, data_etk_percent, data_avg_stability):
+			data.append([0, 0])
+
+	# Com mais blocos do que pontos, cada balde vira uma barra (o pico) e um ponto de cada linha (LTTB).
+	# A barra fica no x do pico, com a largura de um bloco: as larguras dos baldes variam e não caberiam nela.
+	bar_width = 0.9
+	tooltip_etk_absolute, tooltip_avg_stability = data_etk_absolute, data_avg_stability
+	tooltip_counts = None
+	bounds = bucket_bounds(len(all_x_flot_chunk_indices), max_points)
+	if bounds:
+		totals = [learning[1] + young[1] + mature[1] + retained[1]
+				  for learning, young, mature, retained in zip(data_learning, data_young, data_mature, data_retained)]
+		bar_indices = peak_indices(totals, bounds)
+		etk_absolute_indices, etk_percent_indices, avg_stability_indices = [
+			lttb_indices(all_x_flot_chunk_indices, [point[1] for point in data], bounds)
+			for data in (data_etk_absolute, data_etk_percent, data_avg_stability)]
+		# O tooltip precisa dos valores em todos os x desenhados, seja de barra ou de linha
+		tooltip_indices = sorted(set(bar_indices).union(etk_absolute_indices, etk_percent_indices, avg_stability_indices))
+		tooltip_etk_absolute = [data_etk_absolute[idx] for idx in tooltip_indices]
+		tooltip_avg_stability = [data_avg_stability[idx] for idx in tooltip_indices]
+		# Nos x só de linha não há barra: as contagens do tooltip vêm da série completa
+		tooltip_counts = {
+			label: [data[idx] for idx in tooltip_indices]
+			for label, data, hidden in ((tr("label_learning"), data_learning, config.hide_learning),
+										(tr("label_young"), data_young, config.hide_young),
+										(tr("label_mature"), data_mature, config.hide_mature),
+										(tr("label_retained"), data_retained, config.hide_retained))
+			if not hidden}
+
+		data_learning, data_young, data_mature, data_retained = [
+			[data[idx] for idx in bar_indices] for data in (data_learning, data_young, data_mature, data_retained)]
+		data_etk_absolute = [data_etk_absolute[idx] for idx in etk_absolute_indices]
+		data_etk_percent = [data_etk_percent[idx] for idx in etk_percent_indices]
+		data_avg_stability = [data_avg_stability[idx] for idx in avg_stability_indices]
+
+	if not config.hide_retained:
 		series.append(
 			{"data": data_retained, "label": tr("label_retained"), "color": COLOR_RETAINED, "bars": {"order": 1}})
-	if not config.get("hide_mature"):
+	if not config.hide_mature:
 		series.append({"data": data_mature, "label": tr("label_mature"), "color": COLOR_MATURE, "bars": {"order": 2}})
-	if not config.get("hide_young"):
+	if not config.hide_young:
 		series.append({"data": data_young, "label": tr("label_young"), "color": COLOR_YOUNG, "bars": {"order": 3}})
-	if not config.get("hide_learning"):
+	if not config.hide_learning:
 		series.append(
 			{"data": data_learning, "label": tr("label_learning"), "color": COLOR_LEARNING, "bars": {"order": 4}})
 
-	if not config.get("hide_total_knowledge_graph"):
+	if not config.hide_total_knowledge_graph:
 		series.append({
 			"data": data_etk_absolute,
 			"label": tr("label_total_knowledge"),
@@ -306,11 +326,11 @@ def get_card_evolution_data(self_instance, graph_id="evolutionGraph"):
 	y2label = ""
 	is_showing_y2 = False
 	y2_max = None
-	if not config.get("secondary_axis_dynamic_max"):
-		y2_max = config.get("secondary_axis_maximum_value")
+	if not config.secondary_axis_dynamic_max:
+		y2_max = config.secondary_axis_maximum_value
 
 
-	secondary_graph = config.get("secondary_graph")
+	secondary_graph = config.secondary_graph
 	if secondary_graph == 'retention_relative':
 		series.append({
 			"data": data_etk_percent,
@@ -348,119 +368,32 @@ def get_card_evolution_data(self_instance, graph_id="evolutionGraph"):
 	xaxis_min = min_x_val_for_axis - 0.5
 	xaxis_max = max_x_val_for_axis + 0.5
 
-	tr_today = tr("label_today")
-	use_absolute_dates = config.get("use_absolute_dates")
-
-	month_translations = []
-	for i in range(1, 13):
-		month_key = ["month_jan", "month_feb", "month_mar", "month_apr", "month_may", "month_jun",
-					 "month_jul", "month_aug", "month_sep", "month_oct", "month_nov", "month_dec"][i - 1]
-		month_translations.append(tr(month_key))
-
-	months_js_array = '["' + '", "'.join(month_translations) + '"]'
-
-	if use_absolute_dates:
-		tick_formatter_js = f"""
-function(val, axis) {{
-    if (Math.abs(val - 0) < 0.0001) {{ return '{tr_today}'; }}
-    var date = new Date(({day_cutoff_s} + (val * {aggregation_chunk_days} * 86400)) * 1000);
-    var months = {months_js_array};
-    return months[date.getMonth()] + ' ' + date.getDate();
-}}
-"""
-	else:
-		tick_formatter_js = f"""
-function(val, axis) {{
-    var suffix = '{unit_suffix}';
-    if (Math.abs(val - 0) < 0.0001) {{ return '{tr_today}'; }}
-    return val.toFixed(axis.options.tickDecimals === undefined ? 0 : axis.options.tickDecimals) + suffix;
-}}
-"""
-
-	etk_percent_data_json = json.dumps(aggregated_etk_percent_data)
-	etk_abs_data_json = json.dumps(aggregated_etk_data)
-	stability_avg_data_json = json.dumps(aggregated_avg_stability_data)
-
-	tooltip_html = f"""
-<script>
-$(function() {{
-    var etkAbsData = {etk_abs_data_json};
-    var etkStabData = {stability_avg_data_json};
-    var tooltip = $("#evolutionGraphTooltip");
-    if (!tooltip.length) {{
-        tooltip = $('<div id="evolutionGraphTooltip" style="position:absolute;display:none;padding:8px;background-color:#fff;border:1px solid #ddd;color:#333;border-radius:4px;box-shadow:0 2px 5px rgba(0,0,0,0.1);pointer-events:none;font-size:0.9em;z-index:100;"></div>').appendTo("body");
-    }}
-    $("#{graph_id}").bind("plothover", function (event, pos, item) {{
-        if (item) {{
-            var x_val_on_axis = item.datapoint[0];
-            var totalForDay = 0;
-            var etkAbsValue = "N/A";
-            var etkPercentValue = "N/A";
-            var etkAvgValue = "N/A";
-
-            var plot = $(this).data("plot");
-            var allSeries = plot.getData();
-            var pointData = {{}};
-
-            for(var i=0; i < allSeries.length; ++i){{
-                 var currentSeries = allSeries[i];
-                 if (!currentSeries.label) continue;
-                for(var j=0; j < currentSeries.data.length; ++j){{
-                    var d = currentSeries.data[j];
-                    if(Math.abs(d[0] - x_val_on_axis) < 0.0001){{
-                         if(!pointData[x_val_on_axis]) pointData[x_val_on_axis] = {{}};
-                         pointData[x_val_on_axis][currentSeries.label] = d[1];
-                     }}
-                }}
-            }}
-
-            var today_str = '{tr_today}';
-            var titleX = item.series.xaxis.tickFormatter(x_val_on_axis, item.series.xaxis);
-
-            var content = "<b>{tr("tooltip_period")}" + titleX + "</b><br/>";
-            var labelLearning = "{tr("label_learning")}";
-            var labelYoung = "{tr("label_young")}";
-            var labelMature = "{tr("label_mature")}";
-            var labelRetained = "{tr("label_retained")}";
-            var labelRetentionPercent = "{tr("label_avg_retention_percent")}";
-
-            if(pointData[x_val_on_axis]){{
-                if(pointData[x_val_on_axis][labelLearning] !== undefined) totalForDay += pointData[x_val_on_axis][labelLearning];
-                if(pointData[x_val_on_axis][labelYoung] !== undefined) totalForDay += pointData[x_val_on_axis][labelYoung];
-                if(pointData[x_val_on_axis][labelMature] !== undefined) totalForDay += pointData[x_val_on_axis][labelMature];
-                if(pointData[x_val_on_axis][labelRetained] !== undefined) totalForDay += pointData[x_val_on_axis][labelRetained];
-                
-                if(etkAbsData[x_val_on_axis] !== undefined) {{
-                    etkAbsValue = etkAbsData[x_val_on_axis].toFixed(0);
-                    etkPercentValue = (100 * etkAbsData[x_val_on_axis] / totalForDay).toFixed(1)
-                }}
-                if(etkStabData[x_val_on_axis] !== undefined) {{
-                    etkAvgValue = etkStabData[x_val_on_axis].toFixed(0);
-                }}
-            }}
-            
-            content += labelLearning + ": " + (pointData[x_val_on_axis]?.[labelLearning]?.toFixed(0) || 0) + "<br/>";
-            content += labelYoung + ": " + (pointData[x_val_on_axis]?.[labelYoung]?.toFixed(0) || 0) + "<br/>";
-            content += labelMature + ": " + (pointData[x_val_on_axis]?.[labelMature]?.toFixed(0) || 0) + "<br/>";
-            content += labelRetained + ": " + (pointData[x_val_on_axis]?.[labelRetained]?.toFixed(0) || 0) + "<br/>";
-            content += "<i>{tr("tooltip_total")}" + totalForDay.toFixed(0) + "</i><br/><hr style='margin: 4px 0; border-top: 1px solid #ccc;'/>";
-            content += "<b>" + labelRetentionPercent + ": " + etkPercentValue + "</b><br/>";
-            content += "<b>{tr("label_total_knowledge")}: " + etkAbsValue + "</b><br/>";
-            content += "<b>{tr("label_avg_stability")}: " + etkAvgValue + "</b>";
-
-            tooltip.html(content).css({{top: item.pageY+5, left: item.pageX+5}}).fadeIn(200);
-        }} else {{
-            tooltip.hide();
-        }}
-    }});
-}});
-</script>
-"""
+	# Dados do tooltip (web/evolution_graph.js), com os valores no formato compacto de payload.py
+	tooltip = {
+		"labels": {
+			"period": tr("tooltip_period"),
+			"total": tr("tooltip_total"),
+			"learning": tr("label_learning"),
+			"young": tr("label_young"),
+			"mature": tr("label_mature"),
+			"retained": tr("label_retained"),
+			"retentionPercent": tr("label_avg_retention_percent"),
+			"totalKnowledge": tr("label_total_knowledge"),
+			"avgStability": tr("label_avg_stability"),
+		},
+	}
+	with render_timings.stage("serialization"):
+		tooltip["etkAbs"] = encode_points(tooltip_etk_absolute)
+		tooltip["stability"] = encode_points(tooltip_avg_stability)
+		if tooltip_counts is not None:
+			tooltip["counts"] = {label: encode_points(points) for label, points in tooltip_counts.items()}
+
 	graph_options = {
 		"xaxis": {
 			"min": xaxis_min,
 			"max": xaxis_max,
-			"tickFormatter": tick_formatter_js,
+			"aggregation_chunk_days": aggregation_chunk_days,
+			"unit_suffix": unit_suffix,
 		},
 		"yaxes": [
 			{"min": 0, "position": "left"},
@@ -471,7 +404,7 @@ $(function() {{
 			"bars": {
 				"show": True,
 				"align": "center",
-				"barWidth": 0.9,
+				"barWidth": bar_width,
 				"lineWidth": 1,
 				"fill": 0.8
 			}
@@ -484,4 +417,4 @@ $(function() {{
 			"backgroundOpacity": 0
 		}
 	}
-	return series, graph_options, tooltip_html, aggregation_chunk_days, y2label
+	return series, graph_options, tooltip, aggregation_chunk_days, y2label
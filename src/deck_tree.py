@@ -0,0 +1,66 @@
+"""
+Índice da árvore de decks: id do deck -> ids do próprio deck e de todos os descendentes.
+
+O índice é montado uma vez a partir dos nomes dos decks ("Pai::Filho::Neto") e
+reaproveitado por todos os renders, em vez de chamar `col.decks.children` a cada
+gráfico. Ele é descartado quando uma operação mexe em decks (criação, renomeação,
+exclusão, mudança de posição na árvore), após a sincronização e ao trocar de coleção.
+"""
+from aqt import gui_hooks
+
+_index = None  # (coleção, {did: tupla ordenada de ids})
+
+
+def _all_names_and_ids(col):
+	try:
+		return [(deck.name, deck.id) for deck in col.decks.all_names_and_ids()]
+	except AttributeError:
+		# Versões antigas do Anki
+		return [(deck["name"], deck["id"]) for deck in col.decks.all()]
+
+
+def _build_index(col):
+	names_and_ids = _all_names_and_ids(col)
+	ids_by_name = {name: did for name, did in names_and_ids}
+	descendants = {did: [did] for _, did in names_and_ids}
+	for name, did in names_and_ids:
+		# Cada deck entra na lista de todos os seus ancestrais, não só na do pai
+		parent_name = name
+		while "::" in parent_name:
+			parent_name = parent_name.rsplit("::", 1)[0]
+			parent_id = ids_by_name.get(parent_name)
+			if parent_id is not None:
+				descendants[parent_id].append(did)
+	return {did: tuple(sorted(ids)) for did, ids in descendants.items()}
+
+
+def deck_and_descendant_ids(col, deck_id):
+	"""Ids do deck e de todos os seus subdecks (em qualquer nível), em ordem crescente."""
+	global _index
+	index = _index
+	if index is None or index[0] is not col:
+		index = (col, _build_index(col))
+		_index = index
+	# Um deck que não existe mais continua restrito a ele mesmo (nenhum cartão)
+	return index[1].get(deck_id, (deck_id,))
+
+
+def invalidate_deck_tree(*args, **kwargs):
+	global _index
+	_index = None
+
+
+def on_operation_did_execute(changes, handler):
+	if getattr(changes, "deck", False):
+		invalidate_deck_tree()
+
+
+def init_deck_tree_hooks():
+	"""Registers the hooks that drop the deck tree index when decks change.
+	Registra os hooks que descartam o índice da árvore de decks quando os decks mudam."""
+	gui_hooks.operation_did_execute.append(on_operation_did_execute)
+	gui_hooks.sync_did_finish.append(invalidate_deck_tree)
+	gui_hooks.profile_will_close.append(invalidate_deck_tree)
+	# Versões mais antigas do Anki, onde as mudanças de deck terminam com mw.reset() em vez de uma operação
+	if hasattr(gui_hooks, "state_did_reset"):
+		gui_hooks.state_did_reset.append(invalidate_deck_tree)
@@ -0,0 +1,53 @@
+"""
+Redução do número de pontos enviados ao Flot quando há mais pontos do que pixels.
+
+As duas funções recebem a mesma divisão em baldes (`bucket_bounds`): o primeiro e o
+último ponto ficam sempre, e os demais são repartidos em baldes consecutivos de
+tamanho quase igual. Cada balde contribui com um ponto, escolhido por
+Largest-Triangle-Three-Buckets nas linhas e pelo pico nas barras empilhadas.
+"""
+
+
+def bucket_bounds(point_count, max_points):
+	"""Intervalos [início, fim) dos baldes, ou None se os pontos já cabem em `max_points`."""
+	if not max_points or point_count <= max_points:
+		return None
+	max_points = max(max_points, 3)
+	every = (point_count - 2) / (max_points - 2)
+	bounds = [(0, 1)]
+	for bucket in range(max_points - 2):
+		bounds.append((int(bucket * every) + 1, int((bucket + 1) * every) + 1))
+	bounds.append((point_count - 1, point_count))
+	return bounds
+
+
+def lttb_indices(xs, ys, bounds):
+	"""
+	Índices escolhidos por Largest-Triangle-Three-Buckets: em cada balde, o ponto que
+	forma o maior triângulo com o ponto escolhido no balde anterior e a média do
+	balde seguinte, o que preserva a forma da linha.
+	"""
+	selected = [0]
+	previous = 0
+	for bucket in range(1, len(bounds) - 1):
+		start, end = bounds[bucket]
+		next_start, next_end = bounds[bucket + 1]
+		next_count = next_end - next_start
+		avg_x = sum(xs[next_start:next_end]) / next_count
+		avg_y = sum(ys[next_start:next_end]) / next_count
+		prev_x, prev_y = xs[previous], ys[previous]
+		best_idx, best_area = start, -1.0
+		for idx in range(start, end):
+			# Dobro da área do triângulo (o fator 1/2 não muda a escolha)
+			area = abs((prev_x - avg_x) * (ys[idx] - prev_y) - (prev_x - xs[idx]) * (avg_y - prev_y))
+			if area > best_area:
+				best_idx, best_area = idx, area
+		selected.append(best_idx)
+		previous = best_idx
+	selected.append(len(xs) - 1)
+	return selected
+
+
+def peak_indices(totals, bounds):
+	"""Índice do maior total de cada balde, para que nenhum pico das barras desapareça."""
+	return [max(range(start, end), key=totals.__getitem__) for start, end in bounds]
@@ -0,0 +1,536 @@
+"""
+Núcleo do cálculo do gráfico, sem dependências do Anki: categorias dos cartões,
+retrievability, a varredura do histórico dia a dia, as séries diárias com a
+agregação em blocos e o modelo incremental. Recebe revisões (id, cid, type, ivl) já
+lidas do revlog; a leitura, o cache e o config ficam em data_processing.py.
+"""
+import itertools
+import math
+from array import array
+
+from .constants import CAT_LEARNING, INTERVAL_LEARNING_MAX, INTERVAL_YOUNG_MAX, CAT_YOUNG, INTERVAL_MATURE_MAX, \
+	CAT_MATURE, CAT_RETAINED
+from .numpy_backend import latest_reviews, reviews_array, sweep_card_states_numpy
+
+
+def get_card_category(revlog_type, last_interval_days):
+	if revlog_type in (0, 2, 3):  # Learn, Relearn, Cram
+		return CAT_LEARNING
+	if revlog_type == 1:  # Review
+		if last_interval_days <= INTERVAL_LEARNING_MAX:
+			return CAT_LEARNING
+		elif last_interval_days <= INTERVAL_YOUNG_MAX:
+			return CAT_YOUNG
+		elif last_interval_days <= INTERVAL_MATURE_MAX:
+			return CAT_MATURE
+		else:
+			return CAT_RETAINED
+	return CAT_LEARNING  # Default
+
+
+def fsrs_retrievability(elapsed_days, stability):
+	"""
+	Calcula a retrievability.
+	Para este gráfico, usamos a fórmula do FSRS-4.5 que é mais robusta
+	quando a estabilidade (S) é apenas uma aproximação (usando o ivl).
+	A fórmula do FSRS-6 é muito sensível e produz valores irrealistas sem a S real.
+	"""
+	if stability <= 0:
+		return 0.0
+
+	# Fórmula FSRS-4.5: R(t) = (1 + t / (9 * S)) ^ -1
+	return math.pow(1.0 + elapsed_days / (9.0 * stability), -1.0)
+
+
+def _stability_of(ivl):
+	# Usar ivl como aproximação de estabilidade, evitar divisão por zero
+	return max(ivl, 0.1)
+
+
+class RetrievabilityBuckets:
+	"""
+	Agrupa os cartões ativos por (dia da última revisão, estabilidade).
+	A retrievability de todos os cartões de um balde é a mesma em um dado dia, então
+	o ETK diário custa uma avaliação por balde em vez de uma por cartão.
+	"""
+
+	def __init__(self):
+		self._counts = {}
+
+	def add(self, last_rev_day_idx, stability):
+		key = (last_rev_day_idx, stability)
+		self._counts[key] = self._counts.get(key, 0) + 1
+
+	def remove(self, last_rev_day_idx, stability):
+		key = (last_rev_day_idx, stability)
+		remaining = self._counts[key] - 1
+		if remaining:
+			self._counts[key] = remaining
+		else:
+			del self._counts[key]
+
+	def shift(self, days):
+		"""Reindexa os baldes quando o day_cutoff de referência avança `days` dias."""
+		self._counts = {(last_rev_day_idx - days, stability): count
+						for (last_rev_day_idx, stability), count in self._counts.items()}
+
+	def total_retrievability(self, day_offset):
+		total = 0
+		for (last_rev_day_idx, stability), count in self._counts.items():
+			days_since_review = day_offset - last_rev_day_idx
+			if days_since_review < 0:
+				continue
+			total += count * fsrs_retrievability(days_since_review, stability)
+		return total
+
+
+def _last_rev_day_idx(rev_id_ms, day_cutoff_s):
+	return int((rev_id_ms / 1000 - day_cutoff_s) / 86400)
+
+
+class DailySeries:
+	"""
+	Séries diárias indexadas pelo deslocamento do dia (0 = hoje): contagens por
+	categoria, ETK absoluto, ETK em % e estabilidade média. Os dias são contínuos.
+	"""
+
+	def __init__(self, counts=None, etk=None, etk_percent=None, stability=None):
+		self.counts = counts if counts is not None else {}
+		self.etk = etk if etk is not None else {}
+		self.etk_percent = etk_percent if etk_percent is not None else {}
+		self.stability = stability if stability is not None else {}
+		self._prefix_sums = None
+
+	def record(self, day_offset, day_counts, total_retrievability, active_cards, total_stability):
+		self._prefix_sums = None
+		self.counts[day_offset] = day_counts.copy()
+		self.etk[day_offset] = total_retrievability
+		if active_cards > 0:
+			self.etk_percent[day_offset] = (total_retrievability / active_cards) * 100
+			self.stability[day_offset] = total_stability / active_cards
+		else:
+			self.etk_percent[day_offset] = 0
+			self.stability[day_offset] = 0
+
+	def window(self, first_day_idx, last_day_idx=0):
+		"""Recorta os dias [first_day_idx, last_day_idx]; dias sem histórico ficam zerados."""
+		window = DailySeries()
+		empty_counts = {CAT_LEARNING: 0, CAT_YOUNG: 0, CAT_MATURE: 0, CAT_RETAINED: 0}
+		for day_offset in range(first_day_idx, last_day_idx + 1):
+			if day_offset in self.counts:
+				window.counts[day_offset] = self.counts[day_offset]
+				window.etk[day_offset] = self.etk[day_offset]
+				window.etk_percent[day_offset] = self.etk_percent[day_offset]
+				window.stability[day_offset] = self.stability[day_offset]
+			else:
+				window.record(day_offset, empty_counts, 0, 0, 0)
+		return window
+
+	def to_columns(self, first_day_idx, last_day_idx):
+		days = range(first_day_idx, last_day_idx + 1)
+		return {
+			"counts": [[self.counts[day_offset][cat] for day_offset in days]
+					   for cat in (CAT_LEARNING, CAT_YOUNG, CAT_MATURE, CAT_RETAINED)],
+			"etk": [self.etk[day_offset] for day_offset in days],
+			"etk_percent": [self.etk_percent[day_offset] for day_offset in days],
+			"stability": [self.stability[day_offset] for day_offset in days],
+		}
+
+	@classmethod
+	def from_columns(cls, first_day_idx, columns):
+		series = cls()
+		learning, young, mature, retained = columns["counts"]
+		for pos, day_offset in enumerate(range(first_day_idx, first_day_idx + len(columns["etk"]))):
+			series.counts[day_offset] = {
+				CAT_LEARNING: learning[pos], CAT_YOUNG: young[pos], CAT_MATURE: mature[pos], CAT_RETAINED: retained[pos]
+			}
+			series.etk[day_offset] = columns["etk"][pos]
+			series.etk_percent[day_offset] = columns["etk_percent"][pos]
+			series.stability[day_offset] = columns["stability"][pos]
+		return series
+
+	def shifted(self, days):
+		"""Cópia com os índices reescritos para um day_cutoff `days` dias à frente."""
+		return DailySeries(
+			{day_offset - days: value for day_offset, value in self.counts.items()},
+			{day_offset - days: value for day_offset, value in self.etk.items()},
+			{day_offset - days: value for day_offset, value in self.etk_percent.items()},
+			{day_offset - days: value for day_offset, value in self.stability.items()}
+		)
+
+	def update(self, other):
+		self._prefix_sums = None
+		self.counts.update(other.counts)
+		self.etk.update(other.etk)
+		self.etk_percent.update(other.etk_percent)
+		self.stability.update(other.stability)
+
+	def _days_and_prefix_sums(self):
+		# Somas prefixadas de ETK em % e estabilidade, montadas uma vez por série
+		if self._prefix_sums is None:
+			days = sorted(self.counts)
+			self._prefix_sums = (
+				days,
+				list(itertools.accumulate((self.etk_percent.get(day_offset, 0) for day_offset in days), initial=0)),
+				list(itertools.accumulate((self.stability.get(day_offset, 0) for day_offset in days), initial=0)),
+			)
+		return self._prefix_sums
+
+	def rollup(self, chunk_days):
+		"""
+		Agrega os dias em blocos de `chunk_days`; o bloco c cobre os dias
+		(c - 1) * chunk_days + 1 até c * chunk_days, então o bloco 0 termina hoje.
+		Contagens e ETK absoluto são os do último dia do bloco; ETK em % e estabilidade
+		são médias dos dias do bloco, tiradas das somas prefixadas em O(1) por bloco.
+		Retorna [(bloco, contagens, etk, etk_percent, estabilidade)] em ordem crescente.
+		"""
+		days, etk_percent_sums, stability_sums = self._days_and_prefix_sums()
+		if not days:
+			return []
+		first_day_idx, last_day_idx = days[0], days[-1]
+		chunks = []
+		for chunk_idx in range(-math.floor(-first_day_idx / chunk_days), -math.floor(-last_day_idx / chunk_days) + 1):
+			# Posições [start, end) do bloco nas listas de dias
+			start = max(first_day_idx, (chunk_idx - 1) * chunk_days + 1) - first_day_idx
+			end = min(last_day_idx, chunk_idx * chunk_days) - first_day_idx + 1
+			chunk_last_day_idx = days[end - 1]
+			chunks.append((
+				chunk_idx,
+				self.counts[chunk_last_day_idx],
+				self.etk.get(chunk_last_day_idx, 0),
+				(etk_percent_sums[end] - etk_percent_sums[start]) / (end - start),
+				(stability_sums[end] - stability_sums[start]) / (end - start),
+			))
+		return chunks
+
+
+class CardStateStore:
+	"""
+	Estado atual de cada cartão (categoria, ivl, última revisão) em colunas `array`
+	paralelas, endereçadas por uma posição densa por cid.
+
+	Substitui um dict por cartão: cada cartão custa uma entrada no índice e 13 bytes
+	nas colunas, e uma nova revisão sobrescreve a posição do cartão em vez de alocar
+	um dict novo. Posições de cartões removidos são reaproveitadas.
+	"""
+
+	def __init__(self):
+		self._positions = {}
+		self._free_positions = []
+		self.categories = array('b')
+		self.ivls = array('i')
+		self.last_rev_times = array('q')
+
+	def __len__(self):
+		return len(self._positions)
+
+	def __contains__(self, cid):
+		return cid in self._positions
+
+	def get(self, cid):
+		"""Estado (categoria, ivl, última revisão) do cartão, ou None."""
+		pos = self._positions.get(cid)
+		if pos is None:
+			return None
+		return self.categories[pos], self.ivls[pos], self.last_rev_times[pos]
+
+	def put(self, cid, category, ivl, last_rev_time):
+		"""Grava o estado do cartão e retorna o que ele tinha antes (ou None)."""
+		pos = self._positions.get(cid)
+		previous_state = None
+		if pos is None:
+			if self._free_positions:
+				pos = self._free_positions.pop()
+			else:
+				pos = len(self.categories)
+				self.categories.append(0)
+				self.ivls.append(0)
+				self.last_rev_times.append(0)
+			self._positions[cid] = pos
+		else:
+			previous_state = self.categories[pos], self.ivls[pos], self.last_rev_times[pos]
+		self.categories[pos] = category
+		self.ivls[pos] = ivl
+		self.last_rev_times[pos] = last_rev_time
+		return previous_state
+
+	def pop(self, cid):
+		"""Remove o cartão e retorna o estado que ele tinha."""
+		pos = self._positions.pop(cid)
+		self._free_positions.append(pos)
+		return self.categories[pos], self.ivls[pos], self.last_rev_times[pos]
+
+	def items(self):
+		categories, ivls, last_rev_times = self.categories, self.ivls, self.last_rev_times
+		for cid, pos in self._positions.items():
+			yield cid, (categories[pos], ivls[pos], last_rev_times[pos])
+
+
+class CardStateSweep:
+	"""
+	Estado corrido da varredura do histórico: o estado atual de cada cartão, as
+	contagens por categoria, o total de estabilidade e os baldes de retrievability.
+
+	Os agregados só mudam quando uma revisão move um cartão de estado, então o custo
+	de cada dia depende das revisões daquele dia e não do tamanho da coleção. A
+	varredura pode ser retomada a partir de uma tabela de estados salva.
+	"""
+
+	def __init__(self, day_cutoff_s, card_states=None):
+		self.day_cutoff_s = day_cutoff_s
+		self.card_current_states = CardStateStore()
+		self.retrievability_buckets = RetrievabilityBuckets()
+		self.day_counts = {CAT_LEARNING: 0, CAT_YOUNG: 0, CAT_MATURE: 0, CAT_RETAINED: 0}
+		# A estabilidade é max(ivl, 0.1): somar os ivl inteiros à parte e contar os cartões
+		# com o piso de 0.1 evita acumular erro de arredondamento a cada troca de estado.
+		self.stability_ivl_total = 0
+		self.stability_floor_cards = 0
+
+		for cid, (category, ivl, last_rev_time) in (card_states or {}).items():
+			self._add(cid, category, ivl, last_rev_time)
+
+	def _add(self, cid, category, ivl, last_rev_time):
+		self.card_current_states.put(cid, category, ivl, last_rev_time)
+		self._count(category, ivl, last_rev_time)
+
+	def _count(self, category, ivl, last_rev_time):
+		self.day_counts[category] += 1
+		if ivl > 0.1:
+			self.stability_ivl_total += ivl
+		else:
+			self.stability_floor_cards += 1
+		self.retrievability_buckets.add(_last_rev_day_idx(last_rev_time, self.day_cutoff_s), _stability_of(ivl))
+
+	def _remove(self, state):
+		category, ivl, last_rev_time = state
+		self.day_counts[category] -= 1
+		if ivl > 0.1:
+			self.stability_ivl_total -= ivl
+		else:
+			self.stability_floor_cards -= 1
+		self.retrievability_buckets.remove(_last_rev_day_idx(last_rev_time, self.day_cutoff_s), _stability_of(ivl))
+
+	def apply_review(self, rev_id_ms, cid, rev_type, rev_ivl):
+		"""Aplica uma revisão e retorna o estado anterior do cartão (ou None), para `restore`."""
+		category = get_card_category(rev_type, rev_ivl)
+		previous_state = self.card_current_states.put(cid, category, rev_ivl, rev_id_ms)
+		if previous_state is not None:
+			self._remove(previous_state)
+		self._count(category, rev_ivl, rev_id_ms)
+		return previous_state
+
+	def restore(self, cid, previous_state):
+		"""Desfaz `apply_review`, devolvendo ao cartão o estado retornado por ela."""
+		self._remove(self.card_current_states.pop(cid))
+		if previous_state is not None:
+			self._add(cid, *previous_state)
+
+	def shift(self, days):
+		"""Passa a usar um day_cutoff `days` dias à frente como referência dos índices de dia."""
+		self.day_cutoff_s += days * 86400
+		self.retrievability_buckets.shift(days)
+
+	def record_day(self, day_offset, daily):
+		# Fórmula de Retrievability FSRS, avaliada uma vez por balde
+		daily.record(
+			day_offset,
+			self.day_counts,
+			self.retrievability_buckets.total_retrievability(day_offset),
+			len(self.card_current_states),
+			self.stability_ivl_total + self.stability_floor_cards * 0.1
+		)
+
+	def card_states(self):
+		"""Tabela de estados serializável: cid -> (categoria, ivl, última revisão)."""
+		return dict(self.card_current_states.items())
+
+	def run(self, reviews, first_day_idx, last_day_idx, daily):
+		"""
+		Aplica as revisões de `reviews` (qualquer iterável ordenado por id, inclusive um
+		gerador) dia a dia e registra os agregados de cada dia em `daily`. Retorna a
+		última revisão aplicada e a primeira posterior a `last_day_idx` (ou None); as
+		revisões seguintes a esta continuam no iterador sem serem consumidas.
+		"""
+		reviews = iter(reviews)
+		last_review = None
+		next_review = next(reviews, None)
+		for day_offset in range(first_day_idx, last_day_idx + 1):  # Itera dia a dia
+			current_day_end_ts_ms = (self.day_cutoff_s + (day_offset * 86400)) * 1000
+
+			while next_review is not None and next_review[0] < current_day_end_ts_ms:
+				rev_id_ms, cid, rev_type, rev_ivl = next_review
+				self.apply_review(rev_id_ms, cid, rev_type, rev_ivl)
+				last_review = next_review
+				next_review = next(reviews, None)
+
+			self.record_day(day_offset, daily)
+		return last_review, next_review
+
+
+def sweep_card_states(all_reviews, day_cutoff_s, graph_start_day_idx):
+	"""Varre `all_reviews` (ordenado por id) do dia `graph_start_day_idx` até hoje."""
+	daily = DailySeries()
+	CardStateSweep(day_cutoff_s).run(all_reviews, graph_start_day_idx, 0, daily)
+	return daily
+
+
+def sweep_card_states_by_deck(all_reviews, day_cutoff_s, graph_start_day_idx, deck_id_sets):
+	"""
+	Varre uma única vez `all_reviews` (id, cid, type, ivl, did do cartão), ordenado por
+	id, e monta as séries da coleção inteira e de cada conjunto de decks de
+	`deck_id_sets`. Cada revisão só é aplicada às varreduras dos conjuntos que contêm o
+	deck do cartão. Retorna as séries da coleção e a lista das séries dos conjuntos
+	(None para um conjunto sem nenhuma revisão).
+	"""
+	collection_sweep = CardStateSweep(day_cutoff_s)
+	collection_daily = DailySeries()
+	deck_sweeps = [CardStateSweep(day_cutoff_s) for _ in deck_id_sets]
+	deck_dailies = [DailySeries() for _ in deck_id_sets]
+	sweeps_by_deck = {}
+	for deck_ids, sweep in zip(deck_id_sets, deck_sweeps):
+		for did in set(deck_ids):
+			sweeps_by_deck.setdefault(did, []).append(sweep)
+
+	reviews = iter(all_reviews)
+	next_review = next(reviews, None)
+	for day_offset in range(graph_start_day_idx, 1):  # Itera dia a dia
+		current_day_end_ts_ms = (day_cutoff_s + (day_offset * 86400)) * 1000
+
+		while next_review is not None and next_review[0] < current_day_end_ts_ms:
+			rev_id_ms, cid, rev_type, rev_ivl, did = next_review
+			collection_sweep.apply_review(rev_id_ms, cid, rev_type, rev_ivl)
+			for sweep in sweeps_by_deck.get(did, ()):
+				sweep.apply_review(rev_id_ms, cid, rev_type, rev_ivl)
+			next_review = next(reviews, None)
+
+		collection_sweep.record_day(day_offset, collection_daily)
+		for sweep, daily in zip(deck_sweeps, deck_dailies):
+			sweep.record_day(day_offset, daily)
+	return collection_daily, [daily if len(sweep.card_current_states) else None
+							  for sweep, daily in zip(deck_sweeps, deck_dailies)]
+
+
+def latest_card_states(reviews):
+	# Última revisão de cada cartão, no formato de CardStateSweep.card_states()
+	latest_reviews = {}
+	for review in reviews:
+		latest_reviews[review[1]] = review
+	return {cid: (get_card_category(rev_type, rev_ivl), rev_ivl, rev_id_ms)
+			for rev_id_ms, cid, rev_type, rev_ivl in latest_reviews.values()}
+
+
+class EvolutionModel:
+	"""
+	Histórico de um conjunto de cartões até o fim de ontem: as séries dos dias
+	completos, a varredura posicionada ao fim de `last_day_idx` e o maior id de revlog
+	já incorporado (high-water mark). As revisões posteriores ficam em
+	`pending_reviews`; as de hoje só são aplicadas temporariamente ao montar o dia 0,
+	para que o modelo continue válido quando o dia virar.
+
+	Um modelo carregado por janela só conhece as séries a partir de
+	`history_start_day_idx` (None = histórico completo).
+	"""
+
+	def __init__(self, day_cutoff_s, daily=None, card_states=None, last_day_idx=None, high_water_mark=0,
+				 history_start_day_idx=None):
+		self.day_cutoff_s = day_cutoff_s
+		self.daily = daily if daily is not None else DailySeries()
+		self.sweep = CardStateSweep(day_cutoff_s, card_states)
+		self.last_day_idx = last_day_idx
+		self.high_water_mark = high_water_mark
+		self.history_start_day_idx = history_start_day_idx
+		self.pending_reviews = []
+
+	@classmethod
+	def for_window(cls, day_cutoff_s, first_day_idx):
+		"""Modelo vazio que começa no dia `first_day_idx`; as revisões anteriores devem vir de `latest_before_sql`."""
+		return cls(day_cutoff_s, last_day_idx=first_day_idx - 1, history_start_day_idx=first_day_idx)
+
+	def covers(self, first_day_idx):
+		return self.history_start_day_idx is None or self.history_start_day_idx <= first_day_idx
+
+	def is_empty(self):
+		return not self.sweep.card_current_states and not self.pending_reviews
+
+	def add_reviews(self, reviews):
+		"""Acrescenta revisões (ordenadas por id) ainda não incorporadas; ignora as já conhecidas."""
+		known_id = self.pending_reviews[-1][0] if self.pending_reviews else self.high_water_mark
+		self.pending_reviews.extend(review for review in reviews if review[0] > known_id)
+
+	def rebase(self, day_cutoff_s):
+		"""
+		Reescreve os índices de dia para `day_cutoff_s`. Retorna False se o novo corte
+		não estiver um número inteiro de dias à frente do atual.
+		"""
+		elapsed_s = day_cutoff_s - self.day_cutoff_s
+		if elapsed_s < 0 or elapsed_s % 86400:
+			return False
+		shift_days = elapsed_s // 86400
+		if shift_days:
+			self.daily = self.daily.shifted(shift_days)
+			self.sweep.shift(shift_days)
+			if self.last_day_idx is not None:
+				self.last_day_idx -= shift_days
+			if self.history_start_day_idx is not None:
+				self.history_start_day_idx -= shift_days
+			self.day_cutoff_s = day_cutoff_s
+		return True
+
+	def fold(self, use_numpy=False, reviews=(), workers=0):
+		"""
+		Incorpora as revisões pendentes anteriores a hoje, registrando os dias completos
+		até ontem. `reviews` (ordenadas por id, posteriores às pendentes) pode ser um
+		gerador: as revisões são consumidas durante a varredura em vez de serem guardadas
+		antes. Com `workers` > 1, um modelo vazio varre o histórico em vários processos.
+		Retorna True se o modelo ganhou dias completos.
+		"""
+		yesterday_end_ts_ms = (self.day_cutoff_s - 86400) * 1000
+		reviews = itertools.chain(self.pending_reviews, reviews)
+		first_review = next(reviews, None)
+		has_past_reviews = first_review is not None and first_review[0] < yesterday_end_ts_ms
+		if first_review is not None:
+			reviews = itertools.chain([first_review], reviews)
+
+		next_day_idx = self.last_day_idx + 1 if self.last_day_idx is not None else None
+		if next_day_idx is None and has_past_reviews:
+			next_day_idx = (first_review[0] - self.day_cutoff_s * 1000) // (86400 * 1000) + 1
+		if next_day_idx is None or next_day_idx > -1:
+			self.pending_reviews = list(reviews)
+			return False
+
+		if not self.sweep.card_current_states and workers > 1 and has_past_reviews:
+			from .parallel_sweep import sweep_card_states_parallel
+			daily, card_states, self.high_water_mark, self.pending_reviews = sweep_card_states_parallel(
+				reviews, self.day_cutoff_s, next_day_idx, -1, workers, use_numpy, with_card_states=True)
+			self.daily.update(daily)
+			self.sweep = CardStateSweep(self.day_cutoff_s, card_states)
+		elif not self.sweep.card_current_states and use_numpy and has_past_reviews:
+			all_reviews = reviews_array(reviews)
+			split_idx = int(all_reviews[:, 0].searchsorted(yesterday_end_ts_ms))
+			past_reviews = all_reviews[:split_idx]
+			self.daily.update(DailySeries(*sweep_card_states_numpy(past_reviews, self.day_cutoff_s, next_day_idx, -1)))
+			self.sweep = CardStateSweep(self.day_cutoff_s, latest_card_states(latest_reviews(past_reviews).tolist()))
+			self.high_water_mark = int(past_reviews[-1, 0])
+			self.pending_reviews = all_reviews[split_idx:].tolist()
+		else:
+			last_review, next_review = self.sweep.run(reviews, next_day_idx, -1, self.daily)
+			if last_review is not None:
+				self.high_water_mark = last_review[0]
+			self.pending_reviews = ([next_review] if next_review is not None else []) + list(reviews)
+
+		self.last_day_idx = -1
+		return True
+
+	def first_day_idx(self):
+		return min(self.daily.counts) if self.daily.counts else 0
+
+	def daily_series(self, first_day_idx):
+		"""Séries de `first_day_idx` até hoje, com as revisões de hoje aplicadas temporariamente."""
+		series = self.daily.window(first_day_idx, -1)
+		end_date_timestamp_ms = self.day_cutoff_s * 1000
+		applied = [(review[1], self.sweep.apply_review(*review))
+				   for review in self.pending_reviews if review[0] < end_date_timestamp_ms]
+		self.sweep.record_day(0, series)
+		for cid, previous_state in reversed(applied):
+			self.sweep.restore(cid, previous_state)
+		return series
@@ -0,0 +1,299 @@
+"""
+Linha de comando que calcula as séries do gráfico direto de arquivos .anki2, sem o Anki.
+
+Cada coleção é aberta só para leitura com sqlite3 e varrida pelo mesmo código do
+gráfico (revlog_sweep), sem o cache de snapshots. As séries diárias, semanais ou
+mensais vão para um arquivo JSON ou CSV por coleção. Várias coleções (arquivos ou
+pastas, percorridas recursivamente) são processadas em paralelo por um pool de
+processos; cada processo atende uma coleção e pode ter um limite de memória.
+
+Uso, a partir da pasta do addon:
+
+	python -m src.export_cli backups/ --output-dir series --format csv --aggregation w --workers 4
+"""
+import argparse
+import csv
+import datetime
+import json
+import os
+import pathlib
+import re
+import sqlite3
+import sys
+import time
+import types
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+
+from . import revlog_sweep
+from .constants import CAT_LEARNING, CAT_YOUNG, CAT_MATURE, CAT_RETAINED
+from .numpy_backend import NUMPY_AVAILABLE
+from .revlog_query import RevlogQuery
+
+COLLECTION_EXTENSIONS = (".anki2", ".anki21")
+COLUMNS = ("date", "day_offset", "learning", "young", "mature", "retained", "total", "etk", "etk_percent",
+		   "stability")
+# Dias por ponto de cada agregação; "m" usa os 30 dias da tela de estatísticas
+_CHUNK_DAYS = {"d": 1, "w": 7, "m": 30}
+# Hora da virada do dia quando a coleção não a informa (padrão do Anki)
+_DEFAULT_ROLLOVER_HOUR = 4
+
+
+def _parse_args(argv):
+	parser = argparse.ArgumentParser(
+		prog="python -m src.export_cli",
+		description="Compute the Accumulated Retention series of Anki collections (.anki2) without Anki.")
+	parser.add_argument("paths", nargs="+",
+						help="collection files, or folders searched recursively for *.anki2 and *.anki21")
+	parser.add_argument("--output-dir", default=".", help="where the series files are written (default: %(default)s)")
+	parser.add_argument("--format", choices=("json", "csv"), default="json", help="output format (default: %(default)s)")
+	parser.add_argument("--aggregation", choices=sorted(_CHUNK_DAYS), default="d",
+						help="d (daily), w (weekly) or m (30 days) (default: %(default)s)")
+	parser.add_argument("--period", default="deck_life",
+						help="deck_life, or a number of months/years such as 3m or 1y (default: %(default)s)")
+	parser.add_argument("--backend", choices=("auto", "numpy", "python"), default="auto",
+						help="evolution backend, as evolution_backend in config.json (default: %(default)s)")
+	parser.add_argument("--include-deleted-cards", action="store_true", help="keep reviews of deleted cards")
+	parser.add_argument("--include-suspended-cards", action="store_true", help="keep reviews of suspended cards")
+	parser.add_argument("--batch-size", type=int, default=50000,
+						help="review log rows read per query, as revlog_batch_size (default: %(default)s)")
+	parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+						help="collections processed at the same time (default: %(default)s)")
+	parser.add_argument("--memory-limit-mb", type=int, default=0,
+						help="address space limit of each worker process in MB, 0 = no limit (default: %(default)s)")
+	args = parser.parse_args(argv)
+	if _period_days(args.period) is False:
+		parser.error("invalid --period: " + args.period)
+	return args
+
+
+def _period_days(period):
+	"""Dias do período, como o main_screen_period; None para deck_life e False se inválido."""
+	if period == "deck_life":
+		return None
+	match = re.match(r'^(\d+)([my])$', period)
+	if not match:
+		return False
+	number, unit = int(match.group(1)), match.group(2)
+	return number * 30 if unit == "m" else number * 365
+
+
+def _find_collections(paths):
+	"""(arquivo, caminho relativo usado no nome da saída) de cada coleção encontrada."""
+	found = []
+	for path in paths:
+		if os.path.isdir(path):
+			for folder, _, files in sorted(os.walk(path)):
+				for name in sorted(files):
+					if name.endswith(COLLECTION_EXTENSIONS):
+						file_path = os.path.join(folder, name)
+						found.append((file_path, os.path.relpath(file_path, path)))
+		else:
+			found.append((path, os.path.basename(path)))
+	return found
+
+
+def _config_value(conn, tables, key, default):
+	# Anki 2.1.28+ guarda o config em uma tabela própria; antes, em JSON na coluna col.conf
+	if "config" in tables:
+		row = conn.execute("SELECT val FROM config WHERE KEY = ?", (key,)).fetchone()
+		if row:
+			return json.loads(row[0])
+	elif "col" in tables:
+		row = conn.execute("SELECT conf FROM col").fetchone()
+		if row and row[0]:
+			return json.loads(row[0]).get(key, default)
+	return default
+
+
+def _day_cutoff(conn):
+	"""
+	Fim de hoje no Anki. No agendador v1 (sem schedVer, como no Anki), os dias são
+	blocos de 24 horas a partir da criação da coleção (col.crt); nos seguintes, viram
+	na hora `rollover` do horário local.
+	"""
+	tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+	if "col" in tables and int(_config_value(conn, tables, "schedVer", 1)) == 1:
+		row = conn.execute("SELECT crt FROM col").fetchone()
+		if row:
+			return _v1_day_cutoff(row[0])
+	return _next_day_cutoff(int(_config_value(conn, tables, "rollover", _DEFAULT_ROLLOVER_HOUR)))
+
+
+def _v1_day_cutoff(created_s):
+	days_elapsed = (int(time.time()) - created_s) // 86400
+	return created_s + (days_elapsed + 1) * 86400
+
+
+def _next_day_cutoff(rollover_hour):
+	"""Próxima virada do dia (fim de hoje no Anki), na hora local."""
+	now = datetime.datetime.now().astimezone()
+	cutoff = now.replace(hour=rollover_hour, minute=0, second=0, microsecond=0)
+	if cutoff <= now:
+		cutoff += datetime.timedelta(days=1)
+	return int(cutoff.timestamp())
+
+
+class _DB:
+	"""Os métodos de `col.db` do Anki que a varredura usa."""
+
+	def __init__(self, conn):
+		self._conn = conn
+
+	def all(self, sql, *args):
+		return self._conn.execute(sql, args).fetchall()
+
+	def scalar(self, sql, *args):
+		row = self._conn.execute(sql, args).fetchone()
+		return row[0] if row else None
+
+
+class Collection:
+	"""Arquivo .anki2 aberto só para leitura, com a interface de `mw.col` usada pela varredura."""
+
+	def __init__(self, path):
+		self.path = path
+		uri = pathlib.Path(path).absolute().as_uri()
+		self._conn = sqlite3.connect(uri + "?mode=ro", uri=True)
+		try:
+			self._conn.execute("SELECT count() FROM sqlite_master").fetchone()
+		except sqlite3.OperationalError:
+			# Sem permissão para criar o -shm de uma coleção em WAL: lê o arquivo como está
+			self._conn.close()
+			self._conn = sqlite3.connect(uri + "?immutable=1", uri=True)
+		self.db = _DB(self._conn)
+		self.sched = types.SimpleNamespace(day_cutoff=_day_cutoff(self._conn))
+
+	def close(self):
+		self._conn.close()
+
+
+def _series_rows(daily, day_cutoff_s, chunk_days):
+	"""Uma linha por ponto (dia ou bloco), com a data do último dia do bloco."""
+	rows = []
+	for chunk_idx, counts, etk, etk_percent, stability in daily.rollup(chunk_days):
+		last_day_idx = min(chunk_idx * chunk_days, 0)
+		# O dia d termina na virada day_cutoff_s + d * 86400; a data é a do seu início
+		date = datetime.date.fromtimestamp(day_cutoff_s + (last_day_idx - 1) * 86400)
+		category_counts = [counts[cat] for cat in (CAT_LEARNING, CAT_YOUNG, CAT_MATURE, CAT_RETAINED)]
+		rows.append([date.isoformat(), last_day_idx] + category_counts +
+					[sum(category_counts), round(etk, 4), round(etk_percent, 4), round(stability, 4)])
+	return rows
+
+
+def _write_series(output_path, output_format, header, rows):
+	os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+	with open(output_path + ".tmp", "w", encoding="utf-8", newline="") as output_file:
+		if output_format == "csv":
+			writer = csv.writer(output_file)
+			writer.writerow(COLUMNS)
+			writer.writerows(rows)
+		else:
+			json.dump(dict(header, series=[dict(zip(COLUMNS, row)) for row in rows]), output_file, indent=1)
+	os.replace(output_path + ".tmp", output_path)
+
+
+def _sweep_collection(path, options, use_numpy):
+	"""Virada do dia e séries diárias (None sem revisões) de uma coleção."""
+	col = Collection(path)
+	try:
+		revlog_query = RevlogQuery(None, not options.include_deleted_cards, not options.include_suspended_cards)
+		day_cutoff_s = col.sched.day_cutoff
+		graph_window = revlog_sweep.graph_window(col, revlog_query, day_cutoff_s, _period_days(options.period))
+		if graph_window is None:
+			return day_cutoff_s, None
+		graph_start_day_idx, windowed = graph_window
+		return day_cutoff_s, revlog_sweep.sweep_window(
+			col, revlog_query, day_cutoff_s, graph_start_day_idx, windowed, use_numpy, options.batch_size)
+	finally:
+		col.close()
+
+
+def export_collection(path, output_path, options):
+	"""
+	Calcula as séries de uma coleção e grava em `output_path`. Roda em um processo do
+	pool; retorna (número de pontos, segundos) ou levanta a exceção do erro.
+	"""
+	start = time.perf_counter()
+	use_numpy = NUMPY_AVAILABLE and options.backend != "python"
+	out_of_memory = False
+	try:
+		day_cutoff_s, daily = _sweep_collection(path, options, use_numpy)
+	except MemoryError:
+		if not use_numpy or options.backend == "numpy":
+			raise
+		out_of_memory = True
+	if out_of_memory:
+		# O NumPy monta o histórico inteiro em memória; em Python o revlog é lido em páginas.
+		# Fora do except, para que a matriz que estourou o limite já tenha sido liberada
+		day_cutoff_s, daily = _sweep_collection(path, options, False)
+
+	rows = _series_rows(daily, day_cutoff_s, _CHUNK_DAYS[options.aggregation]) if daily is not None else []
+	header = {
+		"collection": os.path.abspath(path),
+		"day_cutoff": datetime.datetime.fromtimestamp(day_cutoff_s).astimezone().isoformat(),
+		"period": options.period,
+		"aggregation": options.aggregation,
+		"exclude_deleted_cards": not options.include_deleted_cards,
+		"exclude_suspended_cards": not options.include_suspended_cards,
+	}
+	_write_series(output_path, options.format, header, rows)
+	return len(rows), time.perf_counter() - start
+
+
+def _limit_memory(memory_limit_mb):
+	# Executado no início de cada processo do pool
+	if not memory_limit_mb:
+		return
+	try:
+		import resource
+	except ImportError:
+		print("Accumulated Retention: --memory-limit-mb is not supported on this platform", file=sys.stderr)
+		return
+	limit = memory_limit_mb * 1024 * 1024
+	_, hard_limit = resource.getrlimit(resource.RLIMIT_AS)
+	if hard_limit != resource.RLIM_INFINITY:
+		limit = min(limit, hard_limit)
+	resource.setrlimit(resource.RLIMIT_AS, (limit, hard_limit))
+
+
+def _describe_error(error):
+	if isinstance(error, MemoryError):
+		return "memory limit exceeded"
+	return "{}: {}".format(type(error).__name__, error)
+
+
+def main(argv=None):
+	args = _parse_args(argv)
+	collections = _find_collections(args.paths)
+	if not collections:
+		print("No collections found.", file=sys.stderr)
+		return 1
+
+	extension = "." + args.format
+	failures = 0
+	pool_options = {}
+	if sys.version_info >= (3, 11):
+		# Um processo por coleção: a memória de uma coleção grande volta ao sistema ao fim dela
+		pool_options["max_tasks_per_child"] = 1
+	with ProcessPoolExecutor(max_workers=max(1, min(args.workers, len(collections))), mp_context=get_context("spawn"),
+							 initializer=_limit_memory, initargs=(args.memory_limit_mb,), **pool_options) as executor:
+		futures = {
+			executor.submit(export_collection, path, os.path.join(args.output_dir, os.path.splitext(name)[0] + extension),
+							args): path
+			for path, name in collections
+		}
+		for done, future in enumerate(as_completed(futures), 1):
+			path = futures[future]
+			try:
+				points, seconds = future.result()
+				print("[{}/{}] {}: {} points in {:.1f}s".format(done, len(futures), path, points, seconds),
+					  file=sys.stderr)
+			except Exception as e:
+				failures += 1
+				print("[{}/{}] {}: failed: {}".format(done, len(futures), path, _describe_error(e)), file=sys.stderr)
+	return 1 if failures else 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -1,16 +1,20 @@
+import itertools
 import json
 import re
 import time
 
-from anki.utils import ids2str
 from aqt import mw
 from aqt.deckbrowser import DeckBrowser, DeckBrowserContent
 # Imports adicionais
-from aqt.gui_hooks import overview_will_render_content, deck_browser_will_render_content, webview_will_set_content
+from aqt.gui_hooks import overview_will_render_content, deck_browser_will_render_content, webview_will_set_content, \
+	state_will_change
 from aqt.overview import Overview, OverviewContent
 
-from .rendering import render_card_evolution_graph
-from .translations import tr
+from . import render_timings
+from .config import get_config
+from .deck_tree import deck_and_descendant_ids
+from .revlog_query import RevlogQuery
+from .translations import MONTH_KEYS, tr, tr_many
 
 
 # Classe Helper para gerar estatísticas da tela principal.
@@ -19,10 +23,11 @@ class CompleteCollectionStats:
 	"""Helper class to generate main screen statistics.
 	Moved outside the hook functions to avoid redeclaration."""
 
-	def __init__(self, col, deck_id=None, period="3m"):
+	def __init__(self, col, deck_id=None, period="3m", config=None):
 		self.col = col
 		self._deck_id = deck_id
 		self._period = period
+		self.config = config if config is not None else get_config()
 
 		if period == "1m":
 			self.type = 0
@@ -64,27 +69,27 @@ class CompleteCollectionStats:
 					return number * 365
 			return None
 
-	def _revlogLimit(self):
+	def _deck_ids(self):
+		"""Deck e subdecks selecionados, ou None para a coleção inteira."""
 		if not self._deck_id:
-			return ""
+			return None
 
 		try:
-			child_decks = [self._deck_id]
-			for name, did in self.col.decks.children(self._deck_id):
-				child_decks.append(did)
-			deck_ids_str = ids2str(child_decks)
-			return "cid IN (SELECT id FROM cards WHERE did IN " + deck_ids_str + ")"
+			return list(deck_and_descendant_ids(self.col, self._deck_id))
 		except Exception as e:
-			return ""
+			print(f"Accumulated Retention: Failed to read the deck tree: {e}")
+			return None
+
+	def _revlog_query(self):
+		return RevlogQuery(self._deck_ids(), self.config.exclude_deleted_cards, self.config.exclude_suspended_cards)
 
 	def get_start_end_chunk(self):
-		config = mw.addonManager.getConfig(__name__)
 		try:
 			day_cutoff_s = self.col.sched.day_cutoff
 		except AttributeError:
 			day_cutoff_s = int(time.time())
 
-		aggregation_config = config.get("main_screen_aggregation")
+		aggregation_config = self.config.main_screen_aggregation
 
 		if aggregation_config == "d":
 			chunk_days = 1
@@ -97,18 +102,7 @@ class CompleteCollectionStats:
 		if period_days is not None:
 			return (day_cutoff_s - (period_days * 86400), day_cutoff_s, chunk_days)
 		else:  # deck_life
-			first_rev_query = "SELECT MIN(id) FROM revlog"
-			if self._deck_id:
-				try:
-					child_decks = [self._deck_id]
-					for name, did in self.col.decks.children(self._deck_id):
-						child_decks.append(did)
-					deck_ids_str = ids2str(child_decks)
-					first_rev_query += " WHERE cid IN (SELECT id FROM cards WHERE did IN " + deck_ids_str + ")"
-				except:
-					pass
-
-			min_revlog_id_ms = self.col.db.scalar(first_rev_query)
+			min_revlog_id_ms = self.col.db.scalar(self._revlog_query().min_id_sql())
 			if min_revlog_id_ms:
 				start = min_revlog_id_ms // 1000
 			else:
@@ -131,114 +125,46 @@ class CompleteCollectionStats:
 			html_parts.append('</p>')
 		return ''.join(html_parts)
 
-	def _graph(self, id, data, conf, ylabel="", y2label="", tooltip_html=""):
-		config = mw.addonManager.getConfig(__name__)
-		height = config.get("main_screen_height")
-		safe_ylabel = ylabel.replace('%', '%%')
-		safe_y2label = y2label.replace('%', '%%')
+	def _graph(self, id, data, conf, ylabel="", y2label="", tooltip=None, height=None):
+		from .payload import encode_series
 
-		# Extrai o conteúdo JS puro do tooltip_html
-		tooltip_js_content = ""
-		if tooltip_html:
-			match = re.search(r'<script[^>]*>(.*?)</script>', tooltip_html, re.DOTALL)
-			if match:
-				tooltip_js_content = match.group(1).strip()
-				# Remove a função de auto-execução $(function() { ... }); para que possamos chamá-la diretamente
-				tooltip_js_content = re.sub(r'^\s*\$\(function\(\)\s*\{', '', tooltip_js_content)
-				tooltip_js_content = re.sub(r'\}\s*\)\;\s*$', '', tooltip_js_content)
+		config = self.config
+		if height is None:
+			height = config.main_screen_height
+		safe_ylabel = ylabel.replace('%', '%%')
 
 		try:
 			if not data or not any(s.get('data') for s in data):
 				return '<div style="color:#888;text-align:center;margin:1em 0;">' + tr("graph_no_data") + '</div>'
 
-			data_json_for_js = json.dumps(data)
-			options_json_for_js = json.dumps(conf)
-
-			py_unit_suffix = conf.get('xaxis', {}).get('unit_suffix', 'd')
-			py_agg_days = conf.get('xaxis', {}).get('aggregation_chunk_days', 1)
-			py_today_label = tr("label_today").replace('%', '%%')
-
 			# Get day_cutoff_s to pass to JS for absolute dates
 			try:
 				py_day_cutoff_s = self.col.sched.day_cutoff
 			except AttributeError:
 				py_day_cutoff_s = self.col.sched.dayCutoff  # For older Anki versions
 
+			# Só os dados do gráfico; o desenho e o tooltip ficam em web/evolution_graph.js
+			with render_timings.stage("serialization"):
+				payload_json = json.dumps({
+					"series": encode_series(data),
+					"options": conf,
+					"axis": {
+						"absoluteDates": config.use_absolute_dates,
+						"dayCutoffS": py_day_cutoff_s,
+						"todayLabel": tr("label_today"),
+						"months": tr_many(MONTH_KEYS),
+					},
+					"tooltip": tooltip,
+				}).replace('</', '<\\/')
+
 			html_parts = []
 			html_parts.append(
 				'<div id="' + id + '" style="height:' + str(height) + 'px; width:95%; margin: 0 auto;"></div>')
 			html_parts.append(
 				'<p style="text-align: center; font-size: 0.8em; color: #666; margin-top: 0.5em;">' + safe_ylabel + '</p>')
-
-			js_parts = ['<script type="text/javascript">', '(function() {', '  var attempts = 0;',
-						'  var maxAttempts = 20;', '  var retryInterval = 200;', '  ',
-						'  function checkDependencies() {',
-						'    return (typeof $ !== "undefined" && typeof $.plot !== "undefined");', '  }', '  ',
-						'  function loadFlotLibraries(callback) {', '    if (typeof $ === "undefined") {',
-						'      console.error("Card Evolution JS: jQuery not available");', '      return false;',
-						'    }', '    ', '    if (typeof $.plot === "undefined") {',
-						'      var flotScript = document.createElement("script");',
-						'      flotScript.src = "https://cdnjs.cloudflare.com/ajax/libs/flot/0.8.3/jquery.flot.min.js";',
-						'      flotScript.onload = function() {',
-						'        var stackScript = document.createElement("script");',
-						'        stackScript.src = "https://cdnjs.cloudflare.com/ajax/libs/flot/0.8.3/jquery.flot.stack.min.js";',
-						'        stackScript.onload = function() {', '          setTimeout(callback, 100);',
-						'        };', '        stackScript.onerror = function() {',
-						'          console.error("Card Evolution JS: Failed to load Flot stack plugin");',
-						'          setTimeout(callback, 100);', '        };',
-						'        document.head.appendChild(stackScript);', '      };',
-						'      flotScript.onerror = function() {',
-						'        console.error("Card Evolution JS: Failed to load Flot from CDN");',
-						'        callback();', '      };', '      document.head.appendChild(flotScript);',
-						'      return false;', '    }', '    ', '    callback();', '    return true;', '  }', '  ',
-						'  function renderGraph() {', '    try {', '      var graphDiv = $("#' + id + '");',
-						'      if (graphDiv.length === 0) {', '', '        return false;', '      }', '      ',
-						'      var data = ' + data_json_for_js + ';',
-						'      var options = ' + options_json_for_js + ';', '      ',
-						'      if (options.xaxis && typeof options.xaxis.tickFormatter === "string") {',
-						'        delete options.xaxis.tickFormatter;', '      }', '      ',
-						'      if (options.series) {', '        options.series.stack = true;',
-						'        if (options.series.bars) {', '          options.series.bars.show = true;',
-						'        } else {', '          options.series.bars = { show: true };', '        }',
-						'      } else {', '        options.series = { stack: true, bars: { show: true } };', '      }',
-						'      ']
-
-			use_absolute_dates = config.get("use_absolute_dates")
-
-			# Criar array de meses traduzidos para JavaScript
-			month_translations_main = []
-			for i in range(1, 13):
-				month_key = ["month_jan", "month_feb", "month_mar", "month_apr", "month_may", "month_jun",
-							 "month_jul", "month_aug", "month_sep", "month_oct", "month_nov", "month_dec"][i - 1]
-				month_translations_main.append(tr(month_key))
-			months_js_array_main = '["' + '", "'.join(month_translations_main) + '"]'
-
-			if use_absolute_dates:
-				formatter_func_str = 'function(val, axis) { var todayLabel = \'' + py_today_label + '\'; if (Math.abs(val - 0) < 0.001) { return todayLabel; } var aggDays = ' + str(
-					py_agg_days) + '; var dayCutoffS = ' + str(
-					py_day_cutoff_s) + '; var dayOffset = val * aggDays; var date = new Date((dayCutoffS + (dayOffset * 86400)) * 1000); var months = ' + months_js_array_main + '; return months[date.getMonth()] + \' \' + date.getDate(); }'
-			else:
-				formatter_func_str = 'function(val, axis) { var unitSuffix = \'' + py_unit_suffix + '\'; var todayLabel = \'' + py_today_label + '\'; if (Math.abs(val - 0) < 0.001) { return todayLabel; } var decimals = axis.options.tickDecimals === undefined ? 0 : axis.options.tickDecimals; return val.toFixed(decimals) + unitSuffix; }'
-
-			js_parts += ['      options.xaxis.tickFormatter = ' + formatter_func_str + ';', '      ',
-						 '      $.plot(graphDiv, data, options);', '      ', '      ' + tooltip_js_content, '      ',
-						 '',
-						 '      return true;', '    } catch (e) {',
-						 '      console.error("Card Evolution JS: Error rendering graph on attempt " + attempts + ":", e);',
-						 '      return false;', '    }', '  }', '  ', '  function attemptRender() {', '    attempts++;',
-						 '    ', '    if (attempts > maxAttempts) {',
-						 '      console.error("Card Evolution JS: Failed to render graph after " + maxAttempts + " attempts. Dependencies or DOM may not be ready.");',
-						 '      return;', '    }', '    ', '    if (!checkDependencies()) {',
-						 '      loadFlotLibraries(function() {', '        setTimeout(attemptRender, retryInterval);',
-						 '      });', '      return;', '    }', '    ', '    if (renderGraph()) {', '      return;',
-						 '    }', '    ', '    setTimeout(attemptRender, retryInterval);', '  }', '  ',
-						 '  function initWhenReady() {', '    if (document.readyState === "loading") {',
-						 '      document.addEventListener("DOMContentLoaded", function() {',
-						 '        setTimeout(attemptRender, 50);', '      });', '    } else {',
-						 '      setTimeout(attemptRender, 50);', '    }', '  }', '  ', '  initWhenReady();', '})();',
-						 '</script>']
-
-			return ''.join(html_parts) + ''.join(js_parts)
+			html_parts.append(
+				'<script type="text/javascript">renderEvolutionGraph(' + json.dumps(id) + ', ' + payload_json + ');</script>')
+			return ''.join(html_parts)
 
 		except Exception as e:
 			import traceback
@@ -247,31 +173,131 @@ class CompleteCollectionStats:
 			return '<div style="color:red;text-align:center;">Erro Py ao gerar gráfico: ' + str(e) + '</div>'
 
 
-def _render_main_screen_graph_html(deck_id=None):
+def _top_level_decks(col):
+	"""(nome, id) dos decks de nível superior, em ordem alfabética."""
+	try:
+		names_and_ids = [(deck.name, deck.id)
+						 for deck in col.decks.all_names_and_ids(skip_empty_default=True, include_filtered=False)]
+	except AttributeError:
+		# Versões antigas do Anki
+		names_and_ids = [(deck["name"], deck["id"]) for deck in col.decks.all() if not deck.get("dyn")]
+	return sorted((name, did) for name, did in names_and_ids if "::" not in name)
+
+
+def _render_deck_multiples_html(config):
+	"""Graph for the whole collection followed by a small graph per top-level deck, all computed in
+	a single pass over the revlog.
+	Gráfico da coleção inteira seguido de um gráfico pequeno por deck de nível superior, todos
+	calculados com uma única passada pelo revlog."""
+	from .rendering import render_timings_footer
+
+	with render_timings.timed_render("CompleteCollectionStats multiples period=" + config.main_screen_period +
+									 " backend=" + config.evolution_backend) as timings:
+		return _deck_multiples_graphs_html(config) + render_timings_footer(timings, config)
+
+
+def _deck_multiples_graphs_html(config):
+	from .data_processing import get_card_evolution_data_batch
+	from .rendering import new_graph_id, render_graph_data
+
+	stats_instance = CompleteCollectionStats(mw.col, deck_id=None, period=config.main_screen_period, config=config)
+	top_level_decks = _top_level_decks(mw.col)
+	deck_id_sets = [deck_and_descendant_ids(mw.col, did) for _, did in top_level_decks]
+
+	graph_id = new_graph_id()
+	collection_data, deck_data = get_card_evolution_data_batch(stats_instance, deck_id_sets, graph_id, config)
+	html = render_graph_data(stats_instance, graph_id, collection_data, config)
+
+	with render_timings.stage("html"):
+		cells = []
+		for pos, ((deck_name, did), graph_data) in enumerate(zip(top_level_decks, deck_data)):
+			series_data, options, tooltip, aggregation_chunk_days, y2label = graph_data
+			if options:
+				options["legend"]["show"] = False
+			cells.append(
+				'<div style="flex: 0 0 32%; min-width: 250px;">' +
+				stats_instance._title(deck_name) +
+				stats_instance._graph(id=graph_id + "_" + str(pos), data=series_data, conf=options, y2label=y2label,
+									  tooltip=tooltip, height=config.main_screen_height // 2) +
+				'</div>')
+		return html + '<div style="display: flex; flex-wrap: wrap; justify-content: center; gap: 1%;">' + \
+			''.join(cells) + '</div>'
+
+
+def _render_main_screen_graph_html(config, deck_id=None):
 	"""Generates the complete HTML for the main screen chart.
 	Gera o HTML completo para o gráfico da tela principal."""
+	# O cálculo e o HTML do gráfico só são importados no primeiro render, não ao carregar o perfil
+	from .rendering import render_card_evolution_graph
 
-	config = mw.addonManager.getConfig(__name__)
-	period = config.get("main_screen_period")
-	stats_instance = CompleteCollectionStats(mw.col, deck_id=deck_id, period=period)
-
-	graph_html = render_card_evolution_graph(stats_instance)
+	if deck_id is None and config.main_screen_deck_multiples:
+		graph_html = _render_deck_multiples_html(config)
+	else:
+		period = config.main_screen_period
+		stats_instance = CompleteCollectionStats(mw.col, deck_id=deck_id, period=period, config=config)
+		graph_html = render_card_evolution_graph(stats_instance, config)
 
 	# Envolve o gráfico renderizado em um contêiner pai, agora com estilo.
-	width = config.get("main_screen_width")
+	width = config.main_screen_width
 	return f'<div class="evolution-graph-main-wrapper" style="min-width: {width}px; margin: 20px auto; padding: 1em; border: 1px solid #ddd; border-radius: 5px; background: #f9f9f9;">{graph_html}</div>'
 
 
+# Render assíncrono: cada tela guarda o id do placeholder que está esperando o gráfico.
+# Resultados de renders mais antigos (ou de telas que já foram deixadas) são descartados.
+_async_render_slots = {}
+_async_slot_counter = itertools.count()
+
+
+def _cancel_async_renders(*args):
+	_async_render_slots.clear()
+
+
+def _main_screen_graph_html(target, web, config, deck_id=None):
+	"""Returns the graph HTML, or a placeholder that is filled in from a background task when
+	`main_screen_async` is enabled.
+	Retorna o HTML do gráfico ou, com `main_screen_async`, um placeholder preenchido por uma
+	tarefa em segundo plano."""
+	if not config.main_screen_async:
+		return _render_main_screen_graph_html(config, deck_id=deck_id)
+
+	slot_id = "evolutionGraphSlot" + str(next(_async_slot_counter))
+	_async_render_slots[target] = slot_id
+
+	def compute():
+		# Uma tarefa que ainda estava na fila quando o usuário saiu da tela nem começa
+		if _async_render_slots.get(target) != slot_id:
+			return None
+		return _render_main_screen_graph_html(config, deck_id=deck_id)
+
+	def on_done(future):
+		if _async_render_slots.get(target) != slot_id:
+			return
+		del _async_render_slots[target]
+		try:
+			graph_html = future.result()
+		except Exception as e:
+			print(f"Accumulated Retention: Failed to render graph in background: {e}")
+			return
+		if graph_html is not None:
+			# replaceWith do jQuery também executa os <script> do gráfico
+			web.eval(f"$('#{slot_id}').replaceWith({json.dumps(graph_html)});")
+
+	mw.taskman.run_in_background(compute, on_done)
+
+	width = config.main_screen_width
+	return f'<div id="{slot_id}" class="evolution-graph-main-wrapper" style="min-width: {width}px; margin: 20px auto; padding: 1em; border: 1px solid #ddd; border-radius: 5px; background: #f9f9f9; text-align: center; color: #888;">{tr("graph_loading")}</div>'
+
+
 def on_deck_browser_render(deck_browser: DeckBrowser, content: DeckBrowserContent):
 	"""Adds the status evolution graph to the deck browser main screen.
 	Adiciona o gráfico de evolução do status à tela principal do navegador de baralhos."""
-	config = mw.addonManager.getConfig(__name__)
-	if not config.get("show_in_deck_browser"):
+	config = get_config()
+	if not config.show_in_deck_browser:
 		return
 
 	try:
 		# Para o navegador de baralhos, não filtramos por deck_id (None)
-		graph_html = _render_main_screen_graph_html(deck_id=None)
+		graph_html = _main_screen_graph_html("deck_browser", deck_browser.web, config, deck_id=None)
 		content.stats += graph_html
 	except Exception as e:
 		print(f"Accumulated Retention: Failed to render graph on deck browser: {e}")
@@ -284,7 +310,8 @@ def on_review_finished_render(web_content, context):
 		return
 	try:
 		current_deck_id = mw.col.decks.get_current_id()  # Get the ID of the deck that was just finished
-		graph_html = _render_main_screen_graph_html(deck_id=current_deck_id)
+		graph_html = _main_screen_graph_html("review_finished", context.overview.bottom.web, get_config(),
+											 deck_id=current_deck_id)
 		web_content.body += graph_html
 	except Exception as e:
 		print(f"Accumulated Retention: Failed to render graph on finish screen: {e}")
@@ -293,14 +320,14 @@ def on_review_finished_render(web_content, context):
 def on_overview_render(overview: Overview, content: OverviewContent):
 	"""Adds the status evolution graph to the deck overview screen.
 	Adiciona o gráfico de evolução do status à tela de visão geral do baralho."""
-	config = mw.addonManager.getConfig(__name__)
-	if not config.get("show_in_overview"):
+	config = get_config()
+	if not config.show_in_overview:
 		return
 
 	try:
 		# Para a visão geral, usamos o ID do baralho atual, obtido via mw.
 		current_deck_id = mw.col.decks.get_current_id()
-		graph_html = _render_main_screen_graph_html(deck_id=current_deck_id)
+		graph_html = _main_screen_graph_html("overview", overview.web, config, deck_id=current_deck_id)
 
 		# Injetar o gráfico, envolvendo-o em uma linha de tabela para renderização correta.
 		content.table += f'<tr><td colspan="2" style="padding: 10px 0;">{graph_html}</td></tr>'
@@ -312,10 +339,11 @@ def on_overview_render(overview: Overview, content: OverviewContent):
 def init_main_screen_hooks():
 	"""Initializes hooks for the main screen (Deck Browser).
 	Inicializa os ganchos para a tela principal (Navegador de Baralhos)."""
-	config = mw.addonManager.getConfig(__name__)
-	if config.get("enable_main_screen"):
+	config = get_config()
+	if config.enable_main_screen:
 		# Checking show_in_overview/deck_browser is done inside each hook.
 		# A verificação de show_in_overview/deck_browser é feita dentro de cada hook.
 		overview_will_render_content.append(on_overview_render)
 		deck_browser_will_render_content.append(on_deck_browser_render)
 		webview_will_set_content.append(on_review_finished_render)
+		state_will_change.append(_cancel_async_renders)
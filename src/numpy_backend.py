@@ -0,0 +1,140 @@
+"""
+Backend vetorizado (NumPy) para a varredura do histórico de revisões.
+
+O NumPy não vem com o Anki em todas as plataformas: a importação é detectada aqui
+e `data_processing` volta para o laço em Python puro quando ele não está disponível.
+"""
+import itertools
+
+try:
+	import numpy as np
+except ImportError:
+	np = None
+
+from .constants import CAT_LEARNING, CAT_YOUNG, CAT_MATURE, CAT_RETAINED, INTERVAL_LEARNING_MAX, INTERVAL_YOUNG_MAX, \
+	INTERVAL_MATURE_MAX
+
+NUMPY_AVAILABLE = np is not None
+
+# Máximo de pares (evento, dia) expandidos por vez no cálculo do ETK, para limitar a memória
+_ETK_PAIRS_PER_CHUNK = 500_000
+
+
+def reviews_array(reviews):
+	"""Matriz (n, 4) de int64 a partir de um iterável de revisões, sem listas intermediárias."""
+	return np.fromiter(itertools.chain.from_iterable(reviews), dtype=np.int64).reshape(-1, 4)
+
+
+def latest_reviews(reviews):
+	"""Última revisão de cada cartão em uma matriz de revisões ordenada por id."""
+	reversed_reviews = reviews[::-1]
+	_, first_idx = np.unique(reversed_reviews[:, 1], return_index=True)
+	return reversed_reviews[first_idx]
+
+
+def _categories(rev_types, rev_ivls):
+	# Mesma regra de get_card_category, aplicada ao vetor inteiro
+	review_cat = np.select(
+		[rev_ivls <= INTERVAL_LEARNING_MAX, rev_ivls <= INTERVAL_YOUNG_MAX, rev_ivls <= INTERVAL_MATURE_MAX],
+		[CAT_LEARNING, CAT_YOUNG, CAT_MATURE],
+		default=CAT_RETAINED
+	)
+	return np.where(rev_types == 1, review_cat, CAT_LEARNING).astype(np.int64)
+
+
+def _etk_by_day(start_pos, end_pos, last_rev_day_idx, stability, graph_start_day_idx, n_days):
+	etk = np.zeros(n_days, dtype=np.float64)
+	lengths = end_pos - start_pos
+	keep = lengths > 0
+	start_pos, lengths = start_pos[keep], lengths[keep]
+	last_rev_day_idx, stability = last_rev_day_idx[keep], stability[keep]
+	if not len(lengths):
+		return etk
+
+	cum_lengths = np.cumsum(lengths)
+	chunk_bounds = np.searchsorted(cum_lengths, np.arange(_ETK_PAIRS_PER_CHUNK, cum_lengths[-1], _ETK_PAIRS_PER_CHUNK))
+	for chunk in np.split(np.arange(len(lengths)), np.unique(chunk_bounds)):
+		if not len(chunk):
+			continue
+		chunk_lengths = lengths[chunk]
+		events = np.repeat(chunk, chunk_lengths)
+		# Deslocamento de cada par dentro do intervalo em que o evento é o estado atual do cartão
+		offsets = np.arange(len(events)) - np.repeat(np.cumsum(chunk_lengths) - chunk_lengths, chunk_lengths)
+		day_pos = start_pos[events] + offsets
+		days_since_review = (day_pos + graph_start_day_idx) - last_rev_day_idx[events]
+		valid = days_since_review >= 0
+		# Fórmula FSRS-4.5, a mesma de fsrs_retrievability
+		retrievability = np.power(1.0 + days_since_review[valid] / (9.0 * stability[events][valid]), -1.0)
+		etk += np.bincount(day_pos[valid], weights=retrievability, minlength=n_days)
+	return etk
+
+
+def sweep_card_states_numpy(all_reviews, day_cutoff_s, graph_start_day_idx, last_day_idx=0):
+	"""
+	Equivalente vetorizado de `sweep_card_states` para os dias
+	[graph_start_day_idx, last_day_idx]. Retorna os dicionários de contagens por
+	categoria, ETK absoluto, ETK em % e estabilidade média, nessa ordem.
+
+	Cada revisão vira um evento que vale do dia em que é aplicada até a próxima revisão
+	do mesmo cartão; as contagens e a estabilidade saem de somas acumuladas de deltas
+	e o ETK de uma soma por dia dos pares (evento, dia) expandidos.
+	"""
+	n_days = last_day_idx - graph_start_day_idx + 1
+	reviews = np.asarray(all_reviews, dtype=np.int64).reshape(-1, 4)
+	rev_ids, cids, rev_types, rev_ivls = reviews[:, 0], reviews[:, 1], reviews[:, 2], reviews[:, 3]
+
+	# Dia em que a revisão passa a contar (primeiro dia cujo fim é posterior a ela),
+	# com o histórico anterior ao gráfico aplicado no primeiro dia
+	apply_day_idx = np.floor_divide(rev_ids - day_cutoff_s * 1000, 86400 * 1000) + 1
+	start_pos = np.clip(apply_day_idx, graph_start_day_idx, last_day_idx) - graph_start_day_idx
+	last_rev_day_idx = np.trunc((rev_ids / 1000 - day_cutoff_s) / 86400).astype(np.int64)
+	categories = _categories(rev_types, rev_ivls)
+	stability = np.maximum(rev_ivls, 0.1)
+
+	# Ordena por cartão (mantendo a ordem por id) para achar a revisão seguinte de cada evento
+	order = np.argsort(cids, kind="stable")
+	cids, start_pos = cids[order], start_pos[order]
+	last_rev_day_idx, categories = last_rev_day_idx[order], categories[order]
+	rev_ivls, stability = rev_ivls[order], stability[order]
+
+	has_next = np.zeros(len(cids), dtype=bool)
+	has_next[:-1] = cids[1:] == cids[:-1]
+	end_pos = np.full(len(cids), n_days, dtype=np.int64)
+	end_pos[:-1][has_next[:-1]] = start_pos[1:][has_next[:-1]]
+	is_first = np.ones(len(cids), dtype=bool)
+	is_first[1:] = ~has_next[:-1]
+
+	def running_total(weights=None, mask=None):
+		starts, ends = start_pos, end_pos
+		if mask is not None:
+			starts, ends = starts[mask], ends[mask]
+			weights = weights[mask] if weights is not None else None
+		deltas = np.bincount(starts, weights=weights, minlength=n_days + 1)
+		deltas -= np.bincount(ends, weights=weights, minlength=n_days + 1)
+		return np.cumsum(deltas[:n_days])
+
+	counts = {cat: running_total(mask=categories == cat) for cat in (CAT_LEARNING, CAT_YOUNG, CAT_MATURE, CAT_RETAINED)}
+	active = np.cumsum(np.bincount(start_pos[is_first], minlength=n_days + 1)[:n_days])
+	stability_ivl_total = running_total(weights=np.where(rev_ivls > 0.1, rev_ivls, 0).astype(np.float64))
+	stability_floor_cards = running_total(mask=rev_ivls <= 0.1)
+	etk = _etk_by_day(start_pos, end_pos, last_rev_day_idx, stability, graph_start_day_idx, n_days)
+
+	daily_graph_data_points = {}
+	daily_etk_points = {}
+	daily_etk_percent_points = {}
+	daily_stability_points = {}
+	for pos in range(n_days):
+		day_offset = graph_start_day_idx + pos
+		daily_graph_data_points[day_offset] = {cat: int(values[pos]) for cat, values in counts.items()}
+		active_cards_for_etk = int(active[pos])
+		total_retrievability_for_day = float(etk[pos]) if active_cards_for_etk else 0
+		daily_etk_points[day_offset] = total_retrievability_for_day
+		if active_cards_for_etk > 0:
+			daily_etk_percent_points[day_offset] = (total_retrievability_for_day / active_cards_for_etk) * 100
+			total_stability_for_day = int(stability_ivl_total[pos]) + int(stability_floor_cards[pos]) * 0.1
+			daily_stability_points[day_offset] = total_stability_for_day / active_cards_for_etk
+		else:
+			daily_etk_percent_points[day_offset] = 0
+			daily_stability_points[day_offset] = 0
+
+	return daily_graph_data_points, daily_etk_points, daily_etk_percent_points, daily_stability_points
@@ -0,0 +1,172 @@
+"""
+Varredura do histórico repartida entre vários processos.
+
+As contagens por categoria, o ETK absoluto e a soma das estabilidades de um dia são
+somas sobre os cartões, então conjuntos disjuntos de cartões podem ser varridos em
+separado e somados dia a dia. As revisões são repartidas pelo cid (cid % fatias), e
+cada fatia vai para um processo como um buffer de int64 de 4 colunas, varrido pelo
+núcleo (evolution_core), com o NumPy quando disponível. O processo principal soma as
+séries e junta as tabelas de estado dos cartões, que também são disjuntas.
+
+Os processos usam o método "spawn", que existe em todas as plataformas e não herda
+as threads do Anki; o shard_bootstrap.py faz o filho importar só o núcleo. Em um
+executável congelado o "spawn" abriria o próprio Anki, então ali, com poucas
+revisões e sempre que os processos não puderem ser usados, o histórico é varrido de
+uma vez no próprio processo, com o mesmo resultado: cada fatia percorre todos os
+dias, então repartir sem processos só deixaria a varredura mais lenta.
+"""
+import os
+import runpy
+import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from .constants import CAT_LEARNING, CAT_YOUNG, CAT_MATURE, CAT_RETAINED
+from .evolution_core import CardStateSweep, DailySeries, latest_card_states
+from .numpy_backend import NUMPY_AVAILABLE, latest_reviews, reviews_array, sweep_card_states_numpy
+
+if NUMPY_AVAILABLE:
+	import numpy as np
+
+# Abaixo disso o custo de iniciar os processos supera o ganho
+MIN_REVIEWS_PER_SHARD = 50_000
+
+_BOOTSTRAP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "shard_bootstrap.py")
+_CATEGORIES = (CAT_LEARNING, CAT_YOUNG, CAT_MATURE, CAT_RETAINED)
+
+
+def _read_past_reviews(reviews, before_id, use_numpy):
+	"""
+	Revisões com id menor que `before_id` em um único buffer de int64 (matriz (n, 4)
+	do NumPy ou `array('q')` com 4 valores por revisão), o maior id lido (ou None) e
+	as revisões restantes, que não são consumidas.
+	"""
+	if use_numpy:
+		all_reviews = reviews_array(reviews)
+		split_idx = int(all_reviews[:, 0].searchsorted(before_id))
+		last_id = int(all_reviews[split_idx - 1, 0]) if split_idx else None
+		return all_reviews[:split_idx], last_id, all_reviews[split_idx:].tolist()
+
+	past_reviews = array('q')
+	reviews = iter(reviews)
+	last_id = None
+	for review in reviews:
+		if review[0] >= before_id:
+			return past_reviews, last_id, [review] + list(reviews)
+		past_reviews.extend(review)
+		last_id = review[0]
+	return past_reviews, last_id, []
+
+
+def _review_rows(flat_reviews):
+	return (flat_reviews[pos:pos + 4] for pos in range(0, len(flat_reviews), 4))
+
+
+def _split_reviews(past_reviews, shard_count, use_numpy):
+	"""Buffers (bytes) das fatias, repartidas por cid % shard_count e ainda ordenadas por id."""
+	if use_numpy:
+		shard_idx = past_reviews[:, 1] % shard_count
+		return [np.ascontiguousarray(past_reviews[shard_idx == shard]).tobytes() for shard in range(shard_count)]
+	shards = [array('q') for _ in range(shard_count)]
+	for review in _review_rows(past_reviews):
+		shards[review[1] % shard_count].extend(review)
+	return [shard.tobytes() for shard in shards]
+
+
+def _sweep(past_reviews, day_cutoff_s, first_day_idx, last_day_idx, use_numpy, with_card_states):
+	"""Varredura de um buffer de revisões em um só processo: séries diárias e estados (ou None)."""
+	if use_numpy:
+		daily = DailySeries(*sweep_card_states_numpy(past_reviews, day_cutoff_s, first_day_idx, last_day_idx))
+		card_states = latest_card_states(latest_reviews(past_reviews).tolist()) if with_card_states else None
+		return daily, card_states
+	sweep = CardStateSweep(day_cutoff_s)
+	daily = DailySeries()
+	sweep.run(_review_rows(past_reviews), first_day_idx, last_day_idx, daily)
+	return daily, sweep.card_states() if with_card_states else None
+
+
+def sweep_shard(buffer, day_cutoff_s, first_day_idx, last_day_idx, use_numpy, with_card_states):
+	"""
+	Varre uma fatia (buffer de int64 id, cid, type, ivl ordenado por id) nos dias
+	[first_day_idx, last_day_idx]. Retorna as colunas diárias e, se pedida, a tabela de
+	estados dos cartões ao fim do último dia. Roda no processo filho.
+	"""
+	if use_numpy:
+		past_reviews = np.frombuffer(buffer, dtype=np.int64).reshape(-1, 4)
+	else:
+		past_reviews = array('q')
+		past_reviews.frombytes(buffer)
+	daily, card_states = _sweep(past_reviews, day_cutoff_s, first_day_idx, last_day_idx, use_numpy, with_card_states)
+	return daily.to_columns(first_day_idx, last_day_idx), card_states
+
+
+def _merge(shard_results, first_day_idx, last_day_idx):
+	"""Soma dia a dia as colunas das fatias e junta as tabelas de estados."""
+	merged = DailySeries()
+	card_states = {}
+	for pos, day_offset in enumerate(range(first_day_idx, last_day_idx + 1)):
+		day_counts = {cat: 0 for cat in _CATEGORIES}
+		total_retrievability = 0.0
+		active_cards = 0
+		total_stability = 0.0
+		for columns, _ in shard_results:
+			shard_active = 0
+			for cat, values in zip(_CATEGORIES, columns["counts"]):
+				day_counts[cat] += values[pos]
+				shard_active += values[pos]
+			total_retrievability += columns["etk"][pos]
+			# A estabilidade de cada fatia é uma média: volta a ser soma antes de juntar
+			total_stability += columns["stability"][pos] * shard_active
+			active_cards += shard_active
+		merged.record(day_offset, day_counts, total_retrievability, active_cards, total_stability)
+	for _, shard_card_states in shard_results:
+		if shard_card_states:
+			card_states.update(shard_card_states)
+	return merged, card_states
+
+
+def _package_root():
+	# "<addon>.src.parallel_sweep" dentro do Anki; "src.parallel_sweep" quando o src é importado direto
+	parts = __name__.split(".")
+	return parts[0] if len(parts) > 2 else None
+
+
+def _run_shards(buffers, day_cutoff_s, first_day_idx, last_day_idx, use_numpy, with_card_states):
+	"""Resultados das fatias, cada uma em um processo, ou None se os processos não puderem ser usados."""
+	args = (day_cutoff_s, first_day_idx, last_day_idx, use_numpy, with_card_states)
+	try:
+		with ProcessPoolExecutor(max_workers=len(buffers), mp_context=get_context("spawn"),
+								 initializer=runpy.run_path,
+								 initargs=(_BOOTSTRAP_PATH, {"ADDON_PACKAGE": _package_root()})) as executor:
+			return list(executor.map(sweep_shard, buffers, *[[arg] * len(buffers) for arg in args]))
+	except Exception as e:
+		print(f"Accumulated Retention: Parallel sweep unavailable, sweeping in a single process: {e}")
+		return None
+
+
+def sweep_card_states_parallel(reviews, day_cutoff_s, first_day_idx, last_day_idx, workers, use_numpy=False,
+							   with_card_states=False):
+	"""
+	Varre as revisões de `reviews` (ordenadas por id) anteriores ao fim do dia
+	`last_day_idx` em até `workers` processos, com pelo menos MIN_REVIEWS_PER_SHARD
+	revisões por processo. Retorna as séries diárias de [first_day_idx, last_day_idx],
+	a tabela de estados dos cartões (ou None), o maior id varrido (ou None) e a lista
+	das revisões posteriores, que não foram varridas.
+	"""
+	use_numpy = use_numpy and NUMPY_AVAILABLE
+	end_of_last_day_ms = (day_cutoff_s + last_day_idx * 86400) * 1000
+	past_reviews, last_id, remaining_reviews = _read_past_reviews(reviews, end_of_last_day_ms, use_numpy)
+	review_count = len(past_reviews) // (1 if use_numpy else 4)
+	shard_count = min(workers, review_count // MIN_REVIEWS_PER_SHARD)
+
+	shard_results = None
+	if shard_count > 1 and not getattr(sys, "frozen", False):
+		shard_results = _run_shards(_split_reviews(past_reviews, shard_count, use_numpy), day_cutoff_s,
+									first_day_idx, last_day_idx, use_numpy, with_card_states)
+	if shard_results is None:
+		daily, card_states = _sweep(past_reviews, day_cutoff_s, first_day_idx, last_day_idx, use_numpy,
+									with_card_states)
+	else:
+		daily, card_states = _merge(shard_results, first_day_idx, last_day_idx)
+	return daily, card_states if with_card_states else None, last_id, remaining_reviews
@@ -0,0 +1,55 @@
+"""
+Formato compacto das séries enviadas ao webview.
+
+Em vez de `[[x, y], ...]` por série, cada série leva só a coluna de valores em
+base64, e o eixo x é descrito uma vez como um intervalo (x0 e quantidade de pontos),
+porque os pontos de todos os gráficos são blocos consecutivos. Colunas inteiras
+(contagens) são codificadas como diferenças em relação ao ponto anterior, no menor
+inteiro com sinal que comporta todas; colunas de ponto flutuante viram float32,
+que sobra para valores exibidos com no máximo uma casa decimal.
+
+O decodificador correspondente fica em web/evolution_graph.js.
+"""
+import base64
+import sys
+from array import array
+
+# (código do formato, typecode do array, menor e maior valor)
+_INT_FORMATS = (("i1", "b", -2 ** 7, 2 ** 7 - 1), ("i2", "h", -2 ** 15, 2 ** 15 - 1), ("i4", "i", -2 ** 31, 2 ** 31 - 1))
+
+
+def _b64(values, typecode):
+	packed = array(typecode, values)
+	if sys.byteorder == "big":
+		packed.byteswap()
+	return base64.b64encode(packed.tobytes()).decode("ascii")
+
+
+def encode_column(values):
+	"""Coluna de números como {"t": formato, "d": base64} (mais "s", o valor inicial, para inteiros)."""
+	values = list(values)
+	if all(isinstance(value, int) for value in values):
+		start = values[0] if values else 0
+		deltas = [value - previous for previous, value in zip([start] + values[:-1], values)]
+		low, high = min(deltas, default=0), max(deltas, default=0)
+		for code, typecode, type_min, type_max in _INT_FORMATS:
+			if type_min <= low and high <= type_max:
+				return {"t": code, "s": start, "d": _b64(deltas, typecode)}
+	return {"t": "f4", "d": _b64([float(value) for value in values], "f")}
+
+
+def encode_points(points):
+	"""Pares [x, y] como o eixo x (intervalo ou coluna) e a coluna y."""
+	xs = [point[0] for point in points]
+	if xs and xs == list(range(xs[0], xs[0] + len(xs))):
+		packed = {"x0": xs[0], "n": len(xs)}
+	else:
+		packed = {"x": encode_column(xs), "n": len(xs)}
+	packed["y"] = encode_column(point[1] for point in points)
+	return packed
+
+
+def encode_series(series):
+	"""Cópia das séries do Flot com `data` no formato compacto."""
+	return [dict(s, data=encode_points(s["data"])) for s in series]
+
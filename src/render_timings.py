@@ -0,0 +1,138 @@
+"""
+Tempos de cada etapa de um render do gráfico, para diagnosticar coleções lentas.
+
+Um render (`timed_render`) acumula o tempo gasto em cada etapa (leitura do revlog,
+snapshot em disco, varredura, agregação, serialização e montagem do HTML) e o número
+de linhas lidas do revlog. As etapas podem ser aninhadas: o tempo de uma etapa
+interna é descontado da externa, já que as páginas do revlog são lidas no meio da
+varredura. Cada render vira uma linha de user_files/render_timings.log, um log
+rotativo.
+
+O render corrente fica em uma variável da thread, porque o gráfico da tela principal
+pode ser calculado em segundo plano. Fora de um render, `stage` e `add_rows` não
+fazem nada.
+"""
+import contextlib
+import os
+import threading
+import time
+
+LOG_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "user_files")
+LOG_FILE = "render_timings.log"
+_LOG_MAX_BYTES = 256 * 1024
+_LOG_BACKUP_COUNT = 2
+
+# Ordem das etapas no log e no rodapé
+STAGES = ("query", "snapshot", "sweep", "aggregation", "serialization", "html")
+
+_local = threading.local()
+_logger = None
+
+
+class RenderTimings:
+	"""Tempo exclusivo de cada etapa de um render, em segundos, e as linhas lidas do revlog."""
+
+	def __init__(self, label):
+		self.label = label
+		self.seconds = {}
+		self.rows = 0
+		self._stack = []
+		self._started = self._mark = time.perf_counter()
+
+	def _switch(self):
+		# Credita à etapa do topo da pilha o tempo desde a última troca
+		now = time.perf_counter()
+		if self._stack:
+			name = self._stack[-1]
+			self.seconds[name] = self.seconds.get(name, 0.0) + now - self._mark
+		self._mark = now
+
+	@contextlib.contextmanager
+	def stage(self, name):
+		self._switch()
+		self._stack.append(name)
+		try:
+			yield
+		finally:
+			self._switch()
+			self._stack.pop()
+
+	def total(self):
+		return time.perf_counter() - self._started
+
+	def summary(self):
+		"""Ex.: "total 812 ms · query 120 ms · 250,000 rows · sweep 655 ms · ..."."""
+		parts = ["total {:.0f} ms".format(self.total() * 1000)]
+		for name in STAGES:
+			if name in self.seconds:
+				parts.append("{} {:.0f} ms".format(name, self.seconds[name] * 1000))
+			if name == "query" and self.rows:
+				parts.append("{:,} rows".format(self.rows))
+		return " · ".join(parts)
+
+
+def current():
+	"""Render medido nesta thread, ou None."""
+	return getattr(_local, "timings", None)
+
+
+def stage(name):
+	"""Contexto que mede a etapa `name` do render corrente."""
+	timings = current()
+	if timings is None:
+		return contextlib.nullcontext()
+	return timings.stage(name)
+
+
+def add_rows(count):
+	timings = current()
+	if timings is not None:
+		timings.rows += count
+
+
+@contextlib.contextmanager
+def timed_render(label):
+	"""
+	Mede um render e, ao final, grava seus tempos no log. Um render iniciado dentro de
+	outro conta no de fora.
+	"""
+	outer = current()
+	if outer is not None:
+		yield outer
+		return
+	timings = RenderTimings(label)
+	_local.timings = timings
+	try:
+		yield timings
+	finally:
+		_local.timings = None
+		_write_log(timings)
+
+
+def _get_logger():
+	global _logger
+	if _logger is None:
+		# Importado só no primeiro render, como o resto do cálculo
+		import logging
+		import logging.handlers
+
+		logger = logging.getLogger(__name__)
+		logger.setLevel(logging.INFO)
+		logger.propagate = False
+		# O Anki pode recarregar o módulo; o handler do logger continua registrado
+		if not logger.handlers:
+			os.makedirs(LOG_DIR, exist_ok=True)
+			handler = logging.handlers.RotatingFileHandler(
+				os.path.join(LOG_DIR, LOG_FILE), maxBytes=_LOG_MAX_BYTES, backupCount=_LOG_BACKUP_COUNT,
+				encoding="utf-8")
+			handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+			logger.addHandler(handler)
+		_logger = logger
+	return _logger
+
+
+def _write_log(timings):
+	try:
+		_get_logger().info(timings.label + " " + timings.summary())
+	except OSError as e:
+		print(f"Accumulated Retention: Failed to write the render timings log: {e}")
@@ -1,21 +1,53 @@
-import time
-
-from aqt import mw
+import itertools
+import json
 
+from . import render_timings
+from .config import get_config
 from .data_processing import get_card_evolution_data
 from .translations import tr
 
 
 # --- Nova seção de Hooking ---
-def render_card_evolution_graph(self_instance):
+_graph_ids = itertools.count()
+
+
+def new_graph_id():
+	return "evolutionGraph" + str(next(_graph_ids))
+
+
+def render_card_evolution_graph(self_instance, config=None):
+	if config is None:
+		config = get_config()
+
+	label = type(self_instance).__name__ + " period_days=" + str(self_instance._periodDays()) + \
+		" backend=" + config.evolution_backend + " snapshot_cache=" + str(config.snapshot_cache)
+	with render_timings.timed_render(label) as timings:
+		graph_id = new_graph_id()
+		graph_data = get_card_evolution_data(self_instance, graph_id, config)
+		return render_graph_data(self_instance, graph_id, graph_data, config) + render_timings_footer(timings, config)
+
+
+def render_timings_footer(timings, config):
+	"""Rodapé com os tempos do render, quando `show_render_timings` está ligado."""
+	if not config.show_render_timings:
+		return ""
+	return ('<div style="text-align:center;font-size:0.75em;color:#888;margin-top:0.3em;">' +
+			tr("label_render_timings") + ": " + timings.summary() + '</div>')
+
+
+def render_graph_data(self_instance, graph_id, graph_data, config):
+	"""HTML (título e gráfico) para um resultado de `get_card_evolution_data`."""
+	with render_timings.stage("html"):
+		return _render_graph_data(self_instance, graph_id, graph_data, config)
+
+
+def _render_graph_data(self_instance, graph_id, graph_data, config):
 	from .main_screen_integration import CompleteCollectionStats
 
-	graph_id = "evolutionGraph" + str(time.time()).replace('.', '')
 	title = tr("graph_title")
 	subtitle = tr("graph_subtitle")
-	series_data, options, tooltip_html, aggregation_chunk_days, y2label = get_card_evolution_data(self_instance, graph_id)
+	series_data, options, tooltip, aggregation_chunk_days, y2label = graph_data
 
-	# Remover prints de depuração
 	if not series_data or not any(s['data'] for s in series_data):
 		return "<div style='text-align:center;margin-top:1em;'>" + tr("graph_no_data") + "</div>"
 
@@ -28,26 +60,19 @@ def render_card_evolution_graph(self_instance):
 	# Nossas strings title e subtitle são literais em português.
 	html = self_instance._title(title, subtitle)
 
-	config = mw.addonManager.getConfig(__name__)
-
 	# Rendering logic now depends on the stats instance type
 	# A lógica de renderização agora depende do tipo de instância de estatísticas
 
-	secondary_graph = config.get("secondary_graph")
-	print(f'{html = }')
-	print(f'{isinstance(self_instance, CompleteCollectionStats) = }')
-	print(f'{secondary_graph = }')
-
 	if isinstance(self_instance, CompleteCollectionStats):
-		# For the main screen, we pass the tooltip html to be integrated by the custom _graph method
-		# Para a tela principal, passamos o tooltip_html para ser integrado pelo método _graph customizado
+		# For the main screen, the custom _graph method sends the tooltip data along with the graph payload
+		# Para a tela principal, o método _graph customizado envia os dados do tooltip junto com o payload do gráfico
 		html += self_instance._graph(
 			id=graph_id,
 			data=series_data,
 			conf=options,
 			ylabel=tr("graph_y_label"),
 			y2label=y2label,
-			tooltip_html=tooltip_html
+			tooltip=tooltip
 		)
 	else:
 		# For the default stats screen, we use the original Anki method (without y2label)
@@ -60,6 +85,9 @@ def render_card_evolution_graph(self_instance):
 			y2label=y2label
 		)
 
-		html += tooltip_html
+		# O Anki desenha o gráfico; o renderer do addon (web/evolution_graph.js) só cuida do tooltip
+		with render_timings.stage("serialization"):
+			html += ('<script>if (window.attachEvolutionGraphTooltip) { attachEvolutionGraphTooltip(' +
+					 json.dumps(graph_id) + ', ' + json.dumps(tooltip).replace('</', '<\\/') + '); }</script>')
 
 	return html
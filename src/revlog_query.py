@@ -0,0 +1,115 @@
+"""
+Montagem das consultas ao revlog com os filtros de cartão (deck, excluídos, suspensos).
+
+Em vez de uma subconsulta `cid IN (SELECT id FROM cards ...)` por filtro, todos os
+filtros viram condições sobre um único JOIN com `cards`. A mesma instância gera a
+sonda de MIN(id), a varredura principal e as consultas auxiliares sobre o conjunto
+de cartões (impressão digital do cache e filtro dos hooks), então todas concordam.
+"""
+
+
+def _ids_sql(ids):
+	return "(" + ",".join(str(int(i)) for i in ids) + ")"
+
+
+def _select(columns, with_deck):
+	return "SELECT " + columns + (", c.did" if with_deck else "")
+
+
+class RevlogQuery:
+	"""Consultas ao revlog restritas aos cartões de `deck_ids` (None = coleção inteira)."""
+
+	def __init__(self, deck_ids=None, exclude_deleted=True, exclude_suspended=True):
+		self.deck_ids = sorted(set(deck_ids)) if deck_ids is not None else None
+		self.exclude_deleted = bool(exclude_deleted)
+		self.exclude_suspended = bool(exclude_suspended)
+
+		self.card_conditions = []
+		if self.deck_ids is not None:
+			self.card_conditions.append("c.did IN " + _ids_sql(self.deck_ids))
+		if self.exclude_suspended:
+			self.card_conditions.append("c.queue != -1")
+		# Qualquer filtro sobre o cartão exige que ele exista, como as subconsultas antigas
+		self.joins_cards = self.exclude_deleted or bool(self.card_conditions)
+
+	def key_parts(self):
+		return [self.deck_ids, self.exclude_deleted, self.exclude_suspended]
+
+	def _from_where(self, conditions=(), revlog_order=False, with_deck=False, scan_revlog=False):
+		if with_deck and not self.joins_cards:
+			# Revisões de cartões excluídos continuam valendo para a coleção, com did NULL
+			sql = " FROM revlog r LEFT JOIN cards c ON c.id = r.cid"
+		elif self.deck_ids is not None and not scan_revlog:
+			# CROSS JOIN fixa a ordem no SQLite: os cartões do deck vêm de ix_cards_sched e
+			# as revisões de cada um de ix_revlog_cid, sem percorrer o revlog inteiro
+			sql = " FROM cards c CROSS JOIN revlog r ON r.cid = c.id"
+		elif (revlog_order or scan_revlog) and self.joins_cards:
+			# Páginas por id (LIMIT) precisam percorrer o revlog na ordem do id e parar no limite
+			sql = " FROM revlog r CROSS JOIN cards c ON c.id = r.cid"
+		elif self.joins_cards:
+			# Sem deck, percorrer o revlog na ordem do id evita ordenar o resultado
+			sql = " FROM revlog r JOIN cards c ON c.id = r.cid"
+		else:
+			sql = " FROM revlog r"
+		conditions = self.card_conditions + list(conditions)
+		if conditions:
+			sql += " WHERE " + " AND ".join(conditions)
+		return sql
+
+	def _id_range(self, after_id=None, before_id=None):
+		conditions = []
+		if after_id is not None:
+			conditions.append("r.id > " + str(int(after_id)))
+		if before_id is not None:
+			conditions.append("r.id < " + str(int(before_id)))
+		return conditions
+
+	def min_id_sql(self):
+		return "SELECT MIN(r.id)" + self._from_where()
+
+	def reviews_sql(self, after_id=None, before_id=None, limit=None, with_deck=False, scan_revlog=False):
+		"""
+		Revisões (id, cid, type, ivl) no intervalo aberto (after_id, before_id), ordenadas
+		por id. Com `limit`, só as primeiras; a próxima página começa no último id lido.
+		Com `with_deck`, acrescenta o deck atual do cartão (c.did) a cada linha. Com
+		`scan_revlog`, mesmo um deck é lido percorrendo o revlog na ordem do id.
+		"""
+		sql = _select("r.id, r.cid, r.type, r.ivl", with_deck) + self._from_where(
+			self._id_range(after_id, before_id), limit is not None, with_deck, scan_revlog) + " ORDER BY r.id ASC"
+		if limit is not None:
+			sql += " LIMIT " + str(int(limit))
+		return sql
+
+	def range_end_sql(self, after_id, before_id, rows):
+		"""
+		Id da `rows`-ésima linha do revlog inteiro (sem os filtros) no intervalo (after_id,
+		before_id), ou nenhuma linha se ele tiver menos. Lido da chave primária do revlog.
+		"""
+		sql = "SELECT r.id FROM revlog r"
+		conditions = self._id_range(after_id, before_id)
+		if conditions:
+			sql += " WHERE " + " AND ".join(conditions)
+		return sql + " ORDER BY r.id ASC LIMIT 1 OFFSET " + str(int(rows) - 1)
+
+	def latest_before_sql(self, before_id, with_deck=False):
+		"""
+		Última revisão de cada cartão com id menor que `before_id`, ordenadas por id.
+		O SQLite devolve as demais colunas da linha que tem o MAX(r.id) do grupo.
+		"""
+		return _select("MAX(r.id), r.cid, r.type, r.ivl", with_deck) + \
+			self._from_where(self._id_range(before_id=before_id), with_deck=with_deck) + " GROUP BY r.cid ORDER BY 1 ASC"
+
+	def card_set_sql(self):
+		"""Contagem e soma dos ids dos cartões elegíveis, ou None se o revlog não é filtrado por cartão."""
+		if not self.joins_cards:
+			return None
+		sql = "SELECT count(), sum(c.id) FROM cards c"
+		if self.card_conditions:
+			sql += " WHERE " + " AND ".join(self.card_conditions)
+		return sql
+
+	def card_match_sql(self):
+		"""Consulta com um parâmetro (id do cartão) que retorna 1 se o cartão é elegível."""
+		if not self.joins_cards:
+			return None
+		return "SELECT 1 FROM cards c WHERE " + " AND ".join(["c.id = ?"] + self.card_conditions)
@@ -0,0 +1,141 @@
+"""
+Leitura do revlog e varredura das revisões em séries diárias, sem o cache de
+snapshots e sem o Anki.
+
+`col` é qualquer objeto com `db` (`all`, `scalar`) e `sched.day_cutoff`: a coleção
+aberta no Anki ou um arquivo .anki2 aberto direto com sqlite3 pela linha de comando
+(export_cli.py), que assim calcula as mesmas séries que o gráfico.
+"""
+import itertools
+
+from . import render_timings
+from .evolution_core import DailySeries, sweep_card_states
+from .numpy_backend import reviews_array, sweep_card_states_numpy
+from .parallel_sweep import sweep_card_states_parallel
+
+
+def _read_reviews(col, sql):
+	with render_timings.stage("query"):
+		rows = col.db.all(sql)
+	render_timings.add_rows(len(rows))
+	return rows
+
+
+def iter_reviews(col, revlog_query, after_id, before_id, batch_size, with_deck=False):
+	"""
+	Revisões no intervalo (after_id, before_id), ordenadas por id, lidas em páginas de
+	cerca de `batch_size` linhas, para que o histórico nunca fique inteiro em memória.
+	Com `batch_size` 0, lê tudo em uma consulta.
+	"""
+	if not batch_size:
+		yield from _read_reviews(col, revlog_query.reviews_sql(after_id=after_id, before_id=before_id, with_deck=with_deck))
+		return
+	scan_revlog = revlog_query.deck_ids is None or _deck_has_most_cards(col, revlog_query)
+	if not scan_revlog:
+		yield from _iter_deck_ranges(col, revlog_query, after_id, before_id, batch_size, with_deck)
+		return
+	# Paginação por id: cada página percorre o revlog na ordem do id e para no LIMIT
+	while True:
+		page = _read_reviews(col, revlog_query.reviews_sql(
+			after_id=after_id, before_id=before_id, limit=batch_size, with_deck=with_deck, scan_revlog=True))
+		yield from page
+		if len(page) < batch_size:
+			return
+		after_id = page[-1][0]
+
+
+def _deck_has_most_cards(col, revlog_query):
+	# Um deck com a maior parte da coleção sai mais barato percorrendo o revlog, como a coleção inteira
+	with render_timings.stage("query"):
+		return col.db.scalar(revlog_query.card_set_sql()) * 2 > col.db.scalar("SELECT count() FROM cards")
+
+
+def _iter_deck_ranges(col, revlog_query, after_id, before_id, batch_size, with_deck):
+	"""
+	Revisões de um deck em faixas de id, cada uma lida a partir dos cartões do deck. Com
+	LIMIT, cada página teria de ordenar todas as revisões restantes do deck; em vez
+	disso, o fim da faixa vem da chave primária do revlog, e o número de linhas do
+	revlog por faixa acompanha a proporção de revisões do deck na faixa anterior (no
+	máximo 4x maior a cada página), para que cada uma tenha cerca de `batch_size`.
+	"""
+	range_rows = batch_size
+	while True:
+		with render_timings.stage("query"):
+			range_end_id = col.db.scalar(revlog_query.range_end_sql(after_id, before_id, range_rows))
+		page = _read_reviews(col, revlog_query.reviews_sql(
+			after_id=after_id, before_id=before_id if range_end_id is None else range_end_id + 1, with_deck=with_deck))
+		yield from page
+		if range_end_id is None:
+			return
+		after_id = range_end_id
+		range_rows = min(4 * range_rows, max(batch_size, range_rows * batch_size // max(len(page), 1)))
+
+
+def iter_window_reviews(col, revlog_query, day_cutoff_s, window_first_day_idx, batch_size, with_deck=False):
+	"""
+	Revisões anteriores a hoje para varrer a partir do dia `window_first_day_idx`: a
+	última revisão de cada cartão antes da janela, que semeia o estado dos cartões,
+	seguida das revisões da janela. Com None, lê o histórico inteiro. Com `with_deck`,
+	cada revisão traz também o deck atual do cartão.
+	"""
+	end_date_timestamp_ms = day_cutoff_s * 1000
+	if window_first_day_idx is None:
+		yield from iter_reviews(col, revlog_query, None, end_date_timestamp_ms, batch_size, with_deck)
+		return
+	# As revisões anteriores ao início da janela só contam pelo estado que deixaram
+	window_start_ms = (day_cutoff_s + (window_first_day_idx - 1) * 86400) * 1000
+	yield from _read_reviews(col, revlog_query.latest_before_sql(window_start_ms, with_deck))
+	yield from iter_reviews(col, revlog_query, window_start_ms - 1, end_date_timestamp_ms, batch_size, with_deck)
+
+
+def peek(reviews):
+	"""Primeira revisão de `reviews` (ou None) e um iterador que ainda a inclui."""
+	reviews = iter(reviews)
+	first_review = next(reviews, None)
+	if first_review is None:
+		return None, reviews
+	return first_review, itertools.chain([first_review], reviews)
+
+
+def day_cutoff(col):
+	try:
+		return col.sched.day_cutoff
+	except AttributeError:
+		return col.sched.dayCutoff
+
+
+def graph_window(col, revlog_query, day_cutoff_s, period_days):
+	"""
+	Primeiro dia do gráfico e se o período é uma janela fixa (só ela é lida do revlog).
+	Para o deck inteiro, o primeiro dia é o da revisão mais antiga; None se não houver revisões.
+	"""
+	# Com um período definido, só as revisões dentro dele são lidas do revlog
+	if period_days is not None and period_days > 0:
+		return -(period_days - 1), True
+
+	# Deck life ou period_days é 0 ou None
+	with render_timings.stage("query"):
+		min_revlog_id_ms = col.db.scalar(revlog_query.min_id_sql())
+	if not min_revlog_id_ms:  # Se não há revisões, retorna dados vazios
+		return None
+	days_ago = (day_cutoff_s - (min_revlog_id_ms / 1000)) // 86400
+	return -int(days_ago), False
+
+
+def sweep_window(col, revlog_query, day_cutoff_s, graph_start_day_idx, windowed, use_numpy, batch_size, workers=0):
+	"""
+	Séries diárias de `graph_start_day_idx` até hoje, varrendo o revlog sem cache:
+	só a janela quando `windowed`, senão o histórico inteiro. Com `workers` maior que
+	1, a varredura é repartida entre processos. Retorna None se não houver revisões.
+	"""
+	first_review, all_reviews = peek(iter_window_reviews(
+		col, revlog_query, day_cutoff_s, graph_start_day_idx if windowed else None, batch_size))
+	if first_review is None:
+		return None
+
+	with render_timings.stage("sweep"):
+		if workers > 1:
+			return sweep_card_states_parallel(all_reviews, day_cutoff_s, graph_start_day_idx, 0, workers, use_numpy)[0]
+		if use_numpy:
+			return DailySeries(*sweep_card_states_numpy(reviews_array(all_reviews), day_cutoff_s, graph_start_day_idx))
+		return sweep_card_states(all_reviews, day_cutoff_s, graph_start_day_idx)
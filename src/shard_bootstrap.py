@@ -0,0 +1,17 @@
+"""
+Executado com runpy.run_path no início de cada processo da varredura paralela
+(parallel_sweep.py), antes de qualquer import do addon. Registra o pacote raiz do
+addon como um pacote vazio apontando para a pasta dele, para que o núcleo possa ser
+importado sem executar o __init__.py do addon, que importa o aqt e registra hooks.
+
+`ADDON_PACKAGE` (nome do pacote raiz, ou None quando o `src` já é o pacote raiz) vem
+de init_globals.
+"""
+import os
+import sys
+import types
+
+if ADDON_PACKAGE and ADDON_PACKAGE not in sys.modules:  # noqa: F821
+	package = types.ModuleType(ADDON_PACKAGE)
+	package.__path__ = [os.path.dirname(os.path.dirname(os.path.abspath(__file__)))]
+	sys.modules[ADDON_PACKAGE] = package
@@ -0,0 +1,124 @@
+"""
+Cache em disco dos agregados diários e da tabela de estados dos cartões.
+
+Cada snapshot guarda as séries de todos os dias completos (até ontem), o estado de
+cada cartão ao fim desse dia e o maior id de revlog já aplicado (high-water mark).
+Um render posterior só precisa reprocessar as revisões com id maior que esse valor.
+Snapshots montados a partir de uma janela (ver `history_start_day_idx`) só servem
+para gráficos que começam dentro dela.
+
+O snapshot é descartado quando deixa de corresponder à coleção: revisões antigas
+inseridas depois (sincronização) mudam a contagem do revlog até o high-water mark, e
+exclusões, suspensões e mudanças de deck mudam a impressão digital dos cartões.
+Snapshots de decks ou coleções que deixaram de ser abertos saem da pasta quando ela
+passa de MAX_SNAPSHOTS arquivos.
+"""
+import hashlib
+import json
+import os
+
+CACHE_FORMAT_VERSION = 2
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "user_files", "snapshot_cache")
+# Snapshots mantidos na pasta; acima disso, os gravados há mais tempo são apagados
+MAX_SNAPSHOTS = 32
+
+
+def make_cache_key(col_path, revlog_query):
+	raw_key = json.dumps([CACHE_FORMAT_VERSION, col_path] + revlog_query.key_parts())
+	return hashlib.sha1(raw_key.encode("utf-8")).hexdigest()
+
+
+def _cache_path(cache_key):
+	return os.path.join(CACHE_DIR, cache_key + ".json")
+
+
+def _fingerprint(col, high_water_mark, revlog_query):
+	revlog_rows = col.db.scalar("SELECT count() FROM revlog WHERE id <= " + str(int(high_water_mark)))
+	card_set = None
+	card_set_sql = revlog_query.card_set_sql()
+	if card_set_sql:
+		card_set = col.db.first(card_set_sql)
+		card_set = list(card_set) if card_set else None
+	return [revlog_rows, card_set]
+
+
+def load_snapshot(col, cache_key, day_cutoff_s, revlog_query):
+	"""
+	Lê o snapshot de `cache_key` com os índices de dia já deslocados para `day_cutoff_s`.
+	Retorna None se não existir, estiver corrompido ou não corresponder mais à coleção.
+	"""
+	try:
+		with open(_cache_path(cache_key), "r", encoding="utf-8") as cache_file:
+			snapshot = json.load(cache_file)
+	except (OSError, ValueError):
+		return None
+
+	if snapshot.get("version") != CACHE_FORMAT_VERSION:
+		return None
+
+	# Os índices de dia são relativos ao day_cutoff do momento em que o snapshot foi salvo
+	elapsed_s = day_cutoff_s - snapshot["day_cutoff_s"]
+	if elapsed_s < 0 or elapsed_s % 86400:
+		return None
+	shift_days = elapsed_s // 86400
+
+	if snapshot["fingerprint"] != _fingerprint(col, snapshot["high_water_mark"], revlog_query):
+		return None
+
+	history_start_day_idx = snapshot["history_start_day_idx"]
+	return {
+		"high_water_mark": snapshot["high_water_mark"],
+		"history_start_day_idx": history_start_day_idx - shift_days if history_start_day_idx is not None else None,
+		"first_day_idx": snapshot["first_day_idx"] - shift_days,
+		"last_day_idx": snapshot["last_day_idx"] - shift_days,
+		"columns": snapshot["columns"],
+		"card_states": {cid: (category, ivl, last_rev_time)
+						for cid, category, ivl, last_rev_time in snapshot["card_states"]},
+	}
+
+
+def save_snapshot(col, cache_key, revlog_query, day_cutoff_s, high_water_mark, first_day_idx, last_day_idx, columns,
+				  card_states, history_start_day_idx=None):
+	snapshot = {
+		"version": CACHE_FORMAT_VERSION,
+		"day_cutoff_s": day_cutoff_s,
+		"high_water_mark": high_water_mark,
+		"history_start_day_idx": history_start_day_idx,
+		"fingerprint": _fingerprint(col, high_water_mark, revlog_query),
+		"first_day_idx": first_day_idx,
+		"last_day_idx": last_day_idx,
+		"columns": columns,
+		"card_states": [[cid, category, ivl, last_rev_time]
+						for cid, (category, ivl, last_rev_time) in card_states.items()],
+	}
+	try:
+		os.makedirs(CACHE_DIR, exist_ok=True)
+		tmp_path = _cache_path(cache_key) + ".tmp"
+		with open(tmp_path, "w", encoding="utf-8") as cache_file:
+			json.dump(snapshot, cache_file, separators=(",", ":"))
+		os.replace(tmp_path, _cache_path(cache_key))
+	except OSError as e:
+		print(f"Accumulated Retention: Failed to save snapshot cache: {e}")
+		return
+	_prune_snapshots()
+
+
+def _prune_snapshots():
+	# Um snapshot em uso é regravado sempre que ganha um dia, então o mtime indica o último uso
+	try:
+		snapshots = []
+		for entry in os.scandir(CACHE_DIR):
+			if entry.name.endswith(".json"):
+				try:
+					snapshots.append((entry.stat().st_mtime, entry.path))
+				except OSError:
+					continue
+		snapshots.sort(reverse=True)
+		for _, path in snapshots[MAX_SNAPSHOTS:]:
+			try:
+				os.remove(path)
+			except FileNotFoundError:
+				# Já apagado por outro render
+				pass
+	except OSError as e:
+		print(f"Accumulated Retention: Failed to prune snapshot cache: {e}")
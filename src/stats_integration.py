@@ -1,8 +1,6 @@
 from anki import stats
 from anki.hooks import wrap
-from aqt import mw
-
-from .rendering import render_card_evolution_graph
+from .config import get_config
 
 # Tentar usar cardGraph (sem underscore)
 TARGET_METHOD_NAME = "cardGraph"
@@ -45,10 +43,12 @@ def add_evolution_graph_to_card_stats(self_instance, *original_args, **original_
 	else:
 		original_card_graph_html = "<!-- Original graph could not be determined -->"
 
-	evolution_graph_html = render_card_evolution_graph(self_instance)
+	from .rendering import render_card_evolution_graph
+
+	config = get_config()
+	evolution_graph_html = render_card_evolution_graph(self_instance, config)
 
-	config = mw.addonManager.getConfig(__name__)
-	show_at_beginning = config.get("show_at_beginning")  # False por padrão (mostrar ao final)
+	show_at_beginning = config.show_at_beginning  # False por padrão (mostrar ao final)
 
 	if show_at_beginning:
 		# Mostrar o gráfico de evolução ANTES do gráfico original
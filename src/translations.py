@@ -3,15 +3,25 @@ from typing import Any
 from aqt import mw
 from aqt.qt import QLocale
 
+from .config import get_config
+
 DEFAULT_LANG = "en"
 
+MONTH_KEYS = ["month_jan", "month_feb", "month_mar", "month_apr", "month_may", "month_jun",
+			  "month_jul", "month_aug", "month_sep", "month_oct", "month_nov", "month_dec"]
+
+# Catálogo resolvido: (defaultLang do Anki e snapshot do config usados para montá-lo, tabela
+# de textos do idioma atual). Reaproveitado até o config do addon mudar ou o idioma do Anki trocar.
+_catalog = None
+
 
-def get_supported_languages() -> list:
+def get_supported_languages(config=None) -> list:
 	"""Extrai dinamicamente os idiomas suportados do config.json."""
 	try:
-		config = mw.addonManager.getConfig(__package__)
-		if config and "translation_maps" in config:
-			supported = list(config["translation_maps"].keys())
+		if config is None:
+			config = get_config()
+		if config.translation_maps:
+			supported = list(config.translation_maps.keys())
 			return supported
 	except Exception as e:
 		pass
@@ -20,20 +30,24 @@ def get_supported_languages() -> list:
 	return [DEFAULT_LANG]
 
 
-def get_language_code() -> str:
+def _anki_language():
+	try:
+		if mw and mw.pm and mw.pm.meta:
+			return mw.pm.meta.get('defaultLang')
+	except Exception as e:
+		pass
+	return None
+
+
+def get_language_code(config=None) -> str:
 	"""
 	Detecta o idioma atual usando funções nativas do Anki.
 	Prioridade: Anki -> Sistema -> DEFAULT_LANG
 	"""
-	supported_languages = get_supported_languages()
+	supported_languages = get_supported_languages(config)
 
 	# 1. Tentar idioma do Anki primeiro
-	raw_anki_lang = None
-	try:
-		if mw and mw.pm and mw.pm.meta:
-			raw_anki_lang = mw.pm.meta.get('defaultLang')
-	except Exception as e:
-		pass
+	raw_anki_lang = _anki_language()
 
 	if raw_anki_lang:
 		# Normalizar alguns códigos de idioma comuns
@@ -79,25 +93,31 @@ def get_language_code() -> str:
 	return DEFAULT_LANG
 
 
-def tr(key: str, **kwargs: Any) -> str:
-	"""Traduz uma chave para o idioma atual usando os mapas do config.json."""
-	lang_code = get_language_code()
+def _load_catalog(config):
+	"""Tabela de textos do idioma atual, com o inglês preenchendo as chaves que faltam."""
+	translation_maps = config.translation_maps
+	if not translation_maps or not isinstance(translation_maps, dict):
+		return {}
 
-	config = mw.addonManager.getConfig(__package__)
-	if not config:
-		return key
+	lang_code = get_language_code(config)
+	catalog = dict(translation_maps.get(DEFAULT_LANG, {}))
+	if lang_code != DEFAULT_LANG:
+		catalog.update(translation_maps.get(lang_code, {}))
+	return catalog
 
-	translation_maps = config.get("translation_maps")
-	if not translation_maps or not isinstance(translation_maps, dict):
-		return key
 
-	default_lang_map = translation_maps.get(DEFAULT_LANG, {})
-	current_lang_map = translation_maps.get(lang_code, default_lang_map)
+def _get_catalog():
+	global _catalog
+	anki_lang = _anki_language()
+	config = get_config()
+	if _catalog is None or _catalog[0] != anki_lang or _catalog[1] is not config:
+		_catalog = (anki_lang, config, _load_catalog(config))
+	return _catalog[2]
 
-	text_template = current_lang_map.get(key)
 
-	if text_template is None and lang_code != DEFAULT_LANG:
-		text_template = default_lang_map.get(key)
+def tr(key: str, **kwargs: Any) -> str:
+	"""Traduz uma chave para o idioma atual usando os mapas do config.json."""
+	text_template = _get_catalog().get(key)
 
 	if text_template is None:
 		return key
@@ -108,3 +128,9 @@ def tr(key: str, **kwargs: Any) -> str:
 		return key
 	except Exception as e:
 		return key
+
+
+def tr_many(keys: list) -> list:
+	"""Traduz várias chaves de uma vez (ex.: MONTH_KEYS), resolvendo o catálogo uma única vez."""
+	catalog = _get_catalog()
+	return [catalog.get(key, key) for key in keys]
@@ -0,0 +1,117 @@
+"""
+Modelos de evolução mantidos em memória entre renders.
+
+Depois do primeiro render de um conjunto de cartões, o EvolutionModel fica guardado
+aqui e é atualizado pelos hooks de resposta do revisor, então as telas de visão geral
+e de parabéns podem ser redesenhadas sem consultar o revlog. Qualquer operação que
+possa mudar o conjunto de cartões ou o histórico (exclusão, suspensão, mudança de
+deck, desfazer, sincronização) descarta todos os modelos; o próximo render volta a
+partir do snapshot em disco. Só os conjuntos usados mais recentemente ficam em
+memória (MAX_MODELS).
+"""
+import threading
+from collections import OrderedDict
+
+from aqt import gui_hooks, mw
+from aqt.qt import QTimer
+
+# Máximo de modelos guardados; acima disso, o usado há mais tempo é descartado
+MAX_MODELS = 8
+
+# Os gráficos podem ser calculados em segundo plano enquanto os hooks rodam na thread principal
+lock = threading.RLock()
+_models = OrderedDict()
+_generation = 0
+# Resposta já aplicada por on_card_answered cuja operação ainda não passou por on_operation_did_execute
+_answer_pending = False
+
+
+def get_model(cache_key):
+	with lock:
+		entry = _models.get(cache_key)
+		if entry is None:
+			return None
+		_models.move_to_end(cache_key)
+		return entry[0]
+
+
+def generation():
+	"""Muda a cada resposta registrada e a cada invalidação."""
+	return _generation
+
+
+def store_model(cache_key, model, revlog_query, built_at_generation):
+	"""Guarda o modelo, a menos que algo tenha mudado desde `built_at_generation`."""
+	with lock:
+		if built_at_generation == _generation:
+			_models[cache_key] = (model, revlog_query)
+			_models.move_to_end(cache_key)
+			while len(_models) > MAX_MODELS:
+				_models.popitem(last=False)
+
+
+def invalidate_all(*args, **kwargs):
+	global _generation
+	with lock:
+		_models.clear()
+		_generation += 1
+
+
+def on_card_answered(reviewer, card, ease):
+	"""Acrescenta a revisão recém-registrada aos modelos cujos filtros incluem o cartão."""
+	global _generation, _answer_pending
+	with lock:
+		_generation += 1
+		_answer_pending = True
+		if _models:
+			_add_answer_to_models(card)
+	# A operação da resposta chega a on_operation_did_execute antes de o Qt voltar ao laço de
+	# eventos; nas versões em que responder não é uma operação, o aviso não sobra para a próxima
+	QTimer.singleShot(0, _clear_answer_pending)
+
+
+def _clear_answer_pending():
+	global _answer_pending
+	_answer_pending = False
+
+
+def _add_answer_to_models(card):
+	try:
+		latest_review = mw.col.db.first(
+			"SELECT id, cid, type, ivl FROM revlog WHERE cid = ? ORDER BY id DESC LIMIT 1", card.id)
+		if not latest_review:
+			return
+		for model, revlog_query in _models.values():
+			card_match_sql = revlog_query.card_match_sql()
+			if card_match_sql and not mw.col.db.scalar(card_match_sql, card.id):
+				continue
+			model.add_reviews([list(latest_review)])
+	except Exception as e:
+		print(f"Accumulated Retention: Failed to update in-memory graph state: {e}")
+		invalidate_all()
+
+
+def on_operation_did_execute(changes, handler):
+	global _answer_pending
+	from aqt.reviewer import Reviewer
+	if isinstance(handler, Reviewer) and _answer_pending:
+		# A resposta já chegou por on_card_answered; suspender, enterrar ou mudar o deck pelo revisor não
+		_answer_pending = False
+		return
+	if getattr(changes, "card", False) or getattr(changes, "deck", False):
+		invalidate_all()
+
+
+def init_warm_state_hooks():
+	"""Registers the hooks that keep the in-memory models up to date.
+	Registra os hooks que mantêm os modelos em memória atualizados."""
+	gui_hooks.reviewer_did_answer_card.append(on_card_answered)
+	gui_hooks.operation_did_execute.append(on_operation_did_execute)
+	gui_hooks.sync_did_finish.append(invalidate_all)
+	gui_hooks.profile_will_close.append(invalidate_all)
+	# Hooks de versões mais antigas do Anki, onde desfazer e excluir notas não passam por operation_did_execute
+	if hasattr(gui_hooks, "state_did_undo"):
+		gui_hooks.state_did_undo.append(invalidate_all)
+	from anki import hooks
+	if hasattr(hooks, "notes_will_be_deleted"):
+		hooks.notes_will_be_deleted.append(invalidate_all)
@@ -0,0 +1,44 @@
+"""
+Scripts carregados no <head> das páginas que mostram o gráfico.
+
+O jQuery é a cópia que o Anki já carrega nessas telas. O Flot e o plugin de
+empilhamento vão junto com o addon (web/vendor), e eles e o renderer do addon
+(web/evolution_graph.js) são servidos pelo próprio Anki via setWebExports. Assim cada
+gráfico só precisa enviar os seus dados.
+"""
+from aqt import gui_hooks, mw
+
+ANKI_JQUERY_JS = "js/vendor/jquery.min.js"
+# Flot do Anki, que a tela de estatísticas antiga já traz
+ANKI_FLOT_JS = "js/vendor/plot.js"
+FLOT_JS = ("web/vendor/jquery.flot.js", "web/vendor/jquery.flot.stack.js")
+GRAPH_JS = "web/evolution_graph.js"
+
+# Telas onde o gráfico aparece: navegador de baralhos, visão geral, parabéns e estatísticas antigas
+_GRAPH_CONTEXTS = ("DeckBrowser", "Overview", "OverviewBottomBar", "DeckStats")
+
+
+def _addon_web_url(path):
+	return "/_addons/" + mw.addonManager.addonFromModule(__name__) + "/" + path
+
+
+def on_webview_will_set_content(web_content, context):
+	"""Adds jQuery, Flot and the graph renderer to the pages that show the graph, once per page load.
+	Acrescenta jQuery, Flot e o renderer do gráfico às páginas que mostram o gráfico, uma vez por página."""
+	if type(context).__name__ not in _GRAPH_CONTEXTS:
+		return
+	scripts = [ANKI_JQUERY_JS]
+	# Uma segunda cópia do Flot substituiria a que os gráficos do próprio Anki usam
+	if ANKI_FLOT_JS not in web_content.js:
+		scripts.extend(_addon_web_url(path) for path in FLOT_JS)
+	scripts.append(_addon_web_url(GRAPH_JS))
+	for script in scripts:
+		if script not in web_content.js:
+			web_content.js.append(script)
+
+
+def init_web_assets():
+	"""Exposes the add-on's web folder to the webviews and registers the script injection hook.
+	Expõe a pasta web do addon aos webviews e registra o hook que injeta os scripts."""
+	mw.addonManager.setWebExports(__name__, r"web/.*\.js")
+	gui_hooks.webview_will_set_content.append(on_webview_will_set_content)
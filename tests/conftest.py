@@ -0,0 +1,28 @@
+"""
+Os testes rodam sem o Anki: os módulos `aqt`/`anki` de mentira dos benchmarks são
+instalados antes de qualquer import de `src`, e as coleções são as sintéticas dos
+benchmarks, geradas uma vez por sessão.
+
+Execute a partir da pasta do addon: python -m pytest tests
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import anki_stubs  # noqa: E402
+from benchmarks.synthetic_collection import SyntheticCollection, build_collection  # noqa: E402
+
+anki_stubs.install()
+
+
+@pytest.fixture(scope="session")
+def collection(tmp_path_factory):
+	"""Coleção sintética pequena (cerca de 30 mil revisões em um ano e meio), só para leitura."""
+	path = build_collection(str(tmp_path_factory.mktemp("collections") / "collection.anki2"),
+							cards=600, years=1.5, reviews_per_day=60, decks=4, seed=3)
+	col = SyntheticCollection(path)
+	yield col
+	col.close()
@@ -0,0 +1,27 @@
+"""
+Consultas de referência e verificações compartilhadas pelos testes das varreduras.
+"""
+import math
+
+# (exclude_deleted, exclude_suspended) de cada combinação de filtros
+EXCLUDE_FLAGS = [(True, True), (True, False), (False, True), (False, False)]
+
+
+def assert_same_series(actual, expected):
+	"""As duas DailySeries têm os mesmos dias, as mesmas contagens e os mesmos valores até o arredondamento."""
+	assert sorted(actual.counts) == sorted(expected.counts)
+	for day_offset in expected.counts:
+		assert actual.counts[day_offset] == expected.counts[day_offset], day_offset
+		for name in ("etk", "etk_percent", "stability"):
+			assert math.isclose(getattr(actual, name)[day_offset], getattr(expected, name)[day_offset],
+								rel_tol=1e-9, abs_tol=1e-9), (name, day_offset)
+
+
+def original_reviews(col, day_cutoff_s, exclude_deleted, exclude_suspended):
+	"""Revisões anteriores a hoje pela consulta original, com uma subconsulta por filtro."""
+	conditions = ["id < " + str(day_cutoff_s * 1000)]
+	if exclude_deleted:
+		conditions.append("cid IN (SELECT id FROM cards)")
+	if exclude_suspended:
+		conditions.append("cid IN (SELECT id FROM cards WHERE queue != -1)")
+	return col.db.all("SELECT id, cid, type, ivl FROM revlog WHERE " + " AND ".join(conditions) + " ORDER BY id ASC")
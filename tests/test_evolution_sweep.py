@@ -0,0 +1,70 @@
+"""
+A varredura por eventos (sweep_card_states) e a vetorizada (sweep_card_states_numpy)
+contra o laço dia a dia original, que recalculava todos os cartões a cada dia.
+"""
+import pytest
+
+from helpers import EXCLUDE_FLAGS, assert_same_series, original_reviews
+from src.constants import CAT_LEARNING, CAT_YOUNG, CAT_MATURE, CAT_RETAINED
+from src.evolution_core import DailySeries, fsrs_retrievability, get_card_category, sweep_card_states
+from src.numpy_backend import NUMPY_AVAILABLE, reviews_array, sweep_card_states_numpy
+
+
+def _original_per_day(all_reviews, day_cutoff_s, graph_start_day_idx):
+	"""O laço original: a cada dia, percorre todos os cartões já revisados."""
+	card_current_states = {}
+	counts, etk, etk_percent, stability = {}, {}, {}, {}
+	current_rev_idx = 0
+	for day_offset in range(graph_start_day_idx, 1):
+		current_day_end_ts_ms = (day_cutoff_s + (day_offset * 86400)) * 1000
+		while current_rev_idx < len(all_reviews) and all_reviews[current_rev_idx][0] < current_day_end_ts_ms:
+			rev_id_ms, cid, rev_type, rev_ivl = all_reviews[current_rev_idx]
+			card_current_states[cid] = (get_card_category(rev_type, rev_ivl), rev_ivl, rev_id_ms)
+			current_rev_idx += 1
+
+		day_counts = {CAT_LEARNING: 0, CAT_YOUNG: 0, CAT_MATURE: 0, CAT_RETAINED: 0}
+		total_retrievability = 0
+		active_cards = 0
+		total_stability = 0
+		for category, ivl, last_rev_time in card_current_states.values():
+			active_cards += 1
+			day_counts[category] += 1
+			days_since_review = day_offset - int((last_rev_time / 1000 - day_cutoff_s) / 86400)
+			if days_since_review < 0:
+				continue
+			card_stability = max(ivl, 0.1)
+			total_stability += card_stability
+			total_retrievability += fsrs_retrievability(days_since_review, card_stability)
+
+		counts[day_offset] = day_counts
+		etk[day_offset] = total_retrievability
+		etk_percent[day_offset] = total_retrievability / active_cards * 100 if active_cards else 0
+		stability[day_offset] = total_stability / active_cards if active_cards else 0
+	return DailySeries(counts, etk, etk_percent, stability)
+
+
+def _history(col, exclude_deleted, exclude_suspended):
+	day_cutoff_s = col.sched.day_cutoff
+	reviews = original_reviews(col, day_cutoff_s, exclude_deleted, exclude_suspended)
+	graph_start_day_idx = -int((day_cutoff_s - reviews[0][0] / 1000) // 86400)
+	return day_cutoff_s, graph_start_day_idx, reviews
+
+
+@pytest.mark.parametrize("exclude_deleted, exclude_suspended", EXCLUDE_FLAGS)
+def test_event_sweep_matches_per_day_loop(collection, exclude_deleted, exclude_suspended):
+	day_cutoff_s, graph_start_day_idx, reviews = _history(collection, exclude_deleted, exclude_suspended)
+	expected = _original_per_day(reviews, day_cutoff_s, graph_start_day_idx)
+	assert_same_series(sweep_card_states(reviews, day_cutoff_s, graph_start_day_idx), expected)
+	# Janela: o estado inicial vem de todo o histórico anterior
+	assert_same_series(sweep_card_states(reviews, day_cutoff_s, -60), expected.window(-60))
+
+
+@pytest.mark.skipif(not NUMPY_AVAILABLE, reason="NumPy is not installed")
+@pytest.mark.parametrize("exclude_deleted, exclude_suspended", EXCLUDE_FLAGS)
+def test_numpy_sweep_matches_per_day_loop(collection, exclude_deleted, exclude_suspended):
+	day_cutoff_s, graph_start_day_idx, reviews = _history(collection, exclude_deleted, exclude_suspended)
+	expected = _original_per_day(reviews, day_cutoff_s, graph_start_day_idx)
+	assert_same_series(
+		DailySeries(*sweep_card_states_numpy(reviews_array(reviews), day_cutoff_s, graph_start_day_idx)), expected)
+	assert_same_series(DailySeries(*sweep_card_states_numpy(reviews_array(reviews), day_cutoff_s, -60)),
+						expected.window(-60))
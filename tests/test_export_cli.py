@@ -0,0 +1,148 @@
+"""
+A linha de comando (export_cli) sobre a coleção sintética: as linhas em CSV e JSON
+contra a varredura em memória, a agregação semanal, o --period, a volta ao Python
+puro quando o NumPy estoura a memória e a virada do dia lida da coleção.
+"""
+import csv
+import datetime
+import json
+import sqlite3
+import time
+
+import pytest
+
+from benchmarks.synthetic_collection import DAY_CUTOFF_S
+from src import export_cli
+from src.constants import CAT_LEARNING, CAT_YOUNG, CAT_MATURE, CAT_RETAINED
+from src.evolution_core import sweep_card_states
+from src.numpy_backend import NUMPY_AVAILABLE
+from src.revlog_query import RevlogQuery
+
+# A virada de verdade, antes de fixed_day_cutoff trocá-la pela da coleção sintética
+_day_cutoff = export_cli._day_cutoff
+
+@pytest.fixture(autouse=True)
+def fixed_day_cutoff(monkeypatch):
+	# As revisões sintéticas terminam na virada fixa da coleção, e não na de hoje
+	monkeypatch.setattr(export_cli, "_day_cutoff", lambda conn: DAY_CUTOFF_S)
+
+
+@pytest.fixture(scope="module")
+def daily_rows(collection):
+	"""{deslocamento do dia: linha esperada} da varredura de todo o histórico."""
+	reviews = collection.db.all(RevlogQuery(None, True, True).reviews_sql(before_id=DAY_CUTOFF_S * 1000))
+	first_day_idx = -int((DAY_CUTOFF_S - reviews[0][0] / 1000) // 86400)
+	daily = sweep_card_states(reviews, DAY_CUTOFF_S, first_day_idx)
+	rows = {}
+	for day_idx, counts, etk, etk_percent, stability in daily.rollup(1):
+		category_counts = [counts[cat] for cat in (CAT_LEARNING, CAT_YOUNG, CAT_MATURE, CAT_RETAINED)]
+		date = datetime.date.fromtimestamp(DAY_CUTOFF_S + (day_idx - 1) * 86400).isoformat()
+		rows[day_idx] = [date, day_idx] + category_counts + [sum(category_counts), etk, etk_percent, stability]
+	return rows
+
+
+def _export(collection, tmp_path, *options):
+	options = export_cli._parse_args([collection.path, "--backend", "python"] + list(options))
+	output_path = str(tmp_path / ("series." + options.format))
+	points, _ = export_cli.export_collection(collection.path, output_path, options)
+	if options.format == "csv":
+		with open(output_path, encoding="utf-8", newline="") as output_file:
+			reader = csv.reader(output_file)
+			assert tuple(next(reader)) == export_cli.COLUMNS
+			rows = [[row[0], int(row[1])] + [int(value) for value in row[2:7]] + [float(value) for value in row[7:]]
+					for row in reader]
+	else:
+		with open(output_path, encoding="utf-8") as output_file:
+			exported = json.load(output_file)
+		assert exported["period"] == options.period and exported["aggregation"] == options.aggregation
+		rows = [[row[column] for column in export_cli.COLUMNS] for row in exported["series"]]
+	assert points == len(rows)
+	return rows
+
+
+def _assert_same_rows(rows, expected_rows):
+	assert [row[:7] for row in rows] == [row[:7] for row in expected_rows]
+	for row, expected_row in zip(rows, expected_rows):
+		# O arquivo guarda ETK, ETK em % e estabilidade com 4 casas
+		assert row[7:] == pytest.approx(expected_row[7:], abs=1e-4), row[1]
+
+
+@pytest.mark.parametrize("output_format", ["csv", "json"])
+def test_daily_rows_match_the_sweep(collection, tmp_path, daily_rows, output_format):
+	rows = _export(collection, tmp_path, "--format", output_format)
+	_assert_same_rows(rows, [daily_rows[day_idx] for day_idx in sorted(daily_rows)])
+
+
+def test_weekly_rows_close_each_week(collection, tmp_path, daily_rows):
+	rows = _export(collection, tmp_path, "--format", "csv", "--aggregation", "w")
+	first_day_idx = min(daily_rows)
+	expected_rows = []
+	for row in rows:
+		# A semana termina no dia da linha: contagens e ETK desse dia, médias dos dias da semana
+		week_days = [daily_rows[day_idx] for day_idx in range(max(row[1] - 6, first_day_idx), row[1] + 1)]
+		expected_rows.append(week_days[-1][:8] + [sum(day[8] for day in week_days) / len(week_days),
+												  sum(day[9] for day in week_days) / len(week_days)])
+	assert [row[1] for row in rows] == list(range(rows[0][1], 1, 7))
+	assert rows[-1][1] == 0 and rows[0][1] - 7 < first_day_idx
+	_assert_same_rows(rows, expected_rows)
+
+
+def test_period_keeps_the_last_days(collection, tmp_path, daily_rows):
+	rows = _export(collection, tmp_path, "--format", "json", "--period", "3m")
+	# Só a janela é lida, mas o estado dos cartões no início dela vem do histórico anterior
+	_assert_same_rows(rows, [daily_rows[day_idx] for day_idx in range(-89, 1)])
+
+
+@pytest.mark.skipif(not NUMPY_AVAILABLE, reason="NumPy is not installed")
+def test_numpy_memory_error_falls_back_to_python(monkeypatch, collection, tmp_path, daily_rows):
+	sweeps = []
+	sweep_collection = export_cli._sweep_collection
+
+	def numpy_out_of_memory(path, options, use_numpy):
+		sweeps.append(use_numpy)
+		if use_numpy:
+			raise MemoryError()
+		return sweep_collection(path, options, use_numpy)
+
+	monkeypatch.setattr(export_cli, "_sweep_collection", numpy_out_of_memory)
+	rows = _export(collection, tmp_path, "--format", "csv", "--backend", "auto")
+	assert sweeps == [True, False]
+	_assert_same_rows(rows, [daily_rows[day_idx] for day_idx in sorted(daily_rows)])
+
+	# Com o backend pedido explicitamente, o erro não é escondido
+	sweeps.clear()
+	with pytest.raises(MemoryError):
+		_export(collection, tmp_path, "--format", "csv", "--backend", "numpy")
+	assert sweeps == [True]
+
+
+def _collection_tables(path, conf, config):
+	conn = sqlite3.connect(str(path))
+	conn.execute("CREATE TABLE col (crt integer NOT NULL, conf text NOT NULL)")
+	conn.execute("INSERT INTO col VALUES (?, ?)", (1_500_000_000, json.dumps(conf)))
+	if config is not None:
+		conn.execute("CREATE TABLE config (KEY text NOT NULL PRIMARY KEY, val blob NOT NULL)")
+		conn.executemany("INSERT INTO config VALUES (?, ?)",
+						 [(key, json.dumps(value).encode()) for key, value in config.items()])
+	return conn
+
+
+@pytest.mark.parametrize("conf, config", [({}, None), ({"rollover": 6}, None), ({}, {"rollover": 6}),
+										  ({"schedVer": 2}, {"rollover": 6})])
+def test_v1_day_cutoff_counts_days_from_creation(tmp_path, conf, config):
+	# Sem schedVer, o Anki usa o agendador v1 e ignora a hora da virada
+	conn = _collection_tables(tmp_path / "collection.anki2", conf, config)
+	day_cutoff_s = _day_cutoff(conn)
+	conn.close()
+	assert (day_cutoff_s - 1_500_000_000) % 86400 == 0
+	assert time.time() < day_cutoff_s <= time.time() + 86400
+
+
+@pytest.mark.parametrize("conf, config", [({"schedVer": 2, "rollover": 6}, None), ({}, {"schedVer": 2, "rollover": 6}),
+										  ({"schedVer": 1}, {"schedVer": 2, "rollover": 6})])
+def test_later_schedulers_use_the_rollover_hour(tmp_path, conf, config):
+	conn = _collection_tables(tmp_path / "collection.anki2", conf, config)
+	day_cutoff_s = _day_cutoff(conn)
+	conn.close()
+	assert day_cutoff_s == export_cli._next_day_cutoff(6)
+	assert datetime.datetime.fromtimestamp(day_cutoff_s).hour == 6
@@ -0,0 +1,69 @@
+"""
+Dados do tooltip de um gráfico reduzido (build_graph_data com max_points): todo x
+desenhado, de barra ou só de linha, tem as contagens, o conhecimento total e a
+estabilidade da série completa. As barras reduzidas ficam no x do próprio pico, com a
+largura de um bloco.
+"""
+import dataclasses
+
+import pytest
+
+from src import data_processing
+from src.config import AddonConfig
+from src.constants import CAT_LEARNING, CAT_MATURE, CAT_RETAINED, CAT_YOUNG
+from src.evolution_core import sweep_card_states
+from src.translations import tr
+
+CATEGORIES = (("label_learning", CAT_LEARNING), ("label_young", CAT_YOUNG), ("label_mature", CAT_MATURE),
+			  ("label_retained", CAT_RETAINED))
+
+
+@pytest.fixture(scope="module")
+def daily_history(collection):
+	day_cutoff_s = collection.sched.day_cutoff
+	reviews = collection.db.all("SELECT id, cid, type, ivl FROM revlog WHERE id < ? ORDER BY id", day_cutoff_s * 1000)
+	first_day_idx = (reviews[0][0] // 1000 - day_cutoff_s) // 86400
+	return day_cutoff_s, first_day_idx, sweep_card_states(reviews, day_cutoff_s, first_day_idx)
+
+
+def _build(monkeypatch, daily_history, config, max_points):
+	# Sem o formato compacto, para comparar os pontos diretamente
+	monkeypatch.setattr(data_processing, "encode_points", lambda points: {x: y for x, y in points})
+	day_cutoff_s, first_day_idx, daily = daily_history
+	return data_processing.build_graph_data(daily, day_cutoff_s, first_day_idx, 1, "evolutionGraphTest", config,
+											max_points)
+
+
+@pytest.mark.parametrize("hide_young", [False, True])
+def test_downsampled_tooltip_covers_every_drawn_x(monkeypatch, daily_history, hide_young):
+	config = dataclasses.replace(AddonConfig(), hide_young=hide_young)
+	series, _, tooltip, _, _ = _build(monkeypatch, daily_history, config, 100)
+	full = {x: (counts, etk, stability) for x, counts, etk, _, stability in daily_history[2].rollup(1)}
+
+	bar_xs = {point[0] for s in series if "lines" not in s for point in s["data"]}
+	drawn_xs = {point[0] for s in series for point in s["data"]}
+	assert len(drawn_xs) < len(full)
+	assert drawn_xs - bar_xs, "the lines should have points with no bar"
+
+	shown = {tr(label): category for label, category in CATEGORIES if not (hide_young and category == CAT_YOUNG)}
+	assert sorted(tooltip["counts"]) == sorted(shown)
+	for x in drawn_xs:
+		counts, etk, stability = full[x]
+		assert tooltip["etkAbs"][x] == etk
+		assert tooltip["stability"][x] == stability
+		for label, category in shown.items():
+			assert tooltip["counts"][label][x] == counts[category]
+
+
+def test_downsampled_bars_keep_the_chunk_width(monkeypatch, daily_history):
+	# Barras no x do pico com a largura de um bloco não se sobrepõem, por mais desiguais que sejam os baldes
+	series, graph_options, _, _, _ = _build(monkeypatch, daily_history, AddonConfig(), 100)
+	bar_xs = sorted({point[0] for s in series if "lines" not in s for point in s["data"]})
+	assert graph_options["series"]["bars"]["barWidth"] == 0.9
+	assert all(right - left >= 1 for left, right in zip(bar_xs, bar_xs[1:]))
+
+
+def test_full_resolution_tooltip_reads_the_bars(monkeypatch, daily_history):
+	# Sem redução, cada x tem barra e o tooltip usa o índice das próprias séries
+	_, _, tooltip, _, _ = _build(monkeypatch, daily_history, AddonConfig(), 0)
+	assert "counts" not in tooltip
@@ -0,0 +1,99 @@
+"""
+A varredura repartida entre processos (parallel_sweep) contra a varredura em um só
+processo. Os testes usam o pool "spawn" de verdade, com o shard_bootstrap.py, e
+confirmam que as fatias foram mesmo varridas pelos processos.
+"""
+import importlib
+import os
+import runpy
+
+import pytest
+
+from helpers import assert_same_series
+from src import parallel_sweep
+from src.evolution_core import CardStateSweep, DailySeries
+from src.numpy_backend import NUMPY_AVAILABLE
+
+BACKENDS = [False, pytest.param(True, marks=pytest.mark.skipif(not NUMPY_AVAILABLE, reason="NumPy is not installed"))]
+
+
+@pytest.fixture(scope="module")
+def history(collection):
+	day_cutoff_s = collection.sched.day_cutoff
+	reviews = collection.db.all("SELECT id, cid, type, ivl FROM revlog WHERE id < ? ORDER BY id", day_cutoff_s * 1000)
+	first_day_idx = (reviews[0][0] // 1000 - day_cutoff_s) // 86400
+	return day_cutoff_s, first_day_idx, reviews
+
+
+def _single_process(reviews, day_cutoff_s, first_day_idx, last_day_idx):
+	sweep = CardStateSweep(day_cutoff_s)
+	daily = DailySeries()
+	reviews = iter(reviews)
+	last_review, next_review = sweep.run(reviews, first_day_idx, last_day_idx, daily)
+	return daily, sweep.card_states(), last_review[0], ([next_review] if next_review is not None else []) + list(reviews)
+
+
+def _record_pool_runs(monkeypatch, module):
+	"""Lista que recebe o número de fatias de cada pool que rodou até o fim."""
+	pool_runs = []
+	run_shards = module._run_shards
+
+	def recording_run_shards(buffers, *args):
+		shard_results = run_shards(buffers, *args)
+		if shard_results is not None:
+			pool_runs.append(len(shard_results))
+		return shard_results
+
+	monkeypatch.setattr(module, "_run_shards", recording_run_shards)
+	# Fatias pequenas para que a coleção de teste já use os processos
+	monkeypatch.setattr(module, "MIN_REVIEWS_PER_SHARD", 2000)
+	return pool_runs
+
+
+@pytest.mark.parametrize("use_numpy", BACKENDS)
+@pytest.mark.parametrize("workers", [2, 3])
+@pytest.mark.parametrize("with_card_states", [False, True])
+def test_pool_matches_single_process(monkeypatch, history, use_numpy, workers, with_card_states):
+	day_cutoff_s, first_day_idx, reviews = history
+	pool_runs = _record_pool_runs(monkeypatch, parallel_sweep)
+	# Como no EvolutionModel.fold, as revisões posteriores ao último dia voltam sem ser varridas
+	daily, card_states, last_id, remaining_reviews = parallel_sweep.sweep_card_states_parallel(
+		iter(reviews), day_cutoff_s, first_day_idx, -30, workers, use_numpy, with_card_states)
+	assert pool_runs == [workers]
+
+	expected_daily, expected_card_states, expected_last_id, expected_remaining = _single_process(
+		reviews, day_cutoff_s, first_day_idx, -30)
+	assert expected_remaining
+	assert_same_series(daily, expected_daily)
+	assert card_states == (expected_card_states if with_card_states else None)
+	assert last_id == expected_last_id
+	assert [list(review) for review in remaining_reviews] == [list(review) for review in expected_remaining]
+
+
+@pytest.mark.parametrize("use_numpy", BACKENDS)
+def test_small_histories_are_swept_once_in_process(monkeypatch, history, use_numpy):
+	day_cutoff_s, first_day_idx, reviews = history
+	pool_runs = _record_pool_runs(monkeypatch, parallel_sweep)
+	monkeypatch.setattr(parallel_sweep, "MIN_REVIEWS_PER_SHARD", len(reviews))
+	daily, card_states, _, _ = parallel_sweep.sweep_card_states_parallel(
+		iter(reviews), day_cutoff_s, first_day_idx, 0, 4, use_numpy, True)
+	assert pool_runs == []
+	expected_daily, expected_card_states, _, _ = _single_process(reviews, day_cutoff_s, first_day_idx, 0)
+	assert_same_series(daily, expected_daily)
+	assert card_states == expected_card_states
+
+
+def test_pool_inside_the_addon_package(monkeypatch, history):
+	# Dentro do Anki o núcleo é "<addon>.src.parallel_sweep": o processo filho precisa
+	# importá-lo pelo pacote do addon sem executar o __init__.py dele (que importa o aqt)
+	package = "accumulated_retention_test_addon"
+	bootstrap_path = os.path.join(os.path.dirname(parallel_sweep.__file__), "shard_bootstrap.py")
+	runpy.run_path(bootstrap_path, {"ADDON_PACKAGE": package})
+	addon_parallel_sweep = importlib.import_module(package + ".src.parallel_sweep")
+	assert addon_parallel_sweep._package_root() == package
+
+	day_cutoff_s, first_day_idx, reviews = history
+	pool_runs = _record_pool_runs(monkeypatch, addon_parallel_sweep)
+	daily = addon_parallel_sweep.sweep_card_states_parallel(iter(reviews), day_cutoff_s, first_day_idx, 0, 2)[0]
+	assert pool_runs == [2]
+	assert_same_series(daily, _single_process(reviews, day_cutoff_s, first_day_idx, 0)[0])
@@ -0,0 +1,129 @@
+"""
+Planos do SQLite para as consultas do RevlogQuery: com filtro de deck, as revisões
+vêm dos cartões do deck (ix_cards_sched) e de ix_revlog_cid, sem percorrer o revlog
+inteiro, inclusive na forma paginada (LIMIT) e nas faixas de id da leitura em páginas.
+A consulta com JOIN lê as mesmas revisões que a original, com uma subconsulta por filtro.
+"""
+import pytest
+
+from helpers import EXCLUDE_FLAGS, original_reviews
+from src import revlog_sweep
+from src.revlog_query import RevlogQuery
+
+DECK_QUERIES = [
+	RevlogQuery([1000], True, True),
+	RevlogQuery([1000, 2000], True, False),
+	RevlogQuery([1000], False, False),
+]
+# Decks com bem menos da metade dos cartões, lidos em faixas de id a partir dos cartões
+SMALL_DECK_QUERIES = [
+	RevlogQuery([1000], True, True),
+	RevlogQuery([2001], True, False),
+	RevlogQuery([1000], False, False),
+]
+
+
+def _plan(col, sql):
+	return [row[3] for row in col.db.all("EXPLAIN QUERY PLAN " + sql)]
+
+
+def _assert_deck_plan(plan):
+	assert any("ix_cards_sched" in step for step in plan), plan
+	assert any(step.startswith("SEARCH r") and "ix_revlog_cid" in step for step in plan), plan
+	assert not any(step.startswith("SCAN r") for step in plan), plan
+
+
+def _deck_sqls(revlog_query, day_cutoff_s):
+	before_id = day_cutoff_s * 1000
+	return [
+		revlog_query.min_id_sql(),
+		revlog_query.reviews_sql(before_id=before_id),
+		revlog_query.reviews_sql(after_id=0, before_id=before_id, limit=500),
+		revlog_query.reviews_sql(after_id=0, before_id=before_id, limit=500, with_deck=True),
+		revlog_query.latest_before_sql(before_id - 30 * 86400 * 1000),
+		revlog_query.reviews_sql(after_id=before_id - 90 * 86400 * 1000, before_id=before_id - 30 * 86400 * 1000),
+	]
+
+
+@pytest.mark.parametrize("exclude_deleted, exclude_suspended", EXCLUDE_FLAGS)
+def test_joined_query_reads_the_same_reviews(collection, exclude_deleted, exclude_suspended):
+	day_cutoff_s = collection.sched.day_cutoff
+	revlog_query = RevlogQuery(None, exclude_deleted, exclude_suspended)
+	assert collection.db.all(revlog_query.reviews_sql(before_id=day_cutoff_s * 1000)) == \
+		original_reviews(collection, day_cutoff_s, exclude_deleted, exclude_suspended)
+
+
+@pytest.mark.parametrize("revlog_query", DECK_QUERIES, ids=lambda query: repr(query.key_parts()))
+def test_deck_queries_start_from_the_deck_cards(collection, revlog_query):
+	for sql in _deck_sqls(revlog_query, collection.sched.day_cutoff):
+		_assert_deck_plan(_plan(collection, sql))
+
+
+def test_collection_pages_walk_the_revlog_by_id(collection):
+	# Sem deck, uma página percorre o revlog na ordem do id e para no LIMIT, sem ordenar
+	revlog_query = RevlogQuery(None, True, True)
+	plan = _plan(collection, revlog_query.reviews_sql(after_id=0, before_id=collection.sched.day_cutoff * 1000,
+													  limit=500))
+	assert plan[0].startswith("SEARCH r USING INTEGER PRIMARY KEY"), plan
+	assert not any("TEMP B-TREE" in step for step in plan), plan
+
+
+def test_range_end_walks_the_revlog_primary_key(collection):
+	plan = _plan(collection, DECK_QUERIES[0].range_end_sql(0, collection.sched.day_cutoff * 1000, 500))
+	assert plan == ["SEARCH r USING INTEGER PRIMARY KEY (rowid>? AND rowid<?)"], plan
+
+
+class _CountingCollection:
+	"""Coleção que registra as consultas de revisões feitas ao revlog."""
+
+	def __init__(self, col):
+		self._col = col
+		self.queries = []
+		self.db = self
+
+	def all(self, sql, *args):
+		self.queries.append(sql)
+		return self._col.db.all(sql, *args)
+
+	def scalar(self, sql, *args):
+		return self._col.db.scalar(sql, *args)
+
+
+@pytest.mark.parametrize("revlog_query", SMALL_DECK_QUERIES, ids=lambda query: repr(query.key_parts()))
+def test_deck_reviews_are_paged_by_id_range(collection, revlog_query):
+	counting = _CountingCollection(collection)
+	before_id = collection.sched.day_cutoff * 1000
+	pages = []
+	reviews = []
+	for review in revlog_sweep.iter_reviews(counting, revlog_query, None, before_id, batch_size=500):
+		if len(pages) < len(counting.queries):
+			pages.append(0)
+		pages[-1] += 1
+		reviews.append(review)
+	assert reviews == collection.db.all(revlog_query.reviews_sql(before_id=before_id))
+	assert len(pages) > 3
+	# O tamanho de cada faixa se ajusta à densidade de revisões do deck, sem passar muito de batch_size
+	assert max(pages) <= 4 * 500
+	for sql in counting.queries:
+		assert "LIMIT" not in sql
+		_assert_deck_plan(_plan(collection, sql))
+
+
+def test_deck_with_most_cards_is_paged_in_revlog_order(collection):
+	revlog_query = RevlogQuery([1] + list(range(1000, 1010)) + list(range(2000, 2010)), True, True)
+	counting = _CountingCollection(collection)
+	before_id = collection.sched.day_cutoff * 1000
+	reviews = list(revlog_sweep.iter_reviews(counting, revlog_query, None, before_id, batch_size=5000))
+	assert len(counting.queries) == len(reviews) // 5000 + 1
+	assert reviews == collection.db.all(revlog_query.reviews_sql(before_id=before_id))
+	plan = _plan(collection, counting.queries[0])
+	assert plan[0].startswith("SEARCH r USING INTEGER PRIMARY KEY"), plan
+
+
+def test_collection_reviews_are_paged(collection):
+	revlog_query = RevlogQuery(None, True, True)
+	counting = _CountingCollection(collection)
+	before_id = collection.sched.day_cutoff * 1000
+	reviews = list(revlog_sweep.iter_reviews(counting, revlog_query, None, before_id, batch_size=5000))
+	assert len(counting.queries) == len(reviews) // 5000 + 1
+	assert reviews == collection.db.all(revlog_query.reviews_sql(before_id=before_id))
@@ -0,0 +1,20 @@
+"""Limite de arquivos da pasta de snapshots: os gravados há mais tempo são apagados."""
+import os
+
+from src import snapshot_cache
+from src.revlog_query import RevlogQuery
+
+
+def test_oldest_snapshots_are_pruned(monkeypatch, tmp_path, collection):
+	monkeypatch.setattr(snapshot_cache, "CACHE_DIR", str(tmp_path))
+	monkeypatch.setattr(snapshot_cache, "MAX_SNAPSHOTS", 3)
+	revlog_query = RevlogQuery(None, True, True)
+	day_cutoff_s = collection.sched.day_cutoff
+	keys = ["snapshot{}".format(n) for n in range(5)]
+	for n, cache_key in enumerate(keys):
+		snapshot_cache.save_snapshot(collection, cache_key, revlog_query, day_cutoff_s, 0, -1, -1, {}, {})
+		# mtimes crescentes, independentes da resolução do sistema de arquivos
+		os.utime(os.path.join(str(tmp_path), cache_key + ".json"), (1000000 + n, 1000000 + n))
+		kept = keys[max(0, n - 2):n + 1]
+		assert sorted(os.listdir(str(tmp_path))) == [kept_key + ".json" for kept_key in kept]
+	assert snapshot_cache.load_snapshot(collection, keys[-1], day_cutoff_s, revlog_query) is not None
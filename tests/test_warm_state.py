@@ -0,0 +1,95 @@
+"""
+Modelos mantidos em memória (warm_state): o usado há mais tempo sai primeiro, e só a
+operação da resposta do revisor deixa de descartá-los.
+"""
+import sys
+import types
+
+import pytest
+
+from src import warm_state
+
+
+@pytest.fixture(autouse=True)
+def empty_models():
+	warm_state.invalidate_all()
+	yield
+	warm_state.invalidate_all()
+	warm_state._clear_answer_pending()
+
+
+def _store(cache_key):
+	model = object()
+	warm_state.store_model(cache_key, model, None, warm_state.generation())
+	return model
+
+
+def test_least_recently_used_model_is_evicted(monkeypatch):
+	monkeypatch.setattr(warm_state, "MAX_MODELS", 3)
+	first = _store("a")
+	_store("b")
+	_store("c")
+	# Ler "a" o torna o mais recente; "b" passa a ser o mais antigo
+	assert warm_state.get_model("a") is first
+	_store("d")
+	assert warm_state.get_model("b") is None
+	assert all(warm_state.get_model(cache_key) is not None for cache_key in ("a", "c", "d"))
+
+
+def test_storing_a_key_again_does_not_grow_the_cache(monkeypatch):
+	monkeypatch.setattr(warm_state, "MAX_MODELS", 2)
+	_store("a")
+	_store("b")
+	latest = _store("a")
+	assert warm_state.get_model("a") is latest
+	assert warm_state.get_model("b") is not None
+
+
+class _Reviewer:
+	pass
+
+
+@pytest.fixture
+def reviewer(monkeypatch):
+	monkeypatch.setattr(sys.modules["aqt.reviewer"], "Reviewer", _Reviewer)
+	return _Reviewer()
+
+
+@pytest.fixture
+def timers(monkeypatch):
+	"""Callbacks do QTimer.singleShot, que só rodam quando o teste os chama (o laço de eventos do Qt)."""
+	callbacks = []
+	monkeypatch.setattr(warm_state, "QTimer",
+						types.SimpleNamespace(singleShot=lambda msec, callback: callbacks.append(callback)))
+	return callbacks
+
+
+CARD_CHANGES = types.SimpleNamespace(card=True, deck=False)
+
+
+def test_answer_operation_keeps_the_models(reviewer, timers):
+	warm_state.on_card_answered(reviewer, types.SimpleNamespace(id=1), 3)
+	model = _store("a")
+	warm_state.on_operation_did_execute(CARD_CHANGES, reviewer)
+	assert warm_state.get_model("a") is model
+
+
+@pytest.mark.parametrize("answered_before", [False, True])
+def test_other_reviewer_operations_invalidate(reviewer, timers, answered_before):
+	if answered_before:
+		# A operação da resposta já passou; a seguinte (suspender pelo revisor) é outra
+		warm_state.on_card_answered(reviewer, types.SimpleNamespace(id=1), 3)
+		warm_state.on_operation_did_execute(CARD_CHANGES, reviewer)
+	_store("a")
+	warm_state.on_operation_did_execute(CARD_CHANGES, reviewer)
+	assert warm_state.get_model("a") is None
+
+
+def test_answer_without_operation_does_not_hide_the_next_one(reviewer, timers):
+	# Versões em que responder não é uma operação: o aviso da resposta expira no laço de eventos
+	warm_state.on_card_answered(reviewer, types.SimpleNamespace(id=1), 3)
+	for callback in timers:
+		callback()
+	_store("a")
+	warm_state.on_operation_did_execute(CARD_CHANGES, reviewer)
+	assert warm_state.get_model("a") is None
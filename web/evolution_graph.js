@@ -0,0 +1,292 @@
+/*
+ * Accumulated Retention Graph: renderer carregado uma vez por página.
+ *
+ * O Python só envia os dados de cada gráfico (ver payload.py e
+ * CompleteCollectionStats._graph); a decodificação do payload, o desenho com o
+ * Flot e o tooltip ficam aqui. O tooltip é um único handler delegado no
+ * documento, que atende todos os gráficos da página.
+ */
+(function () {
+  if (window.renderEvolutionGraph) {
+    return;
+  }
+
+  // --- Payload compacto (ver src/payload.py) ---
+
+  function decodeColumn(column) {
+    var raw = atob(column.d), view = new DataView(new ArrayBuffer(raw.length)), i;
+    for (i = 0; i < raw.length; i++) view.setUint8(i, raw.charCodeAt(i));
+    var size = {i1: 1, i2: 2, i4: 4, f4: 4}[column.t], values = new Array(raw.length / size), acc = column.s || 0;
+    for (i = 0; i < values.length; i++) {
+      if (column.t === "f4") { values[i] = view.getFloat32(i * 4, true); continue; }
+      acc += column.t === "i1" ? view.getInt8(i) : column.t === "i2" ? view.getInt16(i * 2, true) : view.getInt32(i * 4, true);
+      values[i] = acc;
+    }
+    return values;
+  }
+
+  function decodeX(packed) {
+    if (packed.x) return decodeColumn(packed.x);
+    var xs = new Array(packed.n);
+    for (var i = 0; i < packed.n; i++) xs[i] = packed.x0 + i;
+    return xs;
+  }
+
+  function decodePairs(packed) {
+    var xs = decodeX(packed), ys = decodeColumn(packed.y), pairs = new Array(xs.length);
+    for (var i = 0; i < xs.length; i++) pairs[i] = [xs[i], ys[i]];
+    return pairs;
+  }
+
+  function decodeMap(packed) {
+    var xs = decodeX(packed), ys = decodeColumn(packed.y), map = {};
+    for (var i = 0; i < xs.length; i++) map[xs[i]] = ys[i];
+    return map;
+  }
+
+  function decodeMaps(packedByLabel) {
+    var maps = {};
+    for (var label in packedByLabel) maps[label] = decodeMap(packedByLabel[label]);
+    return maps;
+  }
+
+  // --- Flot ---
+
+  var flotQueue = null;
+  // Pasta web/ do addon, de onde este arquivo foi servido (/_addons/<addon>/web/)
+  var webBase = document.currentScript ? document.currentScript.src.replace(/[^\/]*$/, "") : "";
+
+  function loadScripts(paths, onload) {
+    if (!paths.length) {
+      onload();
+      return;
+    }
+    var script = document.createElement("script");
+    script.src = webBase + paths[0];
+    script.onload = function () { loadScripts(paths.slice(1), onload); };
+    script.onerror = function () {
+      console.error("Card Evolution JS: Failed to load Flot from " + script.src);
+    };
+    document.head.appendChild(script);
+  }
+
+  function withFlot(callback) {
+    if (typeof $ === "undefined") {
+      console.error("Card Evolution JS: jQuery not available");
+      return;
+    }
+    if (typeof $.plot !== "undefined") {
+      callback();
+      return;
+    }
+    // A página não trouxe o Flot no <head>: carrega a cópia do addon uma vez, o plugin depois do Flot
+    if (!flotQueue) {
+      flotQueue = [];
+      loadScripts(["vendor/jquery.flot.js", "vendor/jquery.flot.stack.js"], function () {
+        flotQueue.splice(0).forEach(function (fn) { fn(); });
+      });
+    }
+    flotQueue.push(callback);
+  }
+
+  function tickFormatter(axisInfo, chunkDays, unitSuffix) {
+    if (axisInfo.absoluteDates) {
+      return function (val, axis) {
+        if (Math.abs(val - 0) < 0.001) { return axisInfo.todayLabel; }
+        var date = new Date((axisInfo.dayCutoffS + (val * chunkDays * 86400)) * 1000);
+        return axisInfo.months[date.getMonth()] + " " + date.getDate();
+      };
+    }
+    return function (val, axis) {
+      if (Math.abs(val - 0) < 0.001) { return axisInfo.todayLabel; }
+      var decimals = axis.options.tickDecimals === undefined ? 0 : axis.options.tickDecimals;
+      return val.toFixed(decimals) + unitSuffix;
+    };
+  }
+
+  // --- Tooltip ---
+
+  var tooltipData = {};
+  var tooltip = null;
+  var pendingHover = null;
+  var hoverFrame = null;
+  var shownPoint = null;
+
+  function attachEvolutionGraphTooltip(id, payload) {
+    tooltipData[id] = {
+      labels: payload.labels,
+      etkAbs: decodeMap(payload.etkAbs),
+      stability: decodeMap(payload.stability),
+      counts: payload.counts ? decodeMaps(payload.counts) : null,
+      index: null,
+      indexedSeries: null
+    };
+  }
+
+  /*
+   * Índice dos valores por x: uma coluna Float64Array por rótulo de série, com
+   * posição x - x0 (os x são os números dos blocos, inteiros e consecutivos; após
+   * a redução de pontos sobram lacunas, que ficam NaN). Montado uma vez por
+   * gráfico, troca a varredura de todas as séries a cada movimento do mouse por
+   * uma leitura direta.
+   */
+  function buildPointIndex(allSeries) {
+    var x0 = Infinity, x1 = -Infinity, i, j;
+    for (i = 0; i < allSeries.length; ++i) {
+      if (!allSeries[i].label) continue;
+      for (j = 0; j < allSeries[i].data.length; ++j) {
+        var x = Math.round(allSeries[i].data[j][0]);
+        if (x < x0) x0 = x;
+        if (x > x1) x1 = x;
+      }
+    }
+    var index = {x0: x0, length: x1 >= x0 ? x1 - x0 + 1 : 0, columns: {}};
+    for (i = 0; i < allSeries.length; ++i) {
+      var currentSeries = allSeries[i];
+      if (!currentSeries.label) continue;
+      var column = index.columns[currentSeries.label] = new Float64Array(index.length).fill(NaN);
+      for (j = 0; j < currentSeries.data.length; ++j) {
+        var d = currentSeries.data[j];
+        column[Math.round(d[0]) - x0] = d[1];
+      }
+    }
+    return index;
+  }
+
+  function pointIndex(data, plot) {
+    // No gráfico da tela de estatísticas o Flot é chamado pelo Anki, então o índice é montado no primeiro hover
+    var allSeries = plot.getData();
+    if (data.indexedSeries !== allSeries) {
+      data.index = buildPointIndex(allSeries);
+      data.indexedSeries = allSeries;
+    }
+    return data.index;
+  }
+
+  function indexedValue(index, label, offset) {
+    var column = index.columns[label];
+    if (!column || offset < 0 || offset >= index.length || isNaN(column[offset])) return undefined;
+    return column[offset];
+  }
+
+  function countValue(data, index, label, x, offset) {
+    // Gráfico reduzido: as contagens vêm da série completa, que também cobre os x só de linha
+    if (data.counts) return data.counts[label] ? data.counts[label][x] : undefined;
+    return indexedValue(index, label, offset);
+  }
+
+  function tooltipContent(data, plot, item) {
+    var labels = data.labels;
+    var x_val_on_axis = item.datapoint[0];
+    var index = pointIndex(data, plot);
+    var offset = Math.round(x_val_on_axis) - index.x0;
+    var etkAbsValue = "N/A";
+    var etkPercentValue = "N/A";
+    var etkAvgValue = "N/A";
+
+    var learning = countValue(data, index, labels.learning, x_val_on_axis, offset);
+    var young = countValue(data, index, labels.young, x_val_on_axis, offset);
+    var mature = countValue(data, index, labels.mature, x_val_on_axis, offset);
+    var retained = countValue(data, index, labels.retained, x_val_on_axis, offset);
+    var totalForDay = (learning || 0) + (young || 0) + (mature || 0) + (retained || 0);
+
+    var titleX = item.series.xaxis.tickFormatter(x_val_on_axis, item.series.xaxis);
+    var content = "<b>" + labels.period + titleX + "</b><br/>";
+
+    if (data.etkAbs[x_val_on_axis] !== undefined) {
+      etkAbsValue = data.etkAbs[x_val_on_axis].toFixed(0);
+      if (totalForDay > 0) {
+        etkPercentValue = (100 * data.etkAbs[x_val_on_axis] / totalForDay).toFixed(1);
+      }
+    }
+    if (data.stability[x_val_on_axis] !== undefined) {
+      etkAvgValue = data.stability[x_val_on_axis].toFixed(0);
+    }
+
+    content += labels.learning + ": " + (learning?.toFixed(0) || 0) + "<br/>";
+    content += labels.young + ": " + (young?.toFixed(0) || 0) + "<br/>";
+    content += labels.mature + ": " + (mature?.toFixed(0) || 0) + "<br/>";
+    content += labels.retained + ": " + (retained?.toFixed(0) || 0) + "<br/>";
+    content += "<i>" + labels.total + totalForDay.toFixed(0) + "</i><br/><hr style='margin: 4px 0; border-top: 1px solid #ccc;'/>";
+    content += "<b>" + labels.retentionPercent + ": " + etkPercentValue + "</b><br/>";
+    content += "<b>" + labels.totalKnowledge + ": " + etkAbsValue + "</b><br/>";
+    content += "<b>" + labels.avgStability + ": " + etkAvgValue + "</b>";
+    return content;
+  }
+
+  function updateTooltip() {
+    hoverFrame = null;
+    var hover = pendingHover;
+    pendingHover = null;
+    if (!hover) {
+      return;
+    }
+    if (!tooltip) {
+      tooltip = $('<div id="evolutionGraphTooltip" style="position:absolute;display:none;padding:8px;background-color:#fff;border:1px solid #ddd;color:#333;border-radius:4px;box-shadow:0 2px 5px rgba(0,0,0,0.1);pointer-events:none;font-size:0.9em;z-index:100;"></div>').appendTo("body");
+    }
+    var item = hover.item;
+    if (!item) {
+      shownPoint = null;
+      tooltip.hide();
+      return;
+    }
+    // O conteúdo só é refeito quando o mouse passa para outro ponto; no mesmo ponto só a posição muda
+    var point = hover.placeholder.id + ":" + item.datapoint[0];
+    if (point !== shownPoint) {
+      tooltip.html(tooltipContent(hover.data, $(hover.placeholder).data("plot"), item));
+      shownPoint = point;
+    }
+    tooltip.css({top: item.pageY + 5, left: item.pageX + 5});
+    if (!tooltip.is(":visible")) {
+      tooltip.fadeIn(200);
+    }
+  }
+
+  function onPlotHover(event, pos, item) {
+    // O Flot dispara o evento no placeholder do gráfico, e ele sobe até o documento
+    var placeholder = event.target;
+    var data = tooltipData[placeholder.id];
+    if (!data) {
+      return;
+    }
+    // Vários eventos entre dois quadros: só o último é desenhado
+    pendingHover = {placeholder: placeholder, data: data, item: item};
+    if (hoverFrame === null) {
+      hoverFrame = window.requestAnimationFrame ? window.requestAnimationFrame(updateTooltip) : setTimeout(updateTooltip, 16);
+    }
+  }
+
+  // --- Gráfico da tela principal ---
+
+  function renderEvolutionGraph(id, payload) {
+    withFlot(function () {
+      try {
+        var graphDiv = $("#" + id);
+        if (graphDiv.length === 0) {
+          return;
+        }
+        var data = payload.series.map(function (s) { s.data = decodePairs(s.data); return s; });
+        var options = payload.options;
+        options.series = $.extend(options.series || {}, {stack: true});
+        options.series.bars = $.extend(options.series.bars || {}, {show: true});
+        options.xaxis = options.xaxis || {};
+        options.xaxis.tickFormatter = tickFormatter(
+          payload.axis, options.xaxis.aggregation_chunk_days || 1, options.xaxis.unit_suffix || "d");
+
+        attachEvolutionGraphTooltip(id, payload.tooltip);
+        var plot = $.plot(graphDiv, data, options);
+        tooltipData[id].index = buildPointIndex(plot.getData());
+        tooltipData[id].indexedSeries = plot.getData();
+      } catch (e) {
+        console.error("Card Evolution JS: Error rendering graph:", e);
+      }
+    });
+  }
+
+  if (typeof $ !== "undefined") {
+    $(document).on("plothover", onPlotHover);
+  }
+
+  window.renderEvolutionGraph = renderEvolutionGraph;
+  window.attachEvolutionGraphTooltip = attachEvolutionGraphTooltip;
+})();